@@ -0,0 +1,88 @@
+
+"""
+JWT authentication from signed entitlement claims.
+
+Tokens issued by ``TokenSerializer.get_token`` carry the user's staff flag,
+subscription tier and entitlement version. ``ClaimsJWTAuthentication`` builds
+the request user from those claims as a deferred ``User`` instance, so most
+requests never load the user row; the remaining fields are loaded in one
+query the first time a view touches them.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from subscriptions.entitlements import REVOKED_VERSION, get_cached_entitlement_version
+
+User = get_user_model()
+
+# Token claim name -> User field it mirrors
+ENTITLEMENT_CLAIMS = {
+    'staff': 'is_staff',
+    'tier': 'subscription_type',
+    'ent_ver': 'entitlement_version',
+}
+
+def add_entitlement_claims(token, user):
+    """Copy the user's entitlement fields into ``token``."""
+    for claim, field in ENTITLEMENT_CLAIMS.items():
+        token[claim] = getattr(user, field)
+    return token
+
+def user_from_claims(validated_token):
+    """Build a deferred ``User`` whose claimed fields are already populated."""
+    values = {
+        'id': validated_token[api_settings.USER_ID_CLAIM],
+    }
+    for claim, field in ENTITLEMENT_CLAIMS.items():
+        values[field] = validated_token[claim]
+
+    field_names = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    user = User.from_db(DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names])
+    user._token_claims = {field: values[field] for field in ENTITLEMENT_CLAIMS.values()}
+    return user
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the token's entitlement claims.
+
+    Tokens without claims (issued before they were introduced) fall back to
+    loading the user from the database. Tokens whose entitlement version is
+    older than the one recorded for the user are rejected with the
+    ``token_stale`` code so the client refreshes them. Deactivating a user
+    or changing their staff flag bumps the version, and the refresh is then
+    refused for inactive users. Tokens of deleted users are rejected with
+    ``user_not_found``.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in ENTITLEMENT_CLAIMS):
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise AuthenticationFailed(_('Token contained no recognizable user identification'), code='token_not_valid')
+
+        current_version = get_cached_entitlement_version(user_id)
+        if current_version == REVOKED_VERSION:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if current_version is not None and current_version > validated_token['ent_ver']:
+            raise AuthenticationFailed(_('Token entitlements are out of date, refresh the token.'), code='token_stale')
+
+        return user_from_claims(validated_token)
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh serializer that re-issues entitlement claims from the database."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(pk=refresh[api_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        add_entitlement_claims(refresh, user)
+        return {'access': str(refresh.access_token)}
@@ -0,0 +1,160 @@
+
+"""
+Password hashing offloaded to a bounded process pool.
+
+Hashing a password is deliberately expensive, and running it on the request
+worker pins the CPU during login storms. Verifications and new hashes are
+therefore run in a pool of worker processes. At most ``max_pending``
+operations may be queued; beyond that ``HashingBusy`` is raised immediately
+so the view can answer 429 instead of piling up requests. Views that do not
+handle it, such as the admin login, get a 503 from
+``HashingBusyMiddleware``.
+
+Every web worker has its own pool, so ``PASSWORD_HASHING_WORKERS`` defaults
+to the cores divided by ``WEB_CONCURRENCY``, gunicorn's worker count.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from zamanivault.queues import register_queue
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full or an operation timed out."""
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zamanivault.settings')
+    if not apps.ready:
+        django.setup()
+
+def _verify(password, encoded):
+    """Check ``password`` and return ``(valid, rehashed)`` for the preferred hasher."""
+    rehashed = []
+    valid = check_password(password, encoded, setter=lambda raw: rehashed.append(make_password(raw)))
+    return valid, rehashed[0] if rehashed else None
+
+def _make(password):
+    return make_password(password)
+
+def _check(password, encoded):
+    return check_password(password, encoded)
+
+class PasswordHashingPool:
+    """Bounded process pool for password hashing; ``workers=0`` hashes inline."""
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            with self._counter_lock:
+                self.rejected += 1
+            raise HashingBusy('Password hashing queue is full.')
+        with self._counter_lock:
+            self.pending += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is held until the worker is done, not until the caller stops
+        # waiting: a timed-out hash keeps its process busy and still counts
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise HashingBusy('Password hashing timed out.')
+
+    def _release(self, future=None):
+        with self._counter_lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def verify(self, password, encoded):
+        """Return ``(valid, rehashed)``; ``rehashed`` is set when the stored hash should be upgraded."""
+        return self._run(_verify, password, encoded)
+
+    def make_password(self, password):
+        return self._run(_make, password)
+
+    def check_password(self, password, encoded):
+        """Return whether ``password`` matches ``encoded``, without upgrading the hash."""
+        return self._run(_check, password, encoded)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+hashing_pool = PasswordHashingPool(
+    workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', 1),
+    max_pending=getattr(settings, 'PASSWORD_HASHING_MAX_PENDING', 64),
+    timeout=getattr(settings, 'PASSWORD_HASHING_TIMEOUT', 10),
+)
+if hashing_pool.workers:
+    register_queue('password_hashing', lambda: (hashing_pool.pending, hashing_pool.max_pending))
+
+class OffloadedModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` with the password hashing done in the pool.
+
+    Unknown emails still pay for one hash so response times do not reveal
+    which accounts exist, and inactive users are rejected. Hashes from a
+    non-preferred hasher (or with outdated parameters) are transparently
+    upgraded on successful login. ``HashingBusy`` propagates to the caller.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        User = get_user_model()
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            hashing_pool.make_password(password)
+            return None
+
+        valid, rehashed = hashing_pool.verify(password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if rehashed:
+            User._default_manager.filter(pk=user.pk).update(password=rehashed)
+            user.password = rehashed
+        return user
+
+def authenticate_offloaded(email, password, request=None):
+    """
+    Authenticate by email and password through ``AUTHENTICATION_BACKENDS``.
+
+    With ``OffloadedModelBackend`` configured the hashing runs in the pool;
+    failures send ``user_login_failed`` like any other ``authenticate()``.
+    """
+    return authenticate(request, email=email, password=password)
@@ -0,0 +1,52 @@
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from pymongo import UpdateOne
+from accounts.models import UserActivity
+from content.models import Content
+
+class Command(BaseCommand):
+    help = (
+        'Convert UserActivity content references stored as strings into integer '
+        'Content keys; references to unknown content are cleared.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        content_ids = set(Content.objects.values_list('id', flat=True))
+
+        # The ORM cannot filter on the stored BSON type, so read the collection directly
+        connection = connections['default']
+        connection.ensure_connection()
+        collection = connection.connection[UserActivity._meta.db_table]
+        legacy = {'content_id': {'$type': 'string'}}
+
+        converted = cleared = 0
+        last_id = None
+        while True:
+            query = dict(legacy, **({'_id': {'$gt': last_id}} if last_id is not None else {}))
+            docs = list(collection.find(query, {'_id': 1, 'content_id': 1}).sort('_id', 1).limit(batch_size))
+            if not docs:
+                break
+            updates = []
+            for doc in docs:
+                value = doc['content_id'].strip()
+                content_id = int(value) if value.isdigit() and int(value) in content_ids else None
+                if content_id is None:
+                    cleared += 1
+                else:
+                    converted += 1
+                updates.append(UpdateOne({'_id': doc['_id']}, {'$set': {'content_id': content_id}}))
+            if not options['dry_run']:
+                collection.bulk_write(updates, ordered=False)
+            last_id = docs[-1]['_id']
+
+        verb = 'Would convert' if options['dry_run'] else 'Converted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {converted} activity references; {cleared} pointed at missing content and "
+            f"{'would be' if options['dry_run'] else 'were'} cleared"
+        ))
@@ -0,0 +1,78 @@
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+from accounts.hashing import PasswordHashingPool
+
+PASSWORD = 'correct horse battery staple'
+
+def _check_loop(pool, encoded, deadline):
+    """Check ``encoded`` through ``pool`` until ``deadline`` and return the number of checks."""
+    count = 0
+    while time.perf_counter() < deadline:
+        pool.check_password(PASSWORD, encoded)
+        count += 1
+    return count
+
+class Command(BaseCommand):
+    help = (
+        'Measure password verifications (logins) per second per core for each configured hasher, '
+        'through check_password in a warmed hashing pool like the one logins use.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0, help='Measurement time per hasher.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes verifying in parallel.')
+        parser.add_argument(
+            '--hasher', action='append', choices=sorted(settings.PASSWORD_HASHER_CHOICES), dest='hashers',
+            help='Hasher to benchmark (repeatable, defaults to all available).'
+        )
+        parser.add_argument('--json', action='store_true', help='Print machine-readable results.')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        results = {}
+        for name in options['hashers'] or sorted(settings.PASSWORD_HASHER_CHOICES):
+            path = settings.PASSWORD_HASHER_CHOICES[name]
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as e:  # optional library such as argon2-cffi missing
+                self.stderr.write(f"Skipping {name}: {e}")
+                continue
+
+            # Two callers per process keep every process busy between results
+            callers = workers * 2
+            pool = PasswordHashingPool(workers=workers, max_pending=callers, timeout=None)
+            try:
+                with ThreadPoolExecutor(max_workers=callers) as threads:
+                    # Warm up: start every process and set Django up in it before measuring
+                    list(threads.map(lambda _: pool.check_password(PASSWORD, encoded), range(callers)))
+                    started = time.perf_counter()
+                    deadline = started + options['seconds']
+                    counts = list(threads.map(lambda _: _check_loop(pool, encoded, deadline), range(callers)))
+                    elapsed = time.perf_counter() - started
+            finally:
+                pool.shutdown()
+
+            total = sum(counts) / elapsed
+            results[name] = {
+                'algorithm': hasher.algorithm,
+                'workers': workers,
+                'logins_per_sec': round(total, 1),
+                'logins_per_sec_per_core': round(total / workers, 1),
+                'ms_per_login': round(1000 * workers / total, 2) if total else None,
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>8}: {result['logins_per_sec']:>8} logins/s total, "
+                f"{result['logins_per_sec_per_core']:>7} per core, {result['ms_per_login']} ms each"
+            )
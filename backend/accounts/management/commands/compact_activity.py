@@ -0,0 +1,36 @@
+
+import os
+from django.core.management.base import BaseCommand
+from accounts.retention import ARCHIVE_DIR, HOT_DAYS, compact
+from ml_service.snapshots import SNAPSHOT_DIR, export_activity, get_activity_snapshot
+
+class Command(BaseCommand):
+    help = (
+        'Move UserActivity older than the hot window into compressed daily archives '
+        'and daily aggregates. Safe to interrupt and re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hot-days', type=int, default=HOT_DAYS, help='Days of raw activity to keep.')
+        parser.add_argument('--max-days', type=int, help='Compact at most this many days in this run.')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between days.')
+        parser.add_argument('--archive-dir', default=ARCHIVE_DIR)
+
+    def handle(self, *args, **options):
+        # Keep the columnar snapshot complete before raw rows disappear
+        if get_activity_snapshot(SNAPSHOT_DIR) is not None:
+            exported = export_activity(SNAPSHOT_DIR)
+            self.stdout.write(f"Exported {exported} activities to the snapshot first")
+
+        days, rows = compact(
+            hot_days=options['hot_days'],
+            max_days=options['max_days'],
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            path=options['archive_dir'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {days} days ({rows} rows) into {os.path.abspath(options['archive_dir'])}"
+        ))
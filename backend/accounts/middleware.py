@@ -0,0 +1,16 @@
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+from .hashing import HashingBusy
+
+class HashingBusyMiddleware(MiddlewareMixin):
+    """
+    Answer 503 when a view lets ``HashingBusy`` escape, e.g. the admin login
+    form, whose ``authenticate()`` runs in the hashing pool.
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingBusy):
+            return None
+        response = HttpResponse(str(exception), status=503, content_type='text/plain')
+        response['Retry-After'] = '1'
+        return response
@@ -51,24 +51,74 @@ class User(AbstractUser):
         default='free'
     )
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    # Resized WebP/JPEG variants of ``avatar`` (zamanivault/images.py)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(blank=True)
     interests = models.JSONField(default=list, blank=True)
     phone_number = models.CharField(max_length=20, blank=True)
     last_login_ip = models.GenericIPAddressField(null=True, blank=True)
+    # Bumped whenever entitlements change so tokens carrying older claims are refreshed
+    entitlement_version = models.PositiveIntegerField(default=0)
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
     objects = UserManager()
 
+    # Fields that grant access; changing one bumps the entitlement version (subscriptions.entitlements)
+    ACCESS_FIELDS = ('is_active', 'is_staff')
+
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored access flags so changes to them can revoke older tokens
+        instance._loaded_access = tuple(instance.__dict__.get(field) for field in cls.ACCESS_FIELDS)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        """
+        Users built from token claims load all remaining fields in one query
+        the first time any deferred field is accessed. If the user has been
+        deleted since the token was issued, authentication fails.
+        """
+        claims = getattr(self, '_token_claims', None)
+        if fields is not None and claims:
+            deferred = self.get_deferred_fields()
+            if deferred and set(fields) <= deferred:
+                fields = list(deferred)
+        try:
+            super().refresh_from_db(using=using, fields=fields)
+        except self.DoesNotExist:
+            if not claims:
+                raise
+            from rest_framework.exceptions import AuthenticationFailed
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+    def save(self, *args, **kwargs):
+        """
+        Users built from token claims only write fields that were loaded from
+        the database or changed since, never the possibly stale claim values.
+        """
+        claims = getattr(self, '_token_claims', None)
+        if claims and kwargs.get('update_fields') is None and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                f.attname for f in self._meta.concrete_fields
+                if not f.primary_key and f.attname not in deferred
+                and (f.attname not in claims or getattr(self, f.attname) != claims[f.attname])
+            ]
+        super().save(*args, **kwargs)
+
 class UserActivity(models.Model):
     """Model to track user activity for ML recommendations."""
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activities')
-    content_id = models.CharField(max_length=50)
+    content = models.ForeignKey(
+        'content.Content', on_delete=models.SET_NULL, null=True, blank=True, related_name='activities'
+    )
     content_type = models.CharField(max_length=20)
     action = models.CharField(
         max_length=20,
@@ -86,3 +136,37 @@ class UserActivity(models.Model):
     class Meta:
         verbose_name_plural = 'User Activities'
         ordering = ['-created_at']
+        indexes = [
+            # Per-user history, newest first
+            models.Index(fields=['user', 'created_at']),
+            # Per-content aggregation by action over a time range
+            models.Index(fields=['content', 'action', 'created_at']),
+            models.Index(fields=['action', 'created_at']),
+            # Retention compaction walks the oldest days first
+            models.Index(fields=['created_at']),
+        ]
+
+class UserActivityDaily(models.Model):
+    """Compacted per-user activity counts for days moved out of the hot collection."""
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_activity')
+    day = models.DateField()
+    action = models.CharField(max_length=20)
+    content_type = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['user', 'day', 'action', 'content_type']
+        indexes = [models.Index(fields=['user', 'day'])]
+
+class ContentActivityDaily(models.Model):
+    """Compacted per-content activity counts for days moved out of the hot collection."""
+    
+    content = models.ForeignKey('content.Content', on_delete=models.CASCADE, related_name='daily_activity')
+    day = models.DateField()
+    action = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['content', 'day', 'action']
+        indexes = [models.Index(fields=['action', 'day'])]
@@ -0,0 +1,33 @@
+
+"""
+Native MongoDB reads and writes of ``UserActivity`` (see ``zamanivault.mongo``).
+
+Each function returns what the ORM query in its docstring returns.
+"""
+
+from zamanivault.mongo import NativeQuery, collection, column, insert, sort_spec, values
+from .models import UserActivity
+
+def record_activity(user_id, content_id, content_type, action, progress=0):
+    """``UserActivity.objects.create(...)``; sends ``post_save`` like the ORM does."""
+    return insert(UserActivity(
+        user_id=user_id, content_id=content_id, content_type=content_type, action=action, progress=progress
+    ))
+
+def user_activity(user_id):
+    """``UserActivity.objects.filter(user_id=user_id)``, lazily, for pagination."""
+    return NativeQuery(UserActivity, {column(UserActivity, 'user'): user_id})
+
+def user_activity_values(user_id):
+    """``list(UserActivity.objects.filter(user_id=user_id).values())``."""
+    documents = collection(UserActivity).find(
+        {column(UserActivity, 'user'): user_id}, {'_id': 0}
+    ).sort(sort_spec(UserActivity, UserActivity._meta.ordering))
+    return [values(UserActivity, document) for document in documents]
+
+def activity_content_ids(user_id):
+    """Ids of the content ``user_id`` has activity on, as a set."""
+    ids = collection(UserActivity).distinct(
+        column(UserActivity, 'content'), {column(UserActivity, 'user'): user_id}
+    )
+    return {content_id for content_id in ids if content_id is not None}
@@ -0,0 +1,262 @@
+
+"""
+Retention tiers for ``UserActivity``.
+
+Only the last ``ACTIVITY_HOT_DAYS`` days of raw events stay in the hot
+collection. ``compact`` moves each older day out, oldest first, in three
+steps:
+
+1. The day's raw rows are written to ``<ACTIVITY_ARCHIVE_DIR>/<day>.npz`` as
+   compressed columns, merged with any earlier archive of that day.
+2. The raw rows are deleted.
+3. ``UserActivityDaily`` and ``ContentActivityDaily`` are rebuilt from the
+   archive, and the day is recorded in the archive manifest. The new counts
+   are built first and then applied as differences, so the day's aggregates
+   never disappear while they are rebuilt.
+
+Every step can be repeated safely. A day whose archive exists but is not in
+the manifest has its aggregates rebuilt on the next run, so an interrupted
+compaction resumes where it stopped.
+
+Read paths that need long history combine aggregates, which exist only for
+compacted days, with hot rows, which exist only for the others. See
+``content_action_counts``.
+"""
+
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, time as dt_time, timedelta
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from content.models import Content
+from ml_service.snapshots import ACTIONS, encode_labels
+from .models import UserActivity, UserActivityDaily, ContentActivityDaily
+
+HOT_DAYS = getattr(settings, 'ACTIVITY_HOT_DAYS', 90)
+ARCHIVE_DIR = getattr(settings, 'ACTIVITY_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive', 'activity'))
+MANIFEST = 'compacted.json'
+
+CONTENT_TYPES = [value for value, _ in Content.CONTENT_TYPES]
+ARCHIVE_COLUMNS = {
+    'pk': np.int64,
+    'user_id': np.int32,
+    'content_id': np.int32,
+    'content_type': np.int8,
+    'action': np.int8,
+    'progress': np.float32,
+    'timestamp': np.uint32,
+}
+# Coded columns and the values their codes index. Each archive stores its own
+# ``<column>_labels``: these choices, then any other value found, verbatim.
+LABELS = {'action': ACTIONS, 'content_type': CONTENT_TYPES}
+
+def hot_cutoff(today=None, hot_days=HOT_DAYS):
+    """Return the first day kept in the hot collection."""
+    return (today or timezone.localdate()) - timedelta(days=hot_days - 1)
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, dt_time.min))
+    return start, start + timedelta(days=1)
+
+def archive_path(day, path=ARCHIVE_DIR):
+    return os.path.join(path, f"{day.isoformat()}.npz")
+
+def read_manifest(path=ARCHIVE_DIR):
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'days': []}
+
+def _write_manifest(manifest, path=ARCHIVE_DIR):
+    tmp = os.path.join(path, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+
+def read_archive(day, path=ARCHIVE_DIR):
+    """Return the archived columns for ``day``, or None."""
+    try:
+        with np.load(archive_path(day, path)) as archive:
+            columns = {name: archive[name] for name in ARCHIVE_COLUMNS}
+            for name, choices in LABELS.items():
+                # Archives written before the labels were stored used the choices' order
+                key = f"{name}_labels"
+                columns[key] = archive[key].tolist() if key in archive.files else list(choices)
+            return columns
+    except FileNotFoundError:
+        return None
+
+def _write_archive(day, columns, path=ARCHIVE_DIR):
+    os.makedirs(path, exist_ok=True)
+    final = archive_path(day, path)
+    tmp = final + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez_compressed(f, **columns)
+    os.replace(tmp, final)
+
+def _raw_columns(day, chunk_size):
+    """Read the raw rows of ``day`` in primary-key chunks into archive columns."""
+    start, end = day_bounds(day)
+    rows = []
+    last_pk = 0
+    while True:
+        chunk = list(
+            UserActivity.objects.filter(created_at__gte=start, created_at__lt=end, pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'user_id', 'content_id', 'content_type', 'action', 'progress', 'created_at')[:chunk_size]
+        )
+        if not chunk:
+            break
+        rows.extend(chunk)
+        last_pk = chunk[-1][0]
+    count = len(rows)
+    if not count:
+        return None
+    pks, user_ids, content_ids, content_types, actions, progress, created = zip(*rows)
+    action_labels, content_type_labels = list(ACTIONS), list(CONTENT_TYPES)
+    return {
+        'pk': np.fromiter(pks, dtype=np.int64, count=count),
+        'user_id': np.fromiter(user_ids, dtype=np.int32, count=count),
+        'content_id': np.fromiter((-1 if c is None else c for c in content_ids), dtype=np.int32, count=count),
+        'content_type': np.array(encode_labels(content_types, content_type_labels), dtype=np.int8),
+        'action': np.array(encode_labels(actions, action_labels), dtype=np.int8),
+        'progress': np.fromiter(progress, dtype=np.float32, count=count),
+        'timestamp': np.fromiter((int(c.timestamp()) for c in created), dtype=np.uint32, count=count),
+        'action_labels': action_labels,
+        'content_type_labels': content_type_labels,
+    }
+
+def _merge(existing, new):
+    if existing is None:
+        return new
+    merged = {}
+    for name in LABELS:
+        # Recode the new rows against the existing archive's labels
+        labels = list(existing[f"{name}_labels"])
+        recode = np.array(encode_labels(new[f"{name}_labels"], labels), dtype=np.int8)
+        merged[name] = np.concatenate([existing[name], recode[new[name]]])
+        merged[f"{name}_labels"] = labels
+    for name in ARCHIVE_COLUMNS:
+        if name not in merged:
+            merged[name] = np.concatenate([existing[name], new[name]])
+    _, first = np.unique(merged['pk'], return_index=True)
+    return {name: merged[name][first] if name in ARCHIVE_COLUMNS else merged[name] for name in merged}
+
+def _label(choices, code):
+    return choices[code] if 0 <= code < len(choices) else ''
+
+def _replace_day_rows(model, day, key_fields, counts, batch_size):
+    """
+    Make the rows of ``model`` for ``day`` hold ``counts`` (``{key: count}``).
+
+    The new counts are compared with the stored rows and applied as inserts,
+    then updates, then deletes, so readers never find the day without rows.
+    """
+    stale = {}
+    for pk, *key, count in model.objects.filter(day=day).values_list('pk', *key_fields, 'count').iterator():
+        stale[tuple(key)] = (pk, count)
+    created, changed = [], {}
+    for key, count in counts.items():
+        current = stale.pop(key, None)
+        if current is None:
+            created.append(model(day=day, count=count, **dict(zip(key_fields, key))))
+        elif current[1] != count:
+            changed.setdefault(count, []).append(current[0])
+    model.objects.bulk_create(created, batch_size=batch_size)
+    # One update per distinct count; djongo cannot translate bulk_update's CASE WHEN
+    for count, pks in changed.items():
+        model.objects.filter(pk__in=pks).update(count=count)
+    if stale:
+        model.objects.filter(pk__in=[pk for pk, _ in stale.values()]).delete()
+
+def rebuild_aggregates(day, columns, batch_size=5000):
+    """Replace the daily aggregates of ``day`` with counts from ``columns``."""
+    actions, content_types = columns['action_labels'], columns['content_type_labels']
+    user_counts = Counter()
+    for (user_id, action, content_type), count in Counter(zip(
+        columns['user_id'].tolist(), columns['action'].tolist(), columns['content_type'].tolist()
+    )).items():
+        user_counts[(user_id, _label(actions, action), _label(content_types, content_type))] += count
+    content_counts = Counter()
+    for (content_id, action), count in Counter(
+        zip(columns['content_id'].tolist(), columns['action'].tolist())
+    ).items():
+        if content_id >= 0:
+            content_counts[(content_id, _label(actions, action))] += count
+    _replace_day_rows(UserActivityDaily, day, ('user_id', 'action', 'content_type'), user_counts, batch_size)
+    _replace_day_rows(ContentActivityDaily, day, ('content_id', 'action'), content_counts, batch_size)
+
+def compact_day(day, chunk_size=5000, path=ARCHIVE_DIR):
+    """Archive, delete and aggregate the raw rows of ``day``; return the rows moved."""
+    raw = _raw_columns(day, chunk_size)
+    archive = read_archive(day, path)
+    if raw is not None:
+        archive = _merge(archive, raw)
+        _write_archive(day, archive, path)
+        start, end = day_bounds(day)
+        UserActivity.objects.filter(created_at__gte=start, created_at__lt=end, pk__lte=int(raw['pk'].max())).delete()
+    if archive is not None:
+        rebuild_aggregates(day, archive, batch_size=chunk_size)
+        manifest = read_manifest(path)
+        if day.isoformat() not in manifest['days']:
+            manifest['days'] = sorted(manifest['days'] + [day.isoformat()])
+            _write_manifest(manifest, path)
+    return 0 if raw is None else len(raw['pk'])
+
+def unfinished_days(path=ARCHIVE_DIR):
+    """Days archived by an interrupted run whose aggregates were not recorded."""
+    if not os.path.isdir(path):
+        return []
+    done = set(read_manifest(path)['days'])
+    archived = (name[:-len('.npz')] for name in os.listdir(path) if name.endswith('.npz'))
+    return sorted(datetime.strptime(day, '%Y-%m-%d').date() for day in archived if day not in done)
+
+def compact(today=None, hot_days=HOT_DAYS, max_days=None, chunk_size=5000, pause=0.0, path=ARCHIVE_DIR, stdout=None):
+    """
+    Compact every day older than the hot window, oldest first.
+
+    Processes at most ``max_days`` days and sleeps ``pause`` seconds between
+    days to limit load. Returns ``(days, rows)`` compacted.
+    """
+    cutoff_day = hot_cutoff(today, hot_days)
+    cutoff, _ = day_bounds(cutoff_day)
+    days = rows = 0
+    pending = unfinished_days(path)
+    while max_days is None or days < max_days:
+        if pending:
+            day = pending.pop(0)
+        else:
+            oldest = (
+                UserActivity.objects.filter(created_at__lt=cutoff).order_by('created_at')
+                .values_list('created_at', flat=True).first()
+            )
+            if oldest is None:
+                break
+            day = timezone.localdate(oldest)
+        moved = compact_day(day, chunk_size, path)
+        days += 1
+        rows += moved
+        if stdout is not None:
+            stdout.write(f"Compacted {day}: {moved} rows")
+        if pause:
+            time.sleep(pause)
+    return days, rows
+
+def content_action_counts(action='view', since=None):
+    """
+    Count ``action`` events per content id since ``since`` (a date), over both
+    the compacted aggregates and the hot rows.
+    """
+    counts = Counter()
+    aggregates = ContentActivityDaily.objects.filter(action=action)
+    hot = UserActivity.objects.filter(action=action, content__isnull=False)
+    if since is not None:
+        aggregates = aggregates.filter(day__gte=since)
+        hot = hot.filter(created_at__gte=day_bounds(since)[0])
+    for content_id, count in aggregates.values_list('content_id', 'count').iterator():
+        counts[content_id] += count
+    counts.update(hot.values_list('content_id', flat=True).iterator())
+    return counts
@@ -1,9 +1,12 @@
 
 from rest_framework import serializers
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.tokens import RefreshToken
+from content.models import Content
 from .models import UserActivity
+from .authentication import add_entitlement_claims
+from .hashing import authenticate_offloaded, hashing_pool
 
 User = get_user_model()
 
@@ -36,7 +39,13 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        return User.objects.create_user(**validated_data)
+        # Hash in the worker pool rather than on the request thread
+        password = hashing_pool.make_password(validated_data.pop('password'))
+        email = User.objects.normalize_email(validated_data.pop('email'))
+        user = User(email=email, **validated_data)
+        user.password = password
+        user.save()
+        return user
 
 class UserLoginSerializer(serializers.Serializer):
     """Serializer for user login."""
@@ -49,7 +58,7 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get('password')
         
         if email and password:
-            user = authenticate(request=self.context.get('request'), username=email, password=password)
+            user = authenticate_offloaded(email, password, request=self.context.get('request'))
             
             if not user:
                 msg = _('Unable to log in with provided credentials.')
@@ -70,7 +79,9 @@ class TokenSerializer(serializers.Serializer):
     
     @classmethod
     def get_token(cls, user):
-        refresh = RefreshToken.for_user(user)
+        # Claims are copied into the access token so requests can be
+        # authenticated without loading the user row
+        refresh = add_entitlement_claims(RefreshToken.for_user(user), user)
         return {
             'refresh': str(refresh),
             'access': str(refresh.access_token),
@@ -80,6 +91,10 @@ class TokenSerializer(serializers.Serializer):
 class UserActivitySerializer(serializers.ModelSerializer):
     """Serializer for user activity."""
     
+    content_id = serializers.PrimaryKeyRelatedField(
+        source='content', queryset=Content.objects.all(), allow_null=True, required=False
+    )
+    
     class Meta:
         model = UserActivity
         fields = ['id', 'user', 'content_id', 'content_type', 'action', 'progress', 'created_at']
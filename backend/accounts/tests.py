@@ -0,0 +1,63 @@
+"""Parity of the native activity repository with the ORM queries it replaces."""
+
+from datetime import timedelta
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from content.models import Content
+from . import repository
+from .models import UserActivity
+
+# djongo has no transactions to roll back, so each test flushes the tables instead
+pytestmark = pytest.mark.django_db(transaction=True)
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user('reader@example.com', 'secret123')
+
+@pytest.fixture
+def activity(user):
+    other = get_user_model().objects.create_user('other@example.com', 'secret123')
+    items = [
+        Content.objects.create(title=f"Item {i}", description='', content_type='book', image='content_images/x.jpg')
+        for i in range(3)
+    ]
+    now = timezone.now().replace(microsecond=0)
+    rows = [
+        (user, items[0], 'view', 0.5), (user, items[1], 'like', 0), (user, None, 'share', 0),
+        (user, items[0], 'complete', 1), (other, items[2], 'view', 0.2),
+    ]
+    for i, (owner, content, action, progress) in enumerate(rows):
+        row = UserActivity.objects.create(
+            user=owner, content=content, content_type='book', action=action, progress=progress
+        )
+        # Distinct creation times, so the default ordering has no ties
+        UserActivity.objects.filter(pk=row.pk).update(created_at=now - timedelta(minutes=i))
+    return items
+
+def test_record_activity_matches_orm(user, activity):
+    native = repository.record_activity(user.pk, activity[2].pk, 'book', 'bookmark', progress=0.3)
+    stored = UserActivity.objects.get(pk=native.pk)
+    assert (stored.user_id, stored.content_id, stored.content_type, stored.action, stored.progress) == (
+        user.pk, activity[2].pk, 'book', 'bookmark', 0.3
+    )
+    assert abs(stored.created_at - native.created_at) < timedelta(milliseconds=1)
+    # The ORM sequence continues past natively reserved ids
+    later = UserActivity.objects.create(user=user, content_type='book', action='view')
+    assert later.pk > native.pk
+
+def test_user_activity_matches_orm(user, activity):
+    native = repository.user_activity(user.pk)
+    expected = UserActivity.objects.filter(user_id=user.pk)
+    assert native.count() == expected.count()
+    assert list(native[0:10]) == list(expected[:10])
+    assert list(native[1:3]) == list(expected[1:3])
+
+def test_user_activity_values_matches_orm(user, activity):
+    assert repository.user_activity_values(user.pk) == list(UserActivity.objects.filter(user_id=user.pk).values())
+
+def test_activity_content_ids_matches_orm(user, activity):
+    expected = set(
+        UserActivity.objects.filter(user_id=user.pk, content__isnull=False).values_list('content_id', flat=True)
+    )
+    assert repository.activity_content_ids(user.pk) == expected
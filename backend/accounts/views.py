@@ -10,11 +10,22 @@ from .serializers import (
     SubscriptionUpdateSerializer
 )
 from .models import UserActivity
+from . import repository as activity_repository
+from .hashing import HashingBusy
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
+from zamanivault.mongo import NATIVE_QUERIES
 
 User = get_user_model()
 
+def hashing_busy_response(error):
+    """
+    Fast 429 for logins and registrations while the hashing pool is saturated.
+    """
+    response = Response({"error": str(error)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response['Retry-After'] = '1'
+    return response
+
 class UserRegistrationView(generics.CreateAPIView):
     """
     API View for user registration.
@@ -25,7 +36,10 @@ class UserRegistrationView(generics.CreateAPIView):
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
+            try:
+                user = serializer.save()
+            except HashingBusy as e:
+                return hashing_busy_response(e)
             token_data = TokenSerializer.get_token(user)
             return Response(token_data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -39,7 +53,11 @@ class UserLoginView(APIView):
 
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data, context={'request': request})
-        if serializer.is_valid():
+        try:
+            valid = serializer.is_valid()
+        except HashingBusy as e:
+            return hashing_busy_response(e)
+        if valid:
             user = serializer.validated_data['user']
             token_data = TokenSerializer.get_token(user)
             return Response(token_data, status=status.HTTP_200_OK)
@@ -107,9 +125,19 @@ class UserActivityListView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
+        if NATIVE_QUERIES:
+            return activity_repository.user_activity(self.request.user.id)
         return UserActivity.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
+        if NATIVE_QUERIES:
+            data = serializer.validated_data
+            content = data.get('content')
+            serializer.instance = activity_repository.record_activity(
+                self.request.user.id, content.id if content is not None else None,
+                data['content_type'], data['action'], data.get('progress', 0)
+            )
+            return
         serializer.save(user=self.request.user)
 
 class AdminUserListView(generics.ListAPIView):
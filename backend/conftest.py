@@ -0,0 +1,28 @@
+"""
+Tests that use the database need a reachable MongoDB (``MONGODB_URI``);
+djongo creates and drops a ``test_`` database on it. Without one they are
+skipped rather than failed.
+"""
+
+import pytest
+from django.conf import settings
+
+def mongod_available():
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(settings.DATABASES['default']['CLIENT']['host'], serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command('ping')
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+def pytest_collection_modifyitems(config, items):
+    needs_db = [item for item in items if item.get_closest_marker('django_db')]
+    if needs_db and not mongod_available():
+        skip = pytest.mark.skip(reason='MongoDB is not reachable')
+        for item in needs_db:
+            item.add_marker(skip)
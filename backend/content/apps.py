@@ -1,6 +1,18 @@
 
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+def create_unique_indexes(sender, **kwargs):
+    # Favorite and watchlist toggles rely on these when writing natively
+    from zamanivault.mongo import ensure_unique_indexes
+    from .models import UserFavorite, UserWatchlist
+    ensure_unique_indexes(UserFavorite, UserWatchlist)
 
 class ContentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'content'
+
+    def ready(self):
+        from zamanivault.images import connect_signals
+        connect_signals()
+        post_migrate.connect(create_unique_indexes, sender=self)
@@ -0,0 +1,94 @@
+
+"""
+Async variants of the ``ContentViewSet`` list and retrieve endpoints.
+
+They keep the search, ordering and pagination behaviour of the viewset.
+Queries use the async ORM. Serializers, which may query per item, run in a
+worker thread.
+"""
+
+from asgiref.sync import sync_to_async
+from django.db.models import F
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from zamanivault.async_api import async_api_view, json_response
+from accounts.models import UserActivity
+from subscriptions.entitlements import get_entitlement
+from .models import Content
+from .serializers import ContentSerializer, ContentDetailSerializer
+from .views import ContentViewSet
+
+def _drf_request(request):
+    """Wrap ``request`` for DRF serializers and filters, keeping the authenticated user."""
+    drf_request = Request(request, authenticators=())
+    drf_request.user = request.user
+    return drf_request
+
+def _filtered_queryset(request):
+    """Apply the viewset's search and ordering filters without evaluating the queryset."""
+    view = ContentViewSet(action='list', request=_drf_request(request), format_kwarg=None)
+    return view.filter_queryset(Content.objects.all()), view.request
+
+def _page_url(request, page):
+    url = request.build_absolute_uri()
+    if page == 1:
+        return remove_query_param(url, 'page')
+    return replace_query_param(url, 'page', page)
+
+@async_api_view()
+async def content_list(request):
+    """
+    Async version of ``ContentViewSet.list``.
+    """
+    queryset, drf_request = _filtered_queryset(request)
+    page_size = api_settings.PAGE_SIZE
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return json_response({'detail': 'Invalid page.'}, status=404)
+
+    count = await queryset.acount()
+    offset = (page - 1) * page_size
+    if offset and offset >= count:
+        return json_response({'detail': 'Invalid page.'}, status=404)
+    items = [item async for item in queryset[offset:offset + page_size]]
+
+    context = {
+        'request': drf_request,
+        'entitlement': await sync_to_async(get_entitlement)(request.user),
+    }
+    results = await sync_to_async(lambda: ContentSerializer(items, many=True, context=context).data)()
+    return json_response({
+        'count': count,
+        'next': _page_url(request, page + 1) if offset + page_size < count else None,
+        'previous': _page_url(request, page - 1) if page > 1 else None,
+        'results': results,
+    })
+
+@async_api_view()
+async def content_detail(request, pk):
+    """
+    Async version of ``ContentViewSet.retrieve``; increments the view count
+    and logs the view like the synchronous endpoint.
+    """
+    try:
+        instance = await Content.objects.aget(pk=pk)
+    except Content.DoesNotExist:
+        return json_response({'detail': 'Not found.'}, status=404)
+
+    await Content.objects.filter(pk=pk).aupdate(view_count=F('view_count') + 1)
+    instance.view_count += 1
+    await UserActivity.objects.acreate(
+        user_id=request.user.id,
+        content_id=instance.id,
+        content_type=instance.content_type,
+        action='view'
+    )
+
+    context = {
+        'request': _drf_request(request),
+        'entitlement': await sync_to_async(get_entitlement)(request.user),
+    }
+    data = await sync_to_async(lambda: ContentDetailSerializer(instance, context=context).data)()
+    return json_response(data)
@@ -0,0 +1,272 @@
+
+"""
+Bulk synthetic dataset generation for load and performance testing.
+
+The dataset is split into chunks of users and chunks of content. Each chunk
+is generated from its own seed, derived from ``(seed, kind, chunk index)``,
+in a worker process and written with ``bulk_create``. Chunks can therefore be
+generated in any order and on any number of processes. Nothing reads the
+clock: dates are relative to ``spec['now']``, so the same arguments always
+give the same data.
+
+Users and content get explicit primary keys, so that other rows can refer
+to them without reading them back. The keys are reserved from djongo's
+``__schema__`` sequence (``zamanivault.mongo.reserve_ids``) before any row
+is written, so that ordinary inserts afterwards continue past the generated
+ids. Generated values (emails, names, text) depend on the row's index in
+the dataset, never on its key, so the data is the same whatever keys were
+reserved.
+
+Item popularity, per-user activity and comment volume follow power laws,
+and each user prefers a couple of topics; activity is drawn by
+``ml_service.synthetic.sample_events``, as for the offline benchmark.
+"""
+
+import functools
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+from ml_service.synthetic import TOPICS, CONTENT_TYPES, ACTIONS, REGIONS, sample_events, topic_samplers, zipf_weights
+
+TOPIC_NAMES = list(TOPICS)
+SUBSCRIPTION_STATUSES = ['active', 'active', 'active', 'trial', 'canceled', 'expired']
+
+# Seed streams, so each kind of chunk draws independent numbers
+LAYOUT, CONTENT, USERS, ACTIVITY, COMMENTS = range(5)
+
+@functools.lru_cache(maxsize=4)
+def catalogue_layout(seed, n_content):
+    """
+    Per-item topic, type, premium flag and popularity, shared by all chunks.
+
+    Returns a dict of arrays plus, per topic, the member indices and the
+    cumulative popularity used to sample items of that topic.
+    """
+    rng = np.random.default_rng([seed, LAYOUT])
+    topics = rng.integers(0, len(TOPIC_NAMES), n_content)
+    popularity = zipf_weights(n_content)[rng.permutation(n_content)]
+    return {
+        'topics': topics,
+        'types': rng.integers(0, len(CONTENT_TYPES), n_content),
+        'popularity': popularity,
+        'by_topic': topic_samplers(topics, popularity),
+    }
+
+@contextmanager
+def explicit_created_at(*models):
+    """
+    Let ``bulk_create`` keep the ``created_at`` values set on the instances.
+
+    The flag lives on the shared model field, so it is restored to what it
+    was on the way out, whatever happens inside the block.
+    """
+    fields = [model._meta.get_field('created_at') for model in models]
+    previous = [field.auto_now_add for field in fields]
+    try:
+        for field in fields:
+            field.auto_now_add = False
+        yield
+    finally:
+        for field, auto_now_add in zip(fields, previous):
+            field.auto_now_add = auto_now_add
+
+def loadtest_email(seed, index):
+    """Email of the generated user at ``index``; unique per seed."""
+    return f"loadtest{seed}-{index}@example.com"
+
+def init_worker():
+    import django
+    from django.apps import apps
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zamanivault.settings')
+    if not apps.ready:
+        django.setup()
+    # Never reuse a database client inherited from the parent process
+    from django.db import connections
+    connections.close_all()
+
+def generate_content_chunk(spec, chunk, start, stop):
+    """Write content items ``start``..``stop`` (0-based) with their categories; return the row count."""
+    from .models import Content, ContentCategory
+
+    rng = np.random.default_rng([spec['seed'], CONTENT, chunk])
+    layout = catalogue_layout(spec['seed'], spec['content'])
+    n = stop - start
+    words = rng.integers(0, 10, (n, 6))
+    premium = rng.random(n) < spec['premium_ratio']
+    view_counts = (layout['popularity'][start:stop] * spec['content'] * 50 * (0.5 + rng.random(n))).astype(np.int64)
+    years = rng.integers(1950, 2025, n)
+    regions = rng.integers(0, len(REGIONS), n)
+    featured = rng.random(n) < 0.01
+    extra_category = rng.random(n) < 0.4
+
+    contents, links = [], []
+    for offset in range(n):
+        index = start + offset
+        content_id = spec['content_base'] + index
+        topic = layout['topics'][index]
+        vocab = TOPICS[TOPIC_NAMES[topic]]
+        tokens = [vocab[w] for w in words[offset]]
+        contents.append(Content(
+            id=content_id,
+            title=' '.join(tokens[:3]).title(),
+            description=' '.join(tokens),
+            content_type=CONTENT_TYPES[layout['types'][index]],
+            image='content_images/placeholder.jpg',
+            is_premium=bool(premium[offset]),
+            tags=tokens[3:],
+            creator=f"Creator {index % 997}",
+            year=int(years[offset]),
+            region=REGIONS[regions[offset]],
+            language='English',
+            view_count=int(view_counts[offset]),
+            is_featured=bool(featured[offset]),
+        ))
+        category_ids = spec['topic_categories'][topic]
+        chosen = rng.choice(len(category_ids), size=min(len(category_ids), 1 + int(extra_category[offset])), replace=False)
+        links.extend(ContentCategory(content_id=content_id, category_id=category_ids[c]) for c in chosen)
+
+    Content.objects.bulk_create(contents, batch_size=spec['batch_size'])
+    ContentCategory.objects.bulk_create(links, batch_size=spec['batch_size'])
+    return len(contents)
+
+def generate_user_chunk(spec, chunk, start, stop):
+    """Write users ``start``..``stop`` (0-based) and their subscriptions; return the row count."""
+    from django.contrib.auth import get_user_model
+    from subscriptions.models import UserSubscription
+
+    User = get_user_model()
+    rng = np.random.default_rng([spec['seed'], USERS, chunk])
+    n = stop - start
+    subscribed = rng.random(n) < spec['subscriber_ratio']
+    plans = rng.integers(0, len(spec['paid_plans']), n)
+    statuses = rng.integers(0, len(SUBSCRIPTION_STATUSES), n)
+    joined_days = rng.integers(0, spec['days'], n)
+    today = datetime.fromtimestamp(spec['now'], dt_timezone.utc).date()
+
+    users, subscriptions = [], []
+    for offset in range(n):
+        index = start + offset
+        user_id = spec['user_base'] + index
+        plan_id, plan_type = spec['paid_plans'][plans[offset]]
+        status = SUBSCRIPTION_STATUSES[statuses[offset]]
+        entitled = subscribed[offset] and status != 'expired'
+        users.append(User(
+            id=user_id,
+            email=loadtest_email(spec['seed'], index),
+            password=spec['password_hash'],
+            first_name='Load',
+            last_name=f"User {index}",
+            subscription_type=plan_type if entitled else 'free',
+            interests=[TOPIC_NAMES[index % len(TOPIC_NAMES)]],
+        ))
+        if subscribed[offset]:
+            start_date = today - timedelta(days=int(joined_days[offset]))
+            subscriptions.append(UserSubscription(
+                user_id=user_id,
+                plan_id=plan_id,
+                status=status,
+                start_date=start_date,
+                end_date=start_date + timedelta(days=30 * (1 + int(joined_days[offset]) // 30)),
+                payment_method='loadtest',
+            ))
+
+    User.objects.bulk_create(users, batch_size=spec['batch_size'])
+    UserSubscription.objects.bulk_create(subscriptions, batch_size=spec['batch_size'])
+    return len(users)
+
+def generate_activity_chunk(spec, chunk, start, stop):
+    """Write activity and favorites for users ``start``..``stop``; return the activity count."""
+    from accounts.models import UserActivity
+    from .models import UserFavorite
+
+    rng = np.random.default_rng([spec['seed'], ACTIVITY, chunk])
+    layout = catalogue_layout(spec['seed'], spec['content'])
+    user_index, items, actions, progress = sample_events(
+        rng, stop - start, spec['events_per_user'], layout['by_topic'], spec['content']
+    )
+    total = len(user_index)
+    timestamps = spec['now'] - rng.integers(0, spec['days'] * 86400, total)
+
+    activities = []
+    for i in range(total):
+        index = int(items[i])
+        activities.append(UserActivity(
+            user_id=spec['user_base'] + start + int(user_index[i]),
+            content_id=spec['content_base'] + index,
+            content_type=CONTENT_TYPES[layout['types'][index]],
+            action=ACTIONS[actions[i]],
+            progress=float(progress[i]),
+            created_at=datetime.fromtimestamp(int(timestamps[i]), dt_timezone.utc),
+        ))
+
+    # Users favorite some of the items they liked or bookmarked
+    favorites = {}
+    for i in np.flatnonzero((actions == 1) | (actions == 2)):
+        key = (spec['user_base'] + start + int(user_index[i]), spec['content_base'] + int(items[i]))
+        favorites.setdefault(key, int(timestamps[i]))
+
+    with explicit_created_at(UserActivity, UserFavorite):
+        UserActivity.objects.bulk_create(activities, batch_size=spec['batch_size'])
+        UserFavorite.objects.bulk_create(
+            [
+                UserFavorite(
+                    user_id=user_id, content_id=content_id,
+                    created_at=datetime.fromtimestamp(timestamp, dt_timezone.utc)
+                )
+                for (user_id, content_id), timestamp in favorites.items()
+            ],
+            batch_size=spec['batch_size']
+        )
+    return total
+
+def generate_comment_chunk(spec, chunk, start, stop):
+    """Write comments on content items ``start``..``stop``; return the row count."""
+    from .models import Comment
+
+    rng = np.random.default_rng([spec['seed'], COMMENTS, chunk])
+    layout = catalogue_layout(spec['seed'], spec['content'])
+    # Comment volume follows item popularity
+    expected = layout['popularity'][start:stop] * spec['content'] * spec['comments_per_item']
+    counts = rng.poisson(expected)
+    total = int(counts.sum())
+    item_index = np.repeat(np.arange(start, stop), counts)
+    authors = spec['user_base'] + np.minimum(
+        (rng.pareto(1.2, total) * spec['users'] / 20).astype(np.int64), spec['users'] - 1
+    )
+    timestamps = spec['now'] - rng.integers(0, spec['days'] * 86400, total)
+
+    comments = [
+        Comment(
+            content_id=spec['content_base'] + int(item_index[i]),
+            user_id=int(authors[i]),
+            text=f"Comment {i} on item {int(item_index[i])}.",
+            created_at=datetime.fromtimestamp(int(timestamps[i]), dt_timezone.utc),
+        )
+        for i in range(total)
+    ]
+    with explicit_created_at(Comment):
+        Comment.objects.bulk_create(comments, batch_size=spec['batch_size'])
+    return total
+
+GENERATORS = {
+    'content': generate_content_chunk,
+    'users': generate_user_chunk,
+    'activity': generate_activity_chunk,
+    'comments': generate_comment_chunk,
+}
+
+def run_chunk(kind, spec, chunk, start, stop):
+    """Process-pool entry point; closes the worker's connection after each chunk."""
+    from django.db import connections
+
+    try:
+        return kind, GENERATORS[kind](spec, chunk, start, stop)
+    finally:
+        connections.close_all()
+
+def chunks(total, chunk_size):
+    """Yield ``(chunk index, start, stop)`` covering ``range(total)``."""
+    for chunk, start in enumerate(range(0, total, chunk_size)):
+        yield chunk, start, min(start + chunk_size, total)
@@ -0,0 +1,214 @@
+
+"""
+Compiled, read-only serialization of the content list and detail payloads.
+
+For every item, ``ContentSerializer`` builds a model instance, then walks
+its fields one by one: an attribute lookup, a ``to_representation`` call
+and an ``OrderedDict`` insertion per field. On the list endpoints that
+costs more CPU than the query.
+
+``RowSerializer`` compiles a ``ModelSerializer`` class once into a flat
+list of steps, one per field, and applies them to rows shaped like
+``QuerySet.values()`` (see ``zamanivault.mongo.values``), so no instance is
+built. The output is the JSON the serializer itself would produce: the same
+keys in the same order, file URLs made absolute, datetimes in DRF's format
+and premium fields withheld. Each method field is a ``get_<name>(row)``
+method of the subclass. A field of a type the compiler does not know
+raises ``ImproperlyConfigured`` on first use rather than producing
+different output.
+
+``manage.py benchmark_serializers`` measures both paths in rows per second
+and checks that their output is identical.
+"""
+
+from datetime import timezone as dt_timezone
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from subscriptions.entitlements import get_entitlement
+from zamanivault.images import srcsets
+from .media import stream_url
+from .serializers import CategorySerializer, CommentSerializer, ContentSerializer, ContentDetailSerializer
+from . import repository
+from .models import Comment
+
+ENABLED = getattr(settings, 'CONTENT_FAST_SERIALIZERS', True)
+
+# Fields whose representation is the stored value itself
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField, serializers.IntegerField,
+    serializers.JSONField, serializers.PrimaryKeyRelatedField,
+)
+
+def compile_fields(serializer_class):
+    """
+    Return ``[(key, attname, converter), ...]`` for the readable fields of
+    ``serializer_class``, in output order.
+
+    ``attname`` is the ``values()`` key to read, or None for a method field.
+    ``converter`` names the ``RowSerializer`` method applied to non-null
+    values (or to the whole row for a method field); None means the value is
+    used as it is.
+    """
+    model = serializer_class.Meta.model
+    steps = []
+    for key, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            steps.append((key, None, field.method_name or f'get_{key}'))
+            continue
+        attname = model._meta.get_field(field.source).attname
+        if isinstance(field, serializers.FileField):
+            steps.append((key, attname, 'file_url'))
+        elif isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            if output_format is None or output_format.lower() != ISO_8601:
+                raise ImproperlyConfigured(f"{serializer_class.__name__}.{key}: only ISO 8601 output is compiled.")
+            steps.append((key, attname, 'datetime'))
+        elif isinstance(field, PASSTHROUGH_FIELDS):
+            steps.append((key, attname, None))
+        else:
+            raise ImproperlyConfigured(
+                f"{serializer_class.__name__}.{key}: cannot compile a {type(field).__name__}."
+            )
+    return steps
+
+class RowSerializer:
+    """Serializes ``values()`` rows exactly as ``serializer_class`` serializes instances."""
+
+    serializer_class = None
+    _compiled = None
+
+    def __init__(self, context=None):
+        self.context = context if context is not None else {}
+        self.request = self.context.get('request')
+        cls = type(self)
+        if cls.__dict__.get('_compiled') is None:
+            cls._compiled = compile_fields(cls.serializer_class)
+        self.steps = [
+            (key, attname, getattr(self, converter) if converter else None)
+            for key, attname, converter in cls._compiled
+        ]
+        self.timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        model = cls.serializer_class.Meta.model
+        self.storages = {
+            field.attname: field.storage for field in model._meta.concrete_fields if hasattr(field, 'storage')
+        }
+
+    def to_representation(self, row):
+        data = {}
+        for key, attname, convert in self.steps:
+            if attname is None:
+                data[key] = convert(row)
+            elif convert is None:
+                data[key] = row[attname]
+            else:
+                value = row[attname]
+                data[key] = None if value is None else convert(value, attname)
+        return data
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+    def file_url(self, name, attname):
+        # FileField.to_representation with UPLOADED_FILES_USE_URL
+        if not name:
+            return None
+        if not api_settings.UPLOADED_FILES_USE_URL:
+            return name
+        url = self.storages[attname].url(name)
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+    def datetime(self, value, attname):
+        # DateTimeField.enforce_timezone followed by its ISO 8601 formatting
+        if self.timezone is not None:
+            if timezone.is_aware(value):
+                value = value.astimezone(self.timezone)
+            else:
+                value = timezone.make_aware(value, self.timezone)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, dt_timezone.utc)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+class CategoryRows(RowSerializer):
+    serializer_class = CategorySerializer
+
+    def get_image_srcset(self, row):
+        return srcsets(row['image_variants'], self.request)
+
+class ContentRows(RowSerializer):
+    """
+    ``ContentSerializer`` for ``values()`` rows.
+
+    ``serialize()`` resolves whatever the context does not already hold, for
+    the whole page at once: categories (``content_categories``, as
+    ``values()`` rows), favorites and watchlist.
+    """
+
+    serializer_class = ContentSerializer
+
+    def __init__(self, context=None):
+        super().__init__(context)
+        entitlement = self.context.get('entitlement')
+        if entitlement is None:
+            entitlement = get_entitlement(getattr(self.request, 'user', None))
+            self.context['entitlement'] = entitlement
+        self.has_premium = entitlement.has_premium
+        user = getattr(self.request, 'user', None)
+        self.user_id = user.pk if user is not None and user.is_authenticated else None
+        # ContentSerializer.get_categories serializes categories without the request
+        self.category_rows = CategoryRows()
+
+    def serialize(self, rows):
+        rows = list(rows)
+        content_ids = [row['id'] for row in rows]
+        if 'content_categories' not in self.context:
+            self.context['content_categories'] = repository.content_categories(content_ids, as_values=True)
+        for key, members in (
+            ('favorited_ids', repository.favorite_content_ids), ('watchlist_ids', repository.watchlist_content_ids)
+        ):
+            if key not in self.context:
+                self.context[key] = members(self.user_id, content_ids) if self.user_id is not None else set()
+        return super().serialize(rows)
+
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        if row['is_premium'] and not self.has_premium:
+            for field in ContentSerializer.PREMIUM_FIELDS:
+                if field in data:
+                    data[field] = None
+        return data
+
+    def get_image_srcset(self, row):
+        return srcsets(row['image_variants'], self.request)
+
+    def get_categories(self, row):
+        return self.category_rows.serialize(self.context['content_categories'].get(row['id'], ()))
+
+    def get_is_favorited(self, row):
+        return row['id'] in self.context['favorited_ids']
+
+    def get_is_in_watchlist(self, row):
+        return row['id'] in self.context['watchlist_ids']
+
+class ContentDetailRows(ContentRows):
+    """``ContentDetailSerializer`` for a ``values()`` row; comments still go through ``CommentSerializer``."""
+
+    serializer_class = ContentDetailSerializer
+
+    def get_stream_url(self, row):
+        if not row['file'] or self.user_id is None:
+            return None
+        if row['is_premium'] and not self.has_premium:
+            return None
+        return stream_url(self.request, row['id'], self.user_id)
+
+    def get_comments(self, row):
+        comments = Comment.objects.filter(content_id=row['id'], parent=None)
+        return CommentSerializer(comments, many=True, context=self.context).data
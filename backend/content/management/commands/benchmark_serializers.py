@@ -0,0 +1,170 @@
+
+import json
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from content.fast_serializers import ContentRows
+from content.models import Category, Content
+from content.serializers import ContentSerializer
+from ml_service.synthetic import generate_catalogue
+from subscriptions.entitlements import ANONYMOUS, Entitlement
+from zamanivault.images import FORMATS, VARIANT_WIDTHS, derivative_path
+from zamanivault.renderers import FastJSONRenderer, orjson
+
+def _variants(source):
+    return {'source': source, 'variants': {
+        variant: dict(
+            {key: derivative_path(source, variant, extension) for key, _, extension in FORMATS},
+            width=width, height=width * 3 // 4
+        )
+        for variant, width in VARIANT_WIDTHS.items()
+    }}
+
+def synthetic_rows(n_rows, n_categories, seed):
+    """Content and category ``values()`` rows, and the category rows of each item."""
+    now = timezone.now()
+    categories = []
+    for i in range(1, n_categories + 1):
+        image = f"category_images/category-{i}.jpg" if i % 2 else ''
+        categories.append({
+            'id': i, 'name': f"Category {i}", 'description': f"Synthetic category {i}",
+            'image': image, 'image_variants': _variants(image) if image else {},
+            'parent_id': None if i <= 3 else (i % 3) + 1, 'order': i,
+        })
+
+    rows = []
+    content_categories = {}
+    for item in generate_catalogue(n_rows, seed=seed):
+        i = item['id']
+        image = f"content_images/{item['topic']}-{i}.jpg"
+        rows.append(dict(
+            item,
+            image=image,
+            image_variants=_variants(image) if i % 4 else {},
+            file=f"content_files/{item['topic']}-{i}.pdf" if i % 3 else None,
+            url=f"https://archive.example.org/items/{i}" if i % 5 == 0 else None,
+            duration='45:00' if item['content_type'] == 'video' else None,
+            language='English',
+            is_featured=i % 20 == 0,
+            created_at=now - timedelta(hours=i, microseconds=i),
+            updated_at=now - timedelta(minutes=i),
+        ))
+        content_categories[i] = [categories[i % n_categories], categories[(i * 7) % n_categories]][:1 + i % 2]
+
+    attnames = [field.attname for field in Content._meta.concrete_fields]
+    rows = [{attname: row.get(attname) for attname in attnames} for row in rows]
+    return rows, content_categories
+
+def _instance(model, row):
+    return model.from_db('default', list(row), list(row.values()))
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows per second of ContentSerializer and the compiled ContentRows on synthetic '
+        'content list pages, with and without JSON rendering, and check that their output matches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Synthetic content rows.')
+        parser.add_argument('--categories', type=int, default=24, help='Synthetic categories.')
+        parser.add_argument('--page-size', type=int, default=api_settings.PAGE_SIZE, help='Rows per serializer call.')
+        parser.add_argument('--repeat', type=int, default=3, help='Passes over the rows; the fastest counts.')
+        parser.add_argument('--premium', action='store_true', help='Serialize for a premium user instead of a free one.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help='Print machine-readable results.')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['page_size'] < 1 or options['categories'] < 1:
+            raise CommandError('--rows, --page-size and --categories must be positive.')
+        rows, row_categories = synthetic_rows(options['rows'], options['categories'], options['seed'])
+        pages = [rows[i:i + options['page_size']] for i in range(0, len(rows), options['page_size'])]
+        favorited_ids = {row['id'] for row in rows if row['id'] % 7 == 0}
+        watchlist_ids = {row['id'] for row in rows if row['id'] % 11 == 0}
+        category_instances = {
+            content_id: [_instance(Category, category) for category in categories]
+            for content_id, categories in row_categories.items()
+        }
+
+        # Absolute media URLs are built for a host that passes ALLOWED_HOSTS
+        host = settings.ALLOWED_HOSTS[0].lstrip('.') if settings.ALLOWED_HOSTS else 'localhost'
+        request = Request(RequestFactory().get('/api/content/', HTTP_HOST='localhost' if host == '*' else host))
+        request.user = AnonymousUser()
+        entitlement = Entitlement(1, 'premium', False, True, None) if options['premium'] else ANONYMOUS
+
+        def context(categories):
+            return {
+                'request': request, 'entitlement': entitlement, 'content_categories': categories,
+                'favorited_ids': favorited_ids, 'watchlist_ids': watchlist_ids,
+            }
+
+        def drf_page(page):
+            # What the native list view did per page: instances from documents, then the serializer
+            items = [_instance(Content, row) for row in page]
+            return ContentSerializer(items, many=True, context=context(category_instances)).data
+
+        def fast_page(page):
+            return ContentRows(context(row_categories)).serialize(page)
+
+        drf_renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+        paths = {
+            'drf_serializer': (drf_page, None),
+            'drf_serializer+render': (drf_page, drf_renderer),
+            'compiled': (fast_page, None),
+            'compiled+render': (fast_page, drf_renderer),
+            'compiled+fast_render': (fast_page, fast_renderer),
+        }
+
+        results = {}
+        for name, (serialize, renderer) in paths.items():
+            best = None
+            for _ in range(max(options['repeat'], 1)):
+                started = time.perf_counter()
+                for page in pages:
+                    data = serialize(page)
+                    if renderer is not None:
+                        renderer.render(data)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = {'rows_per_sec': round(len(rows) / best, 1), 'us_per_row': round(1e6 * best / len(rows), 2)}
+
+        baseline = results['drf_serializer+render']['rows_per_sec']
+        for result in results.values():
+            result['speedup'] = round(result['rows_per_sec'] / baseline, 2)
+
+        expected = [drf_renderer.render(drf_page(page)) for page in pages]
+        report = {
+            'rows': len(rows),
+            'page_size': options['page_size'],
+            'premium': options['premium'],
+            'orjson': orjson is not None,
+            'identical_data': all(
+                json.loads(drf_renderer.render(fast_page(page))) == json.loads(rendered)
+                for page, rendered in zip(pages, expected)
+            ),
+            'identical_bytes': all(
+                fast_renderer.render(fast_page(page)) == rendered for page, rendered in zip(pages, expected)
+            ),
+            'results': results,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>22}: {result['rows_per_sec']:>10} rows/s, {result['us_per_row']:>7} us/row, "
+                f"{result['speedup']}x"
+            )
+        identical = report['identical_data'] and report['identical_bytes']
+        message = 'Output identical to ContentSerializer' if identical else 'Output DIFFERS from ContentSerializer'
+        if not report['orjson']:
+            message += ' (orjson not installed; fast_render is the stock renderer)'
+        self.stdout.write((self.style.SUCCESS if identical else self.style.ERROR)(message))
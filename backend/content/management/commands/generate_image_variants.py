@@ -0,0 +1,78 @@
+
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from zamanivault.images import IMAGE_FIELDS, existing_variants, is_current, render_variants
+
+MODELS = {'content': 'content.Content', 'category': 'content.Category', 'avatar': 'accounts.User'}
+
+class Command(BaseCommand):
+    help = (
+        'Generate missing or outdated WebP/JPEG variants for content images, category '
+        'images and avatars. Each distinct source image is rendered once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS) + ['all'], default='all')
+        parser.add_argument('--force', action='store_true', help='Re-render variants that are already up to date.')
+        parser.add_argument('--workers', type=int, default=4, help='Images rendered in parallel.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows read per query.')
+
+    def handle(self, *args, **options):
+        labels = list(MODELS.values()) if options['model'] == 'all' else [MODELS[options['model']]]
+        # Variants per source image, shared across models: many rows use the same placeholder
+        rendered = {}
+        failed = set()
+
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            for label, image_field, variants_field in IMAGE_FIELDS:
+                if label not in labels:
+                    continue
+                model = apps.get_model(label)
+                updated = self.backfill(
+                    model, image_field, variants_field, options, executor, rendered, failed
+                )
+                self.stdout.write(f"{label}: updated {updated} rows")
+
+        message = f"Rendered {len(rendered)} source images"
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{message}; {len(failed)} could not be read: {sorted(failed)[:10]}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def render(self, source, force):
+        return (None if force else existing_variants(source)) or render_variants(source)
+
+    def backfill(self, model, image_field, variants_field, options, executor, rendered, failed):
+        manager = model._default_manager
+        updated = 0
+        last_pk = 0
+        while True:
+            rows = list(
+                manager.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', image_field, variants_field)[:options['batch_size']]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            stale = {}
+            for pk, source, variants in rows:
+                if source and (options['force'] or not is_current(source, variants)):
+                    stale.setdefault(source, []).append(pk)
+
+            pending = [source for source in stale if source not in rendered and source not in failed]
+            futures = {source: executor.submit(self.render, source, options['force']) for source in pending}
+            for source, future in futures.items():
+                try:
+                    rendered[source] = future.result()
+                except Exception as e:
+                    failed.add(source)
+                    self.stderr.write(f"{source}: {e}")
+
+            for source, pks in stale.items():
+                if source in rendered:
+                    updated += manager.filter(pk__in=pks, **{image_field: source}).update(
+                        **{variants_field: rendered[source]}
+                    )
+        return updated
@@ -0,0 +1,159 @@
+
+import os
+import time
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from content.data_generator import TOPIC_NAMES, chunks, init_worker, loadtest_email, run_chunk
+from content.models import Category, Content
+from subscriptions.models import SubscriptionPlan
+from zamanivault.mongo import reserve_ids
+
+User = get_user_model()
+
+# One category per topic, in ml_service.synthetic.TOPICS order
+BASE_CATEGORIES = [
+    ('Ancient Kingdoms', 'Content about ancient African kingdoms and empires'),
+    ('Historical Figures', 'Biographies and content about important historical figures'),
+    ('Architecture', 'African architectural history and structures'),
+    ('Artifacts', 'Historical artifacts and archaeological finds'),
+    ('Cultural Practices', 'Content about cultural traditions and practices'),
+]
+
+PLANS = [
+    ('Free', 'free', 'Basic access to free content', 0.00, ['Access to free content', 'Limited recommendations']),
+    ('Premium', 'premium', 'Full access to all content and features', 9.99,
+     ['Access to all content', 'Advanced recommendations', 'HD video quality']),
+    ('Scholar', 'scholar', 'Academic access with research tools', 19.99,
+     ['Access to all content', 'Research tools', 'Export functionality', 'Citation tools']),
+]
+
+class Command(BaseCommand):
+    help = (
+        'Generate a deterministic synthetic dataset (users, content, categories, comments, '
+        'subscriptions and power-law activity) for load and performance testing.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--content', type=int, default=5000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--events-per-user', type=int, default=20, help='Mean activity events per user.')
+        parser.add_argument('--comments-per-item', type=float, default=2.0, help='Mean comments per content item.')
+        parser.add_argument('--subscriber-ratio', type=float, default=0.2)
+        parser.add_argument('--premium-ratio', type=float, default=0.3, help='Share of premium content.')
+        parser.add_argument('--days', type=int, default=180, help='Spread activity over this many past days.')
+        parser.add_argument(
+            '--now', type=datetime.fromisoformat,
+            help='Date the activity is generated up to, as an ISO datetime (default: start of today, UTC). '
+                 'Pass the reported value to reproduce a dataset exactly.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Users or content items per worker task.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--password', default='loadtest123', help='Password shared by all generated users.')
+        parser.add_argument('--skip-rollups', action='store_true', help='Do not rebuild the insight rollups afterwards.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['content'] < 1:
+            raise CommandError('--users and --content must be at least 1.')
+        started = time.monotonic()
+        now = options['now'] or datetime.combine(timezone.now().date(), dt_time.min, dt_timezone.utc)
+        if timezone.is_naive(now):
+            now = now.replace(tzinfo=dt_timezone.utc)
+        if User.objects.filter(email=loadtest_email(options['seed'], 0)).exists():
+            raise CommandError(f"A dataset with --seed {options['seed']} already exists; pass another seed.")
+
+        self.ensure_fixtures()
+        plans = dict(SubscriptionPlan.objects.filter(name__in=[p[0] for p in PLANS]).values_list('name', 'id'))
+        topic_categories = self.ensure_categories(options['categories'])
+
+        spec = {
+            'seed': options['seed'],
+            'users': options['users'],
+            'content': options['content'],
+            'events_per_user': options['events_per_user'],
+            'comments_per_item': options['comments_per_item'],
+            'subscriber_ratio': options['subscriber_ratio'],
+            'premium_ratio': options['premium_ratio'],
+            'days': options['days'],
+            'batch_size': options['batch_size'],
+            'now': int(now.timestamp()),
+            # Hashing once keeps millions of users cheap; they all share the password
+            'password_hash': make_password(options['password']),
+            'paid_plans': [(plans['Premium'], 'premium'), (plans['Scholar'], 'scholar')],
+            'topic_categories': topic_categories,
+            'user_base': reserve_ids(User, options['users']),
+            'content_base': reserve_ids(Content, options['content']),
+        }
+
+        # Rows in later phases refer to users and content written earlier
+        phases = [
+            [('content', options['content']), ('users', options['users'])],
+            [('activity', options['users']), ('comments', options['content'])],
+        ]
+        totals = {}
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+            for phase in phases:
+                futures = [
+                    pool.submit(run_chunk, kind, spec, chunk, start, stop)
+                    for kind, total in phase
+                    for chunk, start, stop in chunks(total, options['chunk_size'])
+                ]
+                for future in as_completed(futures):
+                    kind, count = future.result()
+                    totals[kind] = totals.get(kind, 0) + count
+                self.stdout.write(', '.join(f"{kind}: {totals[kind]}" for kind, _ in phase))
+
+        if not options['skip_rollups']:
+            call_command('rebuild_insight_rollups', days=options['days'], stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {totals.get('users', 0)} users (ids from {spec['user_base']}, emails like "
+            f"{loadtest_email(options['seed'], 0)}, password {options['password']!r}), "
+            f"{totals.get('content', 0)} content items (ids from {spec['content_base']}), "
+            f"{totals.get('activity', 0)} activities and {totals.get('comments', 0)} comments "
+            f"up to {now.isoformat()} in {time.monotonic() - started:.1f}s"
+        ))
+
+    def ensure_fixtures(self):
+        """Create the subscription plans and the well-known admin and test accounts."""
+        for name, _, description, price, features in PLANS:
+            SubscriptionPlan.objects.get_or_create(
+                name=name,
+                defaults={'description': description, 'price': price, 'billing_cycle': 'monthly', 'features': features}
+            )
+        for email, password, extra in (
+            ('admin@example.com', 'admin123', {'first_name': 'Admin', 'last_name': 'User', 'is_staff': True,
+                                               'is_superuser': True, 'subscription_type': 'premium'}),
+            ('user@example.com', 'user123', {'first_name': 'Test', 'last_name': 'User', 'subscription_type': 'free'}),
+        ):
+            if not User.objects.filter(email=email).exists():
+                User.objects.create_user(email, password, **extra)
+                self.stdout.write(f"Created user: {email}")
+
+    def ensure_categories(self, count):
+        """Create missing categories and return their ids grouped by topic."""
+        names = []
+        for i in range(max(count, len(BASE_CATEGORIES))):
+            name, description = BASE_CATEGORIES[i % len(BASE_CATEGORIES)]
+            round_number = i // len(BASE_CATEGORIES)
+            names.append((f"{name} {round_number + 1}" if round_number else name, description, i))
+
+        existing = set(Category.objects.filter(name__in=[n for n, _, _ in names]).values_list('name', flat=True))
+        Category.objects.bulk_create([
+            Category(name=name, description=description, order=i)
+            for name, description, i in names if name not in existing
+        ])
+        ids = dict(Category.objects.filter(name__in=[n for n, _, _ in names]).values_list('name', 'id'))
+        topic_categories = [[] for _ in TOPIC_NAMES]
+        for name, _, i in names:
+            topic_categories[i % len(TOPIC_NAMES)].append(ids[name])
+        return topic_categories
@@ -0,0 +1,24 @@
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from content.models import MediaUpload
+from content.uploads import discard_upload
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that were started but not completed, with their temporary files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=48, help='Age after which a pending upload is abandoned.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = MediaUpload.objects.filter(status='pending', created_at__lt=cutoff)
+        purged = 0
+        for upload in list(stale):
+            if not options['dry_run']:
+                discard_upload(upload)
+            purged += 1
+        verb = 'Would purge' if options['dry_run'] else 'Purged'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {purged} uploads started before {cutoff:%Y-%m-%d %H:%M}"))
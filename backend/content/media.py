@@ -0,0 +1,195 @@
+
+"""
+Entitlement-checked delivery of ``Content.file`` media.
+
+``serve_media`` answers a request for a stored file:
+- conditional GETs (``If-None-Match``, ``If-Modified-Since``) get a 304;
+- a single ``Range`` (honouring ``If-Range``) gets a 206 with only those
+  bytes;
+- anything else gets the whole file.
+
+Bodies are streamed from an open file handle. Under gunicorn,
+``wsgi.file_wrapper`` hands the handle to ``sendfile()``, so the bytes go
+from the page cache to the socket without passing through Python. Other
+servers read it in ``MEDIA_STREAM_CHUNK_SIZE`` blocks. Either way a
+request for a range seeks to it first, so seeking inside a large video
+reads only the bytes requested.
+
+When ``MEDIA_ACCEL_REDIRECT_PREFIX`` is set, the response carries only an
+``X-Accel-Redirect`` header pointing at that internal proxy location. The
+proxy then serves the file, including ranges and conditionals, after
+Django has checked the entitlement.
+
+``<video>`` and ``<img>`` elements cannot send an Authorization header, so
+detail responses include a signed ``stream_url``. The URL is bound to the
+item and the user, and the entitlement is checked again on every request.
+"""
+
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views import static
+
+CHUNK_SIZE = getattr(settings, 'MEDIA_STREAM_CHUNK_SIZE', 512 * 1024)
+ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '')
+SIGNED_URL_TTL = getattr(settings, 'MEDIA_SIGNED_URL_TTL', 6 * 3600)
+
+SIGNING_SALT = 'content.media'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# MEDIA_ROOT prefixes only served through the entitlement check: content files (including
+# chunked uploads in content_files/cas/) and the upload staging area
+PRIVATE_PREFIXES = ('content_files/', '.uploads/')
+
+def serve_public_media(request, path, document_root=None, show_indexes=False):
+    """Development-only ``MEDIA_URL`` view that refuses the private prefixes."""
+    if posixpath.normpath(path).lstrip('/').startswith(PRIVATE_PREFIXES):
+        raise Http404('Content files are only served through the content stream.')
+    return static.serve(request, path, document_root=document_root, show_indexes=show_indexes)
+
+def sign_stream(content_id, user_id):
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(f"{content_id}:{user_id}")
+
+def unsign_stream(signature, content_id):
+    """Return the user id a stream signature was issued to, or None if it is invalid or expired."""
+    try:
+        value = signing.TimestampSigner(salt=SIGNING_SALT).unsign(signature, max_age=SIGNED_URL_TTL)
+    except signing.BadSignature:
+        return None
+    signed_content_id, _, user_id = value.partition(':')
+    if signed_content_id != str(content_id) or not user_id.isdigit():
+        return None
+    return int(user_id)
+
+def stream_url(request, content_id, user_id):
+    """Absolute, signed URL of the item's media stream for ``user_id``."""
+    url = reverse('content-stream', kwargs={'pk': content_id})
+    url = f"{url}?signature={quote(sign_stream(content_id, user_id))}"
+    return request.build_absolute_uri(url) if request is not None else url
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single byte range, None when the
+    header should be ignored (absent, malformed or multi-range), or False
+    when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the final ``last`` bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return False
+    return start, end
+
+class RangeFile:
+    """
+    ``length`` bytes of ``file`` starting at ``start``, as a file-like object.
+
+    ``fileno()`` is exposed so that gunicorn can ``sendfile()`` it. gunicorn
+    starts at the descriptor's current offset and stops at Content-Length,
+    so only the range is sent.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+def _accel_response(name, content_type):
+    response = HttpResponse(content_type=content_type)
+    response['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(name)
+    return response
+
+def serve_media(request, storage, name):
+    """Serve the stored file ``name`` with range, conditional and proxy-offload support."""
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if ACCEL_REDIRECT_PREFIX:
+        return _accel_response(name, content_type)
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        # Remote storage serves ranges itself
+        return HttpResponseRedirect(storage.url(name))
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    if byte_range is not None and not _if_range_matches(request, etag, last_modified):
+        byte_range = None
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    else:
+        start, end = byte_range or (0, size - 1)
+        length = max(end - start + 1, 0)
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type, status=206 if byte_range else 200)
+        else:
+            response = FileResponse(
+                RangeFile(open(path, 'rb'), start, length),
+                content_type=content_type, status=206 if byte_range else 200,
+                filename=os.path.basename(name)
+            )
+            response.block_size = CHUNK_SIZE
+        response['Content-Length'] = str(length)
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response['Accept-Ranges'] = 'bytes'
+    # Entitlement-checked, so shared caches must not keep a copy
+    response['Cache-Control'] = 'private'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -18,6 +18,8 @@ class Content(models.Model):
     description = models.TextField()
     content_type = models.CharField(max_length=20, choices=CONTENT_TYPES)
     image = models.ImageField(upload_to='content_images/')
+    # Resized WebP/JPEG variants of ``image`` (zamanivault/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     file = models.FileField(upload_to='content_files/', null=True, blank=True)
     url = models.URLField(null=True, blank=True)
     is_premium = models.BooleanField(default=False)
@@ -35,6 +37,13 @@ class Content(models.Model):
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored premium flag so saves that keep it do not rebuild eligibility
+        instance._loaded_is_premium = instance.__dict__.get('is_premium')
+        return instance
+    
     class Meta:
         ordering = ['-created_at']
         
@@ -44,6 +53,7 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='category_images/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children')
     order = models.PositiveIntegerField(default=0)
     
@@ -98,3 +108,43 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+
+class MediaUpload(models.Model):
+    """Resumable, chunked upload of a media file into content-addressed storage."""
+    
+    KINDS = [
+        ('file', 'File'),
+        ('image', 'Image'),
+    ]
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('complete', 'Complete'),
+    ]
+    
+    upload_id = models.UUIDField(unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='media_uploads')
+    filename = models.CharField(max_length=255)
+    kind = models.CharField(max_length=10, choices=KINDS, default='file')
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    # Content hash of the finished file (while pending, the one the client declared) and its name in storage
+    content_hash = models.CharField(max_length=64, blank=True)
+    stored_name = models.CharField(max_length=255, blank=True)
+    deduplicated = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+class MediaUploadChunk(models.Model):
+    """A received chunk of a ``MediaUpload`` and its SHA-256 digest."""
+    
+    upload = models.ForeignKey(MediaUpload, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    
+    class Meta:
+        unique_together = ('upload', 'index')
@@ -0,0 +1,126 @@
+
+"""
+Native MongoDB queries for the content endpoints (see ``zamanivault.mongo``).
+
+Each function returns what the ORM query in its docstring returns.
+"""
+
+import re
+from collections import defaultdict
+from django.db import connections
+from django.utils import timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from zamanivault.mongo import (
+    ALIAS, NativeQuery, collection, column, delete_one, from_document, get_database, insert, sort_spec, values
+)
+from .models import Content, Category, ContentCategory, UserFavorite, UserWatchlist
+
+def search_query(terms, fields):
+    """
+    The filter ``SearchFilter`` builds: every term must occur, case-insensitively,
+    in at least one of ``fields``.
+    """
+    clauses = [
+        {'$or': [{column(Content, field): {'$regex': re.escape(term), '$options': 'i'}} for field in fields]}
+        for term in terms
+    ]
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+def content_list(search_terms=(), search_fields=(), ordering=None, as_values=False):
+    """
+    ``Content.objects.all()`` after ``SearchFilter`` and ``OrderingFilter``,
+    lazily, for pagination; ``.values()`` of it with ``as_values``.
+    """
+    return NativeQuery(Content, search_query(search_terms, search_fields), ordering, as_values=as_values)
+
+def content_exists(content_id):
+    return collection(Content).find_one({column(Content, 'id'): content_id}, {'_id': 1}) is not None
+
+def all_content_values():
+    """``list(Content.objects.all().values())``."""
+    documents = collection(Content).find({}, {'_id': 0}).sort(sort_spec(Content, Content._meta.ordering))
+    return [values(Content, document) for document in documents]
+
+def increment_view_count(content_id, amount=1, as_values=False):
+    """
+    Add ``amount`` to the item's view count in one atomic update and return the
+    updated item (its ``values()`` row with ``as_values``), or None if it does
+    not exist.
+
+    Like ``save()`` on the ORM path this also bumps ``updated_at``. Unlike it,
+    no ``post_save`` is sent: a view count does not change the catalogue the
+    recommendation eligibility bitsets are built from.
+    """
+    updated_at = Content._meta.get_field('updated_at')
+    document = collection(Content).find_one_and_update(
+        {column(Content, 'id'): content_id},
+        {
+            '$inc': {column(Content, 'view_count'): amount},
+            '$set': {updated_at.column: updated_at.get_db_prep_save(timezone.now(), connections[ALIAS])},
+        },
+        projection={'_id': 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if document is None:
+        return None
+    return values(Content, document) if as_values else from_document(Content, document)
+
+def content_categories(content_ids, as_values=False):
+    """
+    ``{content_id: [Category, ...]}`` for ``content_ids``, joined in one
+    aggregation instead of one ``ContentCategory`` query per item. With
+    ``as_values`` the categories are ``values()`` rows.
+    """
+    content_column = column(ContentCategory, 'content')
+    category_column = column(ContentCategory, 'category')
+    pipeline = [
+        {'$match': {content_column: {'$in': list(content_ids)}}},
+        {'$sort': {column(ContentCategory, 'id'): 1}},
+        {'$lookup': {
+            'from': Category._meta.db_table,
+            'localField': category_column,
+            'foreignField': column(Category, 'id'),
+            'as': 'category',
+        }},
+        {'$unwind': '$category'},
+        {'$project': {'_id': 0, content_column: 1, 'category': 1}},
+    ]
+    convert = values if as_values else from_document
+    categories = defaultdict(list)
+    for row in get_database()[ContentCategory._meta.db_table].aggregate(pipeline):
+        categories[row[content_column]].append(convert(Category, row['category']))
+    return categories
+
+def member_content_ids(model, user_id, content_ids=None):
+    """Ids of the content in the user's ``model`` list (favorites or watchlist), as a set."""
+    query = {column(model, 'user'): user_id}
+    if content_ids is not None:
+        query[column(model, 'content')] = {'$in': list(content_ids)}
+    return set(collection(model).distinct(column(model, 'content'), query))
+
+def favorite_content_ids(user_id, content_ids=None):
+    """``set(UserFavorite.objects.filter(user_id=user_id).values_list('content_id', flat=True))``."""
+    return member_content_ids(UserFavorite, user_id, content_ids)
+
+def watchlist_content_ids(user_id, content_ids=None):
+    """``set(UserWatchlist.objects.filter(user_id=user_id).values_list('content_id', flat=True))``."""
+    return member_content_ids(UserWatchlist, user_id, content_ids)
+
+def toggle_membership(model, user_id, content_id):
+    """
+    Remove the item from the user's ``model`` list if present, otherwise add
+    it. Returns True if it was added. Sends the same signals as
+    ``get_or_create()`` followed by ``delete()``.
+    """
+    key = {column(model, 'user'): user_id, column(model, 'content'): content_id}
+    if delete_one(model, key) is not None:
+        return False
+    try:
+        insert(model(user_id=user_id, content_id=content_id))
+    except DuplicateKeyError:
+        # A concurrent toggle added it first; it is in the list either way
+        pass
+    return True
@@ -1,17 +1,28 @@
 
 from rest_framework import serializers
-from .models import Content, Category, ContentCategory, UserFavorite, UserWatchlist, Comment
+from django.core.files.storage import default_storage
+from subscriptions.entitlements import get_entitlement
+from zamanivault.images import srcsets
+from .media import stream_url
+from .models import Content, Category, ContentCategory, UserFavorite, UserWatchlist, Comment, MediaUpload
+from .uploads import UploadError, chunk_count, missing_chunks, resolve_upload
 
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for Category model."""
     
+    image_srcset = serializers.SerializerMethodField()
+    
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'image', 'parent', 'order']
+        fields = ['id', 'name', 'description', 'image', 'image_srcset', 'parent', 'order']
+    
+    def get_image_srcset(self, obj):
+        return srcsets(obj.image_variants, self.context.get('request'))
 
 class ContentSerializer(serializers.ModelSerializer):
     """Serializer for Content model."""
     
+    image_srcset = serializers.SerializerMethodField()
     categories = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_watchlist = serializers.SerializerMethodField()
@@ -19,25 +30,58 @@ class ContentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Content
         fields = [
-            'id', 'title', 'description', 'content_type', 'image', 'file', 'url',
+            'id', 'title', 'description', 'content_type', 'image', 'image_srcset', 'file', 'url',
             'is_premium', 'duration', 'tags', 'creator', 'year', 'region', 'language',
             'view_count', 'is_featured', 'created_at', 'updated_at', 'categories',
             'is_favorited', 'is_in_watchlist'
         ]
         read_only_fields = ['view_count', 'created_at', 'updated_at']
     
+    # Fields withheld from users without a premium entitlement
+    PREMIUM_FIELDS = ('file', 'url')
+    
+    def get_entitlement(self):
+        """Return the requesting user's entitlement, resolved once per serializer context."""
+        entitlement = self.context.get('entitlement')
+        if entitlement is None:
+            request = self.context.get('request')
+            entitlement = get_entitlement(getattr(request, 'user', None))
+            self.context['entitlement'] = entitlement
+        return entitlement
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.is_premium and not self.get_entitlement().has_premium:
+            for field in self.PREMIUM_FIELDS:
+                if field in data:
+                    data[field] = None
+        return data
+    
+    def get_image_srcset(self, obj):
+        return srcsets(obj.image_variants, self.context.get('request'))
+    
     def get_categories(self, obj):
+        # List views may resolve categories for the whole page up front
+        prefetched = self.context.get('content_categories')
+        if prefetched is not None:
+            return CategorySerializer(prefetched.get(obj.id, []), many=True).data
         category_relations = ContentCategory.objects.filter(content=obj)
         categories = [relation.category for relation in category_relations]
         return CategorySerializer(categories, many=True).data
     
     def get_is_favorited(self, obj):
+        prefetched = self.context.get('favorited_ids')
+        if prefetched is not None:
+            return obj.id in prefetched
         request = self.context.get('request')
         if request and hasattr(request, 'user') and request.user.is_authenticated:
             return UserFavorite.objects.filter(user=request.user, content=obj).exists()
         return False
     
     def get_is_in_watchlist(self, obj):
+        prefetched = self.context.get('watchlist_ids')
+        if prefetched is not None:
+            return obj.id in prefetched
         request = self.context.get('request')
         if request and hasattr(request, 'user') and request.user.is_authenticated:
             return UserWatchlist.objects.filter(user=request.user, content=obj).exists()
@@ -47,9 +91,20 @@ class ContentDetailSerializer(ContentSerializer):
     """Detailed serializer for Content model."""
     
     comments = serializers.SerializerMethodField()
+    stream_url = serializers.SerializerMethodField()
     
     class Meta(ContentSerializer.Meta):
-        fields = ContentSerializer.Meta.fields + ['comments']
+        fields = ContentSerializer.Meta.fields + ['stream_url', 'comments']
+    
+    def get_stream_url(self, obj):
+        """Signed media URL for users entitled to the file, usable directly by media elements."""
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        if not obj.file or user is None or not user.is_authenticated:
+            return None
+        if obj.is_premium and not self.get_entitlement().has_premium:
+            return None
+        return stream_url(request, obj.id, user.pk)
     
     def get_comments(self, obj):
         comments = Comment.objects.filter(content=obj, parent=None)
@@ -63,14 +118,30 @@ class ContentCreateUpdateSerializer(serializers.ModelSerializer):
         required=False,
         write_only=True
     )
+    # Completed chunked uploads, attached by reference instead of a multipart file
+    image_upload = serializers.UUIDField(required=False, write_only=True)
+    file_upload = serializers.UUIDField(required=False, write_only=True)
     
     class Meta:
         model = Content
         fields = [
             'title', 'description', 'content_type', 'image', 'file', 'url',
             'is_premium', 'duration', 'tags', 'creator', 'year', 'region', 'language',
-            'is_featured', 'categories'
+            'is_featured', 'categories', 'image_upload', 'file_upload'
         ]
+        extra_kwargs = {'image': {'required': False}}
+    
+    def validate(self, attrs):
+        for field in ('image', 'file'):
+            upload_id = attrs.pop(f'{field}_upload', None)
+            if upload_id is not None:
+                try:
+                    attrs[field] = resolve_upload(upload_id, kind=field, user=self.context['request'].user)
+                except UploadError as e:
+                    raise serializers.ValidationError({f'{field}_upload': e.detail})
+        if self.instance is None and not attrs.get('image'):
+            raise serializers.ValidationError({'image': 'Provide an image or an image_upload.'})
+        return attrs
     
     def create(self, validated_data):
         categories = validated_data.pop('categories', [])
@@ -111,11 +182,15 @@ class CommentSerializer(serializers.ModelSerializer):
     
     user_name = serializers.SerializerMethodField()
     user_avatar = serializers.SerializerMethodField()
+    user_avatar_srcset = serializers.SerializerMethodField()
     replies = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
-        fields = ['id', 'content', 'user', 'user_name', 'user_avatar', 'text', 'created_at', 'updated_at', 'replies']
+        fields = [
+            'id', 'content', 'user', 'user_name', 'user_avatar', 'user_avatar_srcset',
+            'text', 'created_at', 'updated_at', 'replies'
+        ]
         read_only_fields = ['user', 'created_at', 'updated_at']
     
     def get_user_name(self, obj):
@@ -130,6 +205,11 @@ class CommentSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.user.avatar.url)
         return None
     
+    def get_user_avatar_srcset(self, obj):
+        if obj.user.avatar:
+            return srcsets(obj.user.avatar_variants, self.context.get('request'))
+        return None
+    
     def get_replies(self, obj):
         replies = Comment.objects.filter(parent=obj)
         return CommentSerializer(replies, many=True, context=self.context).data
@@ -171,3 +251,35 @@ class UserWatchlistSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
+
+class MediaUploadSerializer(serializers.ModelSerializer):
+    """Serializer for the state of a chunked media upload."""
+    
+    chunk_count = serializers.SerializerMethodField()
+    missing_chunks = serializers.SerializerMethodField()
+    url = serializers.SerializerMethodField()
+    content_hash = serializers.RegexField(r'^[0-9a-f]{64}$', required=False, allow_blank=True)
+    
+    class Meta:
+        model = MediaUpload
+        fields = [
+            'upload_id', 'filename', 'kind', 'size', 'chunk_size', 'chunk_count', 'missing_chunks',
+            'status', 'content_hash', 'stored_name', 'deduplicated', 'url', 'created_at', 'completed_at'
+        ]
+        read_only_fields = [
+            'upload_id', 'chunk_size', 'status', 'stored_name', 'deduplicated', 'created_at', 'completed_at'
+        ]
+    
+    def get_chunk_count(self, obj):
+        return chunk_count(obj)
+    
+    def get_missing_chunks(self, obj):
+        return missing_chunks(obj)
+    
+    def get_url(self, obj):
+        # Media files are internal; they are only served through the entitlement-checked stream
+        if not obj.stored_name or obj.kind == 'file':
+            return None
+        url = default_storage.url(obj.stored_name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
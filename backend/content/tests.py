@@ -0,0 +1,138 @@
+"""Parity of the native content repository with the ORM queries it replaces."""
+
+from datetime import timedelta
+import pytest
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+from pymongo.errors import DuplicateKeyError
+from zamanivault.mongo import collection, column, insert
+from . import repository
+from .apps import create_unique_indexes
+from .models import Category, Content, ContentCategory, UserFavorite, UserWatchlist
+from .views import ContentViewSet
+
+# djongo has no transactions to roll back, so each test flushes the tables instead
+pytestmark = pytest.mark.django_db(transaction=True)
+
+@pytest.fixture
+def catalogue():
+    now = timezone.now().replace(microsecond=0)
+    items = [
+        Content.objects.create(
+            title=title, description=description, content_type=content_type, image='content_images/x.jpg',
+            tags=tags, creator='Creator', region=region, is_premium=i % 2 == 0, view_count=i,
+        )
+        for i, (title, description, content_type, tags, region) in enumerate([
+            ('Mali Empire', 'Gold and trade', 'video', ['empire', 'gold'], 'West Africa'),
+            ('Great Zimbabwe', 'Stone walls', 'article', ['stone'], 'Southern Africa'),
+            ('Benin Bronzes', 'Bronze plaques of Benin', 'artifact', ['bronze'], 'West Africa'),
+            ('Aksum', 'A trading empire', 'book', ['empire'], 'East Africa'),
+        ])
+    ]
+    # Distinct creation times, so the default ordering has no ties
+    for i, item in enumerate(items):
+        Content.objects.filter(pk=item.pk).update(created_at=now - timedelta(hours=i))
+    kingdoms = Category.objects.create(name='Kingdoms', order=1)
+    art = Category.objects.create(name='Art', order=2)
+    for item, categories in zip(items, [[kingdoms], [kingdoms, art], [art], []]):
+        for category in categories:
+            ContentCategory.objects.create(content=item, category=category)
+    return [Content.objects.get(pk=item.pk) for item in items]
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user('reader@example.com', 'secret123')
+
+def orm_search(terms):
+    queryset = Content.objects.all()
+    for term in terms:
+        query = Q()
+        for field in ContentViewSet.search_fields:
+            query |= Q(**{f'{field}__icontains': term})
+        queryset = queryset.filter(query)
+    return queryset
+
+def test_content_list_matches_orm(catalogue):
+    native = repository.content_list()
+    assert native.count() == Content.objects.count()
+    assert list(native[0:10]) == list(Content.objects.all()[:10])
+    assert list(repository.content_list(as_values=True)[1:3]) == list(Content.objects.all().values()[1:3])
+
+@pytest.mark.parametrize('terms', [['empire'], ['EMPIRE', 'gold'], ['west'], ['nothing']])
+def test_content_search_matches_orm(catalogue, terms):
+    native = repository.content_list(terms, ContentViewSet.search_fields)
+    expected = orm_search(terms)
+    assert native.count() == expected.count()
+    assert [item.pk for item in native] == [item.pk for item in expected]
+
+@pytest.mark.parametrize('ordering', [['title'], ['-view_count'], ['updated_at']])
+def test_content_ordering_matches_orm(catalogue, ordering):
+    native = repository.content_list(ordering=ordering)
+    assert [item.pk for item in native] == list(Content.objects.order_by(*ordering).values_list('pk', flat=True))
+
+def test_all_content_values_matches_orm(catalogue):
+    assert repository.all_content_values() == list(Content.objects.all().values())
+
+def test_content_exists(catalogue):
+    assert repository.content_exists(catalogue[0].pk)
+    assert not repository.content_exists(max(item.pk for item in catalogue) + 1)
+
+def test_increment_view_count(catalogue):
+    item = catalogue[1]
+    updated = repository.increment_view_count(item.pk)
+    assert updated.view_count == item.view_count + 1
+    assert updated == Content.objects.get(pk=item.pk)
+    assert repository.increment_view_count(item.pk, as_values=True) == Content.objects.filter(pk=item.pk).values()[0]
+    assert repository.increment_view_count(max(i.pk for i in catalogue) + 1) is None
+
+def test_content_categories_matches_orm(catalogue):
+    ids = [item.pk for item in catalogue]
+    expected = {}
+    for link in ContentCategory.objects.filter(content_id__in=ids).order_by('pk').select_related('category'):
+        expected.setdefault(link.content_id, []).append(link.category)
+    native = repository.content_categories(ids)
+    assert dict(native) == expected
+    assert {key: [c.name for c in value] for key, value in native.items()} == {
+        key: [c.name for c in value] for key, value in expected.items()
+    }
+    as_values = repository.content_categories(ids, as_values=True)
+    assert as_values[catalogue[1].pk] == list(
+        Category.objects.filter(category_contents__content=catalogue[1]).order_by('category_contents__id').values()
+    )
+
+@pytest.mark.parametrize('model, members', [
+    (UserFavorite, repository.favorite_content_ids), (UserWatchlist, repository.watchlist_content_ids)
+])
+def test_membership_matches_orm(catalogue, user, model, members):
+    model.objects.create(user=user, content=catalogue[0])
+    model.objects.create(user=user, content=catalogue[2])
+    expected = set(model.objects.filter(user_id=user.pk).values_list('content_id', flat=True))
+    assert members(user.pk) == expected
+    assert members(user.pk, [catalogue[2].pk, catalogue[3].pk]) == {catalogue[2].pk}
+
+@pytest.mark.parametrize('model', [UserFavorite, UserWatchlist])
+def test_toggle_membership(catalogue, user, model):
+    create_unique_indexes(sender=None)
+    content_id = catalogue[0].pk
+    assert repository.toggle_membership(model, user.pk, content_id) is True
+    added = model.objects.get(user_id=user.pk, content_id=content_id)
+    assert added.created_at is not None
+    assert repository.toggle_membership(model, user.pk, content_id) is False
+    assert not model.objects.filter(user_id=user.pk, content_id=content_id).exists()
+
+    # Rows inserted natively take ids from djongo's sequence, so ORM inserts continue past them
+    repository.toggle_membership(model, user.pk, content_id)
+    orm_row = model.objects.create(user=user, content=catalogue[1])
+    assert orm_row.pk > model.objects.get(user_id=user.pk, content_id=content_id).pk
+
+@pytest.mark.parametrize('model', [UserFavorite, UserWatchlist])
+def test_unique_index_rejects_duplicates(catalogue, user, model):
+    create_unique_indexes(sender=None)
+    index = f"{model._meta.db_table}_user_content_uniq"
+    assert index in collection(model).index_information()
+    insert(model(user_id=user.pk, content_id=catalogue[0].pk))
+    with pytest.raises(DuplicateKeyError):
+        collection(model).insert_one({
+            column(model, 'id'): 10 ** 9, column(model, 'user'): user.pk, column(model, 'content'): catalogue[0].pk,
+        })
@@ -0,0 +1,206 @@
+"""
+Resumable chunked uploads into content-addressed storage.
+
+A client starts an upload by declaring its file name and size, then sends
+the file as fixed-size chunks (``UPLOAD_CHUNK_SIZE``; only the last one
+may be shorter). Chunks can arrive in any order, in parallel or again
+after a failure. Each chunk is streamed from the request body straight to
+its offset in a sparse temporary file and hashed on the way. Only the
+chunk's SHA-256 is recorded.
+
+The finished file is addressed by a block hash: the SHA-256 of its size
+followed by the digests of its chunks, in order. The chunk size is fixed,
+so identical files always get the same address, and completing an upload
+costs no second read of the file. Images are stored as
+``cas/<ab>/<cd>/<hash><ext>``. Media files are stored under
+``content_files/cas/``, the prefix the proxy keeps internal, so they are
+only reachable through the entitlement-checked stream. If that name
+already exists, the new copy is discarded and the upload points at the
+stored one.
+
+Deduplication only happens once every chunk has been received: knowing an
+address is not proof of holding the file. A client that sends the address
+it computed when it starts the upload gets a 409 at completion if the
+chunks do not add up to it.
+"""
+
+import hashlib
+import os
+import re
+import uuid
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError
+from django.utils import timezone
+from .models import MediaUpload, MediaUploadChunk
+
+CHUNK_SIZE = getattr(settings, 'UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+MAX_SIZE = getattr(settings, 'UPLOAD_MAX_SIZE', 20 * 1024 ** 3)
+TEMP_DIR = getattr(settings, 'UPLOAD_TEMP_DIR', os.path.join(settings.MEDIA_ROOT, '.uploads'))
+# Stored name prefix per upload kind; media files live under the internal content_files/
+CAS_PREFIXES = {'image': 'cas', 'file': 'content_files/cas'}
+ADDRESS_RE = re.compile(r'^[0-9a-f]{64}$')
+READ_BLOCK = 256 * 1024
+
+class UploadError(Exception):
+    """Raised when an upload request cannot be honoured."""
+
+    def __init__(self, detail, status_code=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+def temp_path(upload):
+    return os.path.join(TEMP_DIR, f"{upload.upload_id.hex}.part")
+
+def chunk_count(upload):
+    return max(1, -(-upload.size // upload.chunk_size))
+
+def expected_chunk_size(upload, index):
+    return min(upload.chunk_size, upload.size - index * upload.chunk_size)
+
+def content_address(size, digests):
+    """Block hash of a file of ``size`` bytes whose chunks have the hex ``digests``."""
+    address = hashlib.sha256(size.to_bytes(8, 'big'))
+    for digest in digests:
+        address.update(bytes.fromhex(digest))
+    return address.hexdigest()
+
+def stored_name(address, filename, kind):
+    if not ADDRESS_RE.match(address):
+        raise UploadError('Content addresses are 64 lowercase hex characters.')
+    extension = os.path.splitext(os.path.basename(filename))[1].lower()
+    return f"{CAS_PREFIXES[kind]}/{address[:2]}/{address[2:4]}/{address}{extension}"
+
+def _complete(upload, address, deduplicated):
+    upload.content_hash = address
+    upload.stored_name = stored_name(address, upload.filename, upload.kind)
+    upload.deduplicated = deduplicated
+    upload.status = 'complete'
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=['content_hash', 'stored_name', 'deduplicated', 'status', 'completed_at'])
+    return upload
+
+def start_upload(user, filename, size, kind='file', content_hash=None):
+    """
+    Create a pending upload. ``content_hash``, if given, is the address the
+    client expects; ``complete_upload`` checks the received chunks against it.
+    """
+    if size < 0 or size > MAX_SIZE:
+        raise UploadError(f"Uploads must be between 0 and {MAX_SIZE} bytes.")
+    if kind not in CAS_PREFIXES:
+        raise UploadError(f"Unknown upload kind {kind!r}.")
+    if content_hash and not ADDRESS_RE.match(content_hash):
+        raise UploadError('content_hash must be 64 lowercase hex characters.')
+    upload = MediaUpload.objects.create(
+        upload_id=uuid.uuid4(), user=user, filename=os.path.basename(filename),
+        kind=kind, size=size, chunk_size=CHUNK_SIZE, content_hash=content_hash or ''
+    )
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    with open(temp_path(upload), 'wb') as f:
+        # Sparse: disk blocks are only allocated as chunks are written
+        f.truncate(size)
+    return upload
+
+def received_chunks(upload):
+    return sorted(upload.chunks.values_list('index', flat=True))
+
+def missing_chunks(upload):
+    if upload.status == 'complete':
+        return []
+    received = set(received_chunks(upload))
+    return [index for index in range(chunk_count(upload)) if index not in received]
+
+def write_chunk(upload, index, stream, expected_sha256=None):
+    """
+    Stream chunk ``index`` from ``stream`` into place and record its digest.
+
+    The body is read in blocks, so memory use does not depend on the chunk
+    size. A chunk that is resent replaces the earlier copy.
+    """
+    if upload.status != 'pending':
+        raise UploadError('This upload is already complete.', 409)
+    if not 0 <= index < chunk_count(upload):
+        raise UploadError(f"Chunk index must be below {chunk_count(upload)}.")
+    expected = expected_chunk_size(upload, index)
+
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        f = open(temp_path(upload), 'r+b')
+    except FileNotFoundError:
+        raise UploadError('The upload has expired; start a new one.', 410)
+    with f:
+        f.seek(index * upload.chunk_size)
+        while written <= expected:
+            block = stream.read(min(READ_BLOCK, expected + 1 - written))
+            if not block:
+                break
+            written += len(block)
+            if written > expected:
+                break
+            digest.update(block)
+            f.write(block)
+    if written != expected:
+        raise UploadError(f"Chunk {index} must be exactly {expected} bytes.")
+    sha256 = digest.hexdigest()
+    if expected_sha256 and expected_sha256.lower() != sha256:
+        raise UploadError(f"Chunk {index} does not match its SHA-256; send it again.")
+
+    try:
+        MediaUploadChunk.objects.update_or_create(
+            upload=upload, index=index, defaults={'size': written, 'sha256': sha256}
+        )
+    except IntegrityError:
+        # The same chunk arrived twice at once; the bytes are identical
+        MediaUploadChunk.objects.filter(upload=upload, index=index).update(size=written, sha256=sha256)
+    return sha256
+
+def complete_upload(upload):
+    """Move the assembled file into content-addressed storage, or drop it if already stored."""
+    if upload.status == 'complete':
+        return upload
+    chunks = list(upload.chunks.order_by('index').values_list('index', 'sha256'))
+    if [index for index, _ in chunks] != list(range(chunk_count(upload))):
+        raise UploadError('Some chunks have not been received.', 409)
+
+    address = content_address(upload.size, [digest for _, digest in chunks])
+    if upload.content_hash and upload.content_hash != address:
+        raise UploadError('The chunks received do not match content_hash.', 409)
+    name = stored_name(address, upload.filename, upload.kind)
+    path = temp_path(upload)
+    deduplicated = default_storage.exists(name)
+    if deduplicated:
+        os.remove(path)
+    else:
+        try:
+            final = default_storage.path(name)
+        except NotImplementedError:
+            with open(path, 'rb') as f:
+                default_storage.save(name, File(f))
+            os.remove(path)
+        else:
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            # Atomic within one filesystem, which is why TEMP_DIR defaults to MEDIA_ROOT
+            os.replace(path, final)
+            os.chmod(final, 0o644)
+    upload.chunks.all().delete()
+    return _complete(upload, address, deduplicated)
+
+def discard_upload(upload):
+    try:
+        os.remove(temp_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+def resolve_upload(upload_id, kind, user=None):
+    """Return the stored name of a completed upload of ``kind``, for attaching to a field."""
+    uploads = MediaUpload.objects.filter(upload_id=upload_id, kind=kind, status='complete')
+    if user is not None:
+        uploads = uploads.filter(user=user)
+    name = uploads.values_list('stored_name', flat=True).first()
+    if name is None:
+        raise UploadError(f"No completed {kind} upload {upload_id}.")
+    return name
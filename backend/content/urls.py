@@ -1,7 +1,9 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ContentViewSet, CategoryViewSet, CommentViewSet, UserFavoriteViewSet, UserWatchlistViewSet
+from .views import (
+    ContentViewSet, CategoryViewSet, CommentViewSet, UserFavoriteViewSet, UserWatchlistViewSet, MediaUploadViewSet
+)
 
 router = DefaultRouter()
 router.register(r'content', ContentViewSet)
@@ -9,6 +11,7 @@ router.register(r'categories', CategoryViewSet)
 router.register(r'comments', CommentViewSet)
 router.register(r'favorites', UserFavoriteViewSet, basename='favorites')
 router.register(r'watchlist', UserWatchlistViewSet, basename='watchlist')
+router.register(r'uploads', MediaUploadViewSet, basename='uploads')
 
 urlpatterns = [
     path('', include(router.urls)),
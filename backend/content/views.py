@@ -1,14 +1,28 @@
 
+import io
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db.models import Q
-from .models import Content, Category, UserFavorite, UserWatchlist, Comment
+from rest_framework.exceptions import NotAuthenticated
+from django.contrib.auth import get_user_model
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils import timezone
+from .models import Content, Category, UserFavorite, UserWatchlist, Comment, MediaUpload
 from .serializers import (
     ContentSerializer, ContentDetailSerializer, ContentCreateUpdateSerializer,
-    CategorySerializer, CommentSerializer, UserFavoriteSerializer, UserWatchlistSerializer
+    CategorySerializer, CommentSerializer, UserFavoriteSerializer, UserWatchlistSerializer,
+    MediaUploadSerializer
 )
+from . import repository, uploads
+from . import fast_serializers
+from .media import serve_media, unsign_stream
 from accounts.models import UserActivity
+from accounts import repository as activity_repository
+from subscriptions.entitlements import get_entitlement
+from zamanivault.mongo import NATIVE_QUERIES
+
+User = get_user_model()
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     """
@@ -19,6 +33,21 @@ class IsAdminOrReadOnly(permissions.BasePermission):
             return True
         return request.user and request.user.is_staff
 
+def native_toggle(model, request, content_id):
+    """
+    Toggle a favorite or watchlist entry through the native repository.
+    """
+    try:
+        content_id = int(content_id)
+    except (TypeError, ValueError):
+        return Response({"error": "Content not found"}, status=status.HTTP_404_NOT_FOUND)
+    if not repository.content_exists(content_id):
+        return Response({"error": "Content not found"}, status=status.HTTP_404_NOT_FOUND)
+    
+    if repository.toggle_membership(model, request.user.id, content_id):
+        return Response({"status": "added"}, status=status.HTTP_201_CREATED)
+    return Response({"status": "removed"}, status=status.HTTP_200_OK)
+
 class ContentViewSet(viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing Content objects.
@@ -34,6 +63,9 @@ class ContentViewSet(viewsets.ModelViewSet):
         """
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             permission_classes = [permissions.IsAdminUser]
+        elif self.action == 'stream':
+            # Media elements cannot send tokens; stream() also accepts a signed URL
+            permission_classes = [permissions.AllowAny]
         else:
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
@@ -48,26 +80,127 @@ class ContentViewSet(viewsets.ModelViewSet):
             return ContentCreateUpdateSerializer
         return ContentSerializer
     
+    def get_serializer_context(self):
+        """
+        Resolve the user's premium entitlement once for the whole response.
+        """
+        context = super().get_serializer_context()
+        context['entitlement'] = get_entitlement(self.request.user)
+        return context
+    
+    def list(self, request, *args, **kwargs):
+        """
+        List content natively when MONGO_NATIVE_QUERIES is on, with the same
+        search and ordering as the filter backends. Categories, favorites and
+        watchlist membership are resolved for the whole page at once. With
+        CONTENT_FAST_SERIALIZERS the page is read as values() rows and
+        serialized by the compiled ContentRows.
+        """
+        if not NATIVE_QUERIES:
+            return super().list(request, *args, **kwargs)
+        
+        fast = fast_serializers.ENABLED
+        queryset = repository.content_list(
+            filters.SearchFilter().get_search_terms(request),
+            self.search_fields,
+            filters.OrderingFilter().get_ordering(request, self.queryset, self),
+            as_values=fast
+        )
+        page = self.paginate_queryset(queryset)
+        items = list(queryset) if page is None else page
+        
+        context = self.get_serializer_context()
+        if fast:
+            data = fast_serializers.ContentRows(context).serialize(items)
+        else:
+            content_ids = [item.id for item in items]
+            context['content_categories'] = repository.content_categories(content_ids)
+            if request.user.is_authenticated:
+                context['favorited_ids'] = repository.favorite_content_ids(request.user.id, content_ids)
+                context['watchlist_ids'] = repository.watchlist_content_ids(request.user.id, content_ids)
+            data = self.get_serializer_class()(items, many=True, context=context).data
+        
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+    
     def retrieve(self, request, *args, **kwargs):
         """
         Increment view count when content is retrieved.
         """
-        instance = self.get_object()
-        instance.view_count += 1
-        instance.save()
-        
-        # Log user activity
-        if request.user.is_authenticated:
-            UserActivity.objects.create(
-                user=request.user,
-                content_id=str(instance.id),
-                content_type=instance.content_type,
-                action='view'
+        if NATIVE_QUERIES:
+            # One atomic $inc instead of a read followed by a full save
+            try:
+                content_id = int(kwargs[self.lookup_url_kwarg or self.lookup_field])
+            except ValueError:
+                raise Http404
+            fast = fast_serializers.ENABLED
+            instance = repository.increment_view_count(content_id, as_values=fast)
+            if instance is None:
+                raise Http404
+            # Only view-level permissions apply here, so a values() row can stand in for the instance
+            self.check_object_permissions(request, instance)
+            
+            if request.user.is_authenticated:
+                activity_repository.record_activity(
+                    request.user.id, content_id,
+                    instance['content_type'] if fast else instance.content_type, 'view'
+                )
+            if fast:
+                context = self.get_serializer_context()
+                return Response(fast_serializers.ContentDetailRows(context).serialize([instance])[0])
+        else:
+            instance = self.get_object()
+            # An atomic increment; a full save() would also signal a catalogue change
+            instance.updated_at = timezone.now()
+            Content.objects.filter(pk=instance.pk).update(
+                view_count=F('view_count') + 1, updated_at=instance.updated_at
             )
+            instance.view_count += 1
+            
+            # Log user activity
+            if request.user.is_authenticated:
+                UserActivity.objects.create(
+                    user=request.user,
+                    content=instance,
+                    content_type=instance.content_type,
+                    action='view'
+                )
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get', 'head'], url_path='stream', url_name='stream')
+    def stream(self, request, pk=None):
+        """
+        Stream the item's file with range and conditional request support,
+        for a signed stream_url or an authenticated user entitled to it.
+        """
+        signature = request.query_params.get('signature')
+        if signature:
+            user_id = unsign_stream(signature, pk)
+            if user_id is None:
+                return Response({"error": "Invalid or expired media link"}, status=status.HTTP_403_FORBIDDEN)
+            # Deferred user: a cached entitlement needs no query
+            user = User.from_db('default', ['id'], [user_id])
+        elif request.user.is_authenticated:
+            user = request.user
+        else:
+            raise NotAuthenticated()
+        
+        try:
+            content = Content.objects.filter(pk=int(pk)).values('file', 'is_premium').first()
+        except ValueError:
+            content = None
+        if content is None or not content['file']:
+            raise Http404
+        if content['is_premium'] and not get_entitlement(user).has_premium:
+            return Response(
+                {"error": "A premium subscription is required for this content"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return serve_media(request, Content._meta.get_field('file').storage, content['file'])
+    
     @action(detail=False, methods=['get'])
     def featured(self, request):
         """
@@ -188,6 +321,9 @@ class UserFavoriteViewSet(viewsets.ModelViewSet):
         if not content_id:
             return Response({"error": "Content ID is required"}, status=status.HTTP_400_BAD_REQUEST)
         
+        if NATIVE_QUERIES:
+            return native_toggle(UserFavorite, request, content_id)
+        
         try:
             content = Content.objects.get(id=content_id)
         except Content.DoesNotExist:
@@ -226,6 +362,9 @@ class UserWatchlistViewSet(viewsets.ModelViewSet):
         if not content_id:
             return Response({"error": "Content ID is required"}, status=status.HTTP_400_BAD_REQUEST)
         
+        if NATIVE_QUERIES:
+            return native_toggle(UserWatchlist, request, content_id)
+        
         try:
             content = Content.objects.get(id=content_id)
         except Content.DoesNotExist:
@@ -241,3 +380,69 @@ class UserWatchlistViewSet(viewsets.ModelViewSet):
             return Response({"status": "removed"}, status=status.HTTP_200_OK)
         
         return Response({"status": "added"}, status=status.HTTP_201_CREATED)
+
+class MediaUploadViewSet(viewsets.GenericViewSet):
+    """
+    Resumable chunked uploads of large media into content-addressed storage.
+    
+    POST /uploads/ with filename, size and kind starts an upload.
+    PUT /uploads/<id>/chunks/<index>/ sends one chunk as the raw request body.
+    POST /uploads/<id>/complete/ assembles the file.
+    GET /uploads/<id>/ lists the chunks still missing, for resuming.
+    """
+    serializer_class = MediaUploadSerializer
+    permission_classes = [permissions.IsAdminUser]
+    lookup_field = 'upload_id'
+    
+    def get_queryset(self):
+        return MediaUpload.objects.filter(user=self.request.user)
+    
+    def create(self, request):
+        """
+        Start an upload; an optional content_hash is checked when it completes.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            upload = uploads.start_upload(
+                request.user, data['filename'], data['size'], data.get('kind', 'file'), data.get('content_hash')
+            )
+        except uploads.UploadError as e:
+            return Response({"error": e.detail}, status=e.status_code)
+        return Response(self.get_serializer(upload).data, status=status.HTTP_201_CREATED)
+    
+    def retrieve(self, request, upload_id=None):
+        return Response(self.get_serializer(self.get_object()).data)
+    
+    def destroy(self, request, upload_id=None):
+        """
+        Abandon an upload; stored media of a completed upload is kept.
+        """
+        uploads.discard_upload(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>\d+)')
+    def chunk(self, request, upload_id=None, index=None):
+        """
+        Store one chunk, streamed from the raw body; X-Chunk-SHA256 is verified when sent.
+        """
+        upload = self.get_object()
+        try:
+            sha256 = uploads.write_chunk(
+                upload, int(index), request.stream or io.BytesIO(), request.headers.get('X-Chunk-SHA256')
+            )
+        except uploads.UploadError as e:
+            return Response({"error": e.detail}, status=e.status_code)
+        return Response({"index": int(index), "sha256": sha256})
+    
+    @action(detail=True, methods=['post'])
+    def complete(self, request, upload_id=None):
+        """
+        Assemble the received chunks into content-addressed storage.
+        """
+        try:
+            upload = uploads.complete_upload(self.get_object())
+        except uploads.UploadError as e:
+            return Response({"error": e.detail}, status=e.status_code)
+        return Response(self.get_serializer(upload).data)
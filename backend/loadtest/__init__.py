@@ -0,0 +1,2 @@
+
+# HTTP load-test tooling for the ZamaniVault API
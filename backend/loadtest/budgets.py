@@ -0,0 +1,52 @@
+
+"""
+Per-route latency and query budgets.
+
+A budgets file is JSON with a ``defaults`` object and a ``routes`` object
+keyed by route name. Each entry may set ``p50_ms``, ``p95_ms``, ``p99_ms``,
+``max_queries`` (highest per-request query count seen) and ``error_rate``
+(share of requests answered with 5xx or not at all). Route entries override
+the defaults.
+"""
+
+import json
+
+LATENCY_LIMITS = ('p50', 'p95', 'p99')
+
+def load_budgets(path):
+    with open(path) as f:
+        return json.load(f)
+
+def route_budget(budgets, route):
+    return {**budgets.get('defaults', {}), **budgets.get('routes', {}).get(route, {})}
+
+def check_budgets(summary, budgets):
+    """
+    Compare a ``run_load`` summary with ``budgets``.
+
+    Returns ``(violations, warnings)`` as lists of messages. A query budget
+    on a route whose responses carried no ``Server-Timing`` query count is a
+    warning, not a violation.
+    """
+    violations, warnings = [], []
+    for route in budgets.get('routes', {}):
+        if route not in summary:
+            warnings.append(f"{route}: no requests were made")
+    for route, result in sorted(summary.items()):
+        budget = route_budget(budgets, route)
+        for name in LATENCY_LIMITS:
+            limit = budget.get(f'{name}_ms')
+            actual = result['latency_ms'][name]
+            if limit is not None and actual > limit:
+                violations.append(f"{route}: {name} {actual:.1f} ms exceeds budget {limit} ms")
+        if 'max_queries' in budget:
+            actual = result['queries']['max']
+            if actual is None:
+                warnings.append(f"{route}: no query counts reported, max_queries not checked")
+            elif actual > budget['max_queries']:
+                violations.append(f"{route}: {actual} queries exceeds budget {budget['max_queries']}")
+        if 'error_rate' in budget and result['requests']:
+            rate = result['errors'] / result['requests']
+            if rate > budget['error_rate']:
+                violations.append(f"{route}: error rate {rate:.2%} exceeds budget {budget['error_rate']:.2%}")
+    return violations, warnings
@@ -0,0 +1,71 @@
+
+"""
+Compare the WSGI and ASGI deployments under the same slow-read traffic mix.
+
+Start both servers against the same database, for example::
+
+    gunicorn zamanivault.wsgi -w 4 -b 127.0.0.1:8000
+    uvicorn zamanivault.asgi:application --workers 4 --port 8001
+
+then run::
+
+    python -m loadtest.compare_deployments --wsgi-url http://127.0.0.1:8000 \\
+        --asgi-url http://127.0.0.1:8001 --email user@example.com --password user123
+
+The WSGI server is driven through the DRF endpoints and the ASGI server
+through their /api/async/ counterparts.
+"""
+
+import argparse
+import json
+from .runner import Route, login, run_load
+
+def traffic_mix(prefix):
+    return [
+        Route('recommendations', 'GET', f'/api/{prefix}ml/recommendations/', weight=3),
+        Route('insights', 'GET', f'/api/{prefix}ml/insights/', weight=2),
+        Route('content_list', 'GET', f'/api/{prefix}content/content/', weight=3),
+        Route(
+            'content_detail', 'GET', '', weight=2,
+            path_factory=lambda session, rng, prefix=prefix: f'/api/{prefix}content/content/{rng.randint(1, 50)}/'
+        ),
+        Route('health', 'GET', f'/api/{prefix}health/', weight=1),
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wsgi-url', required=True)
+    parser.add_argument('--asgi-url', required=True)
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--output', help='Write the JSON comparison to this file.')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for label, base_url, prefix in (('wsgi', args.wsgi_url, ''), ('asgi', args.asgi_url, 'async/')):
+        token = login(base_url, args.email, args.password)
+        results[label] = run_load(
+            base_url.rstrip('/'), traffic_mix(prefix),
+            concurrency=args.concurrency, duration=args.duration, token=token
+        )
+
+    print(f"{'route':<16} {'deployment':<10} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+    for route in sorted(results['wsgi']):
+        for label in ('wsgi', 'asgi'):
+            summary = results[label].get(route)
+            if summary is None:
+                continue
+            latency = summary['latency_ms']
+            print(
+                f"{route:<16} {label:<10} {summary['rps']:>8} {latency['p50']:>9} "
+                f"{latency['p95']:>9} {latency['p99']:>9} {summary['errors']:>7}"
+            )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
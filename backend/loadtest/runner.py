@@ -0,0 +1,179 @@
+
+"""
+Minimal threaded HTTP load generator.
+
+Each worker thread keeps its own ``requests.Session`` and repeatedly picks a
+route from a weighted mix until the duration elapses. Latencies are
+collected per route and summarised as RPS and p50/p95/p99.
+"""
+
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+import requests
+
+@dataclass
+class Route:
+    """One entry in a traffic mix."""
+
+    name: str
+    method: str
+    path: str
+    weight: float = 1.0
+    json: dict = None
+    # Called with (session, rng) per request, overriding ``path`` and ``json``
+    path_factory: object = None
+    json_factory: object = None
+    # Called with (session, rng) per request to add request headers
+    headers_factory: object = None
+    # Send the worker's bearer token (logins and public routes go without)
+    authenticated: bool = True
+
+@dataclass
+class RouteStats:
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+    status_codes: dict = field(default_factory=lambda: defaultdict(int))
+    server_timings: list = field(default_factory=list)
+
+def percentile(values, q):
+    """Nearest-rank percentile of ``values`` (0 <= q <= 100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def parse_server_timing(header):
+    """Parse a ``Server-Timing`` header into ``{name: {'dur': float, 'desc': str}}``."""
+    metrics = {}
+    for entry in (header or '').split(','):
+        parts = [part.strip() for part in entry.split(';') if part.strip()]
+        if not parts:
+            continue
+        metric = {}
+        for param in parts[1:]:
+            key, _, value = param.partition('=')
+            value = value.strip('"')
+            metric[key] = float(value) if key == 'dur' else value
+        metrics[parts[0]] = metric
+    return metrics
+
+def query_count(timing):
+    """Return the database query count reported as ``db;desc="N queries"``, if any."""
+    words = timing.get('db', {}).get('desc', '').split()
+    return int(words[0]) if words and words[0].isdigit() else None
+
+class TokenAuth:
+    """Access/refresh token pair that refreshes itself when the access token is rejected."""
+
+    def __init__(self, base_url, access, refresh=None):
+        self.base_url = base_url
+        self.access = access
+        self.refresh_token = refresh
+
+    def header(self):
+        return f"Bearer {self.access}"
+
+    def refresh(self, session, timeout=30):
+        """Get a new access token, e.g. after its entitlement claims went stale."""
+        if not self.refresh_token:
+            return False
+        response = session.post(
+            f"{self.base_url}/api/auth/token/refresh/", json={'refresh': self.refresh_token}, timeout=timeout
+        )
+        if response.status_code != 200:
+            return False
+        data = response.json()
+        self.access = data['access']
+        self.refresh_token = data.get('refresh', self.refresh_token)
+        return True
+
+def login(base_url, email, password, full=False):
+    """Return an access token for ``email``, or a ``TokenAuth`` when ``full`` is set."""
+    response = requests.post(f"{base_url}/api/auth/login/", json={'email': email, 'password': password}, timeout=30)
+    response.raise_for_status()
+    data = response.json()
+    return TokenAuth(base_url, data['access'], data.get('refresh')) if full else data['access']
+
+def run_load(base_url, routes, concurrency=16, duration=30.0, token=None, seed=0, timeout=30.0, auth=None):
+    """
+    Drive ``routes`` against ``base_url`` and return the per-route summary.
+
+    Every worker sends ``token``, or, when ``auth`` (a list of ``TokenAuth``)
+    is given, worker ``i`` uses ``auth[i % len(auth)]`` and refreshes it when
+    a request is answered with 401.
+    """
+    stats = defaultdict(RouteStats)
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    weights = [route.weight for route in routes]
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        credentials = auth[index % len(auth)] if auth else (TokenAuth(base_url, token) if token else None)
+        while time.monotonic() < deadline:
+            route = rng.choices(routes, weights)[0]
+            path = route.path_factory(session, rng) if route.path_factory else route.path
+            body = route.json_factory(session, rng) if route.json_factory else route.json
+            headers = route.headers_factory(session, rng) if route.headers_factory else {}
+            started = time.perf_counter()
+            try:
+                if credentials and route.authenticated:
+                    headers['Authorization'] = credentials.header()
+                response = session.request(route.method, base_url + path, json=body, headers=headers, timeout=timeout)
+                if response.status_code == 401 and credentials and route.authenticated and credentials.refresh(session):
+                    headers['Authorization'] = credentials.header()
+                    response = session.request(route.method, base_url + path, json=body, headers=headers, timeout=timeout)
+                elapsed = (time.perf_counter() - started) * 1000
+                timing = parse_server_timing(response.headers.get('Server-Timing'))
+                failed = response.status_code >= 500
+                code = response.status_code
+            except requests.RequestException:
+                elapsed = (time.perf_counter() - started) * 1000
+                timing, failed, code = {}, True, 'error'
+            with lock:
+                route_stats = stats[route.name]
+                route_stats.latencies.append(elapsed)
+                route_stats.status_codes[code] += 1
+                if timing:
+                    route_stats.server_timings.append(timing)
+                if failed:
+                    route_stats.errors += 1
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return summarise(stats, elapsed)
+
+def summarise(stats, elapsed):
+    """Turn raw per-route stats into a JSON-serialisable summary."""
+    summary = {}
+    for name, route_stats in sorted(stats.items()):
+        latencies = route_stats.latencies
+        queries = [
+            count for count in map(query_count, route_stats.server_timings) if count is not None
+        ]
+        summary[name] = {
+            'requests': len(latencies),
+            'rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            'errors': route_stats.errors,
+            'status_codes': {str(code): count for code, count in route_stats.status_codes.items()},
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50) or 0, 2),
+                'p95': round(percentile(latencies, 95) or 0, 2),
+                'p99': round(percentile(latencies, 99) or 0, 2),
+            },
+            'queries': {
+                'mean': round(sum(queries) / len(queries), 2) if queries else None,
+                'max': max(queries) if queries else None,
+            },
+        }
+    return summary
@@ -0,0 +1,145 @@
+
+"""
+End-to-end API load test with latency and query budgets.
+
+It drives a realistic traffic mix against a running server that holds a
+dataset built with ``manage.py generate_test_data``. The mix covers browsing
+and searching content, opening detail pages, toggling favorites,
+recommendations, insights, logging in and subscribing. Each worker acts as a
+different generated user.
+
+It reports RPS, p50/p95/p99 latency and query counts per route. Query counts
+come from the ``Server-Timing`` header set by the performance middleware.
+The results are checked against a budgets file (see ``budgets.py``), and the
+script exits with status 1 when any budget is exceeded::
+
+    python manage.py generate_test_data --users 100000 --content 20000
+    gunicorn zamanivault.wsgi -w 4 -b 127.0.0.1:8000
+    python -m loadtest.suite --base-url http://127.0.0.1:8000 \\
+        --users 100000 --content-ids 1-20000
+
+Pass the user count and seed the dataset was generated with, and the
+content id range that ``generate_test_data`` reported.
+"""
+
+import argparse
+import json
+import os
+import sys
+import uuid
+import requests
+from content.data_generator import loadtest_email
+from ml_service.synthetic import TOPICS
+from .budgets import load_budgets, check_budgets
+from .runner import Route, login, run_load
+
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(__file__), 'budgets.json')
+SEARCH_TERMS = sorted({word for words in TOPICS.values() for word in words})
+
+def id_range(value):
+    first, _, last = value.partition('-')
+    try:
+        first, last = int(first), int(last or first)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected FIRST-LAST, got {value!r}")
+    if last < first:
+        raise argparse.ArgumentTypeError(f"Empty id range {value!r}")
+    return first, last
+
+def skewed_id(rng, first, last):
+    """Pick an id in ``first..last``, favouring the low end like a popularity power law."""
+    return min(first + int(rng.paretovariate(1.2)) - 1, last)
+
+def traffic_mix(content_ids, users, data_seed, password, plan_ids):
+    first_content, last_content = content_ids
+
+    def content_id(session, rng):
+        return skewed_id(rng, first_content, last_content)
+
+    routes = [
+        Route('content_list', 'GET', '', weight=25,
+              path_factory=lambda session, rng: f"/api/content/content/?page={rng.randint(1, 20)}"),
+        Route('content_search', 'GET', '', weight=10,
+              path_factory=lambda session, rng: f"/api/content/content/?search={rng.choice(SEARCH_TERMS)}"),
+        Route('content_detail', 'GET', '', weight=25,
+              path_factory=lambda session, rng: f"/api/content/content/{content_id(session, rng)}/"),
+        Route('favorite_toggle', 'POST', '/api/content/favorites/toggle/', weight=8,
+              json_factory=lambda session, rng: {'content_id': content_id(session, rng)}),
+        Route('recommendations', 'GET', '/api/ml/recommendations/', weight=15),
+        Route('insights', 'GET', '/api/ml/insights/', weight=7),
+        Route('login', 'POST', '/api/auth/login/', weight=5, authenticated=False,
+              json_factory=lambda session, rng: {
+                  'email': loadtest_email(data_seed, rng.randrange(users)), 'password': password
+              }),
+    ]
+    if plan_ids:
+        routes.append(Route(
+            'subscribe', 'POST', '/api/subscriptions/subscriptions/subscribe/', weight=5,
+            json_factory=lambda session, rng: {'plan_id': rng.choice(plan_ids), 'payment_method': 'loadtest'},
+            headers_factory=lambda session, rng: {'Idempotency-Key': str(uuid.uuid4())}
+        ))
+    return routes
+
+def paid_plan_ids(base_url, auth):
+    response = requests.get(
+        f"{base_url}/api/subscriptions/plans/", headers={'Authorization': auth.header()}, timeout=30
+    )
+    response.raise_for_status()
+    data = response.json()
+    plans = data['results'] if isinstance(data, dict) else data
+    return [plan['id'] for plan in plans if float(plan['price']) > 0]
+
+def print_summary(summary):
+    print(f"{'route':<18} {'requests':>9} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8} {'errors':>7}")
+    for route, result in summary.items():
+        latency = result['latency_ms']
+        queries = result['queries']['max']
+        print(
+            f"{route:<18} {result['requests']:>9} {result['rps']:>8} {latency['p50']:>9} {latency['p95']:>9} "
+            f"{latency['p99']:>9} {'-' if queries is None else queries:>8} {result['errors']:>7}"
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--budgets', default=DEFAULT_BUDGETS)
+    parser.add_argument('--users', type=int, default=10000, help='Number of generated users.')
+    parser.add_argument('--data-seed', type=int, default=0, help='Seed the dataset was generated with.')
+    parser.add_argument('--content-ids', type=id_range, default=(1, 5000), help='Generated content ids, FIRST-LAST.')
+    parser.add_argument('--password', default='loadtest123', help='Password of the generated users.')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=60.0)
+    parser.add_argument('--warmup', type=float, default=5.0, help='Seconds of unmeasured traffic first.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON summary to this file.')
+    args = parser.parse_args(argv)
+
+    base_url = args.base_url.rstrip('/')
+    if args.users < 1:
+        parser.error('--users must be at least 1.')
+    auth = [
+        login(base_url, loadtest_email(args.data_seed, index), args.password, full=True)
+        for index in range(min(args.users, args.concurrency))
+    ]
+    routes = traffic_mix(args.content_ids, args.users, args.data_seed, args.password, paid_plan_ids(base_url, auth[0]))
+
+    if args.warmup:
+        run_load(base_url, routes, concurrency=args.concurrency, duration=args.warmup, seed=args.seed, auth=auth)
+    summary = run_load(
+        base_url, routes, concurrency=args.concurrency, duration=args.duration, seed=args.seed + 1, auth=auth
+    )
+    print_summary(summary)
+
+    violations, warnings = check_budgets(summary, load_budgets(args.budgets))
+    for message in warnings:
+        print(f"warning: {message}", file=sys.stderr)
+    for message in violations:
+        print(f"budget exceeded: {message}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': summary, 'violations': violations, 'warnings': warnings}, f, indent=2)
+    return 1 if violations else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
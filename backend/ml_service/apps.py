@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MlServiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ml_service'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .warmup import warm_on_startup
+        warm_on_startup()
@@ -0,0 +1,68 @@
+
+"""
+Async variants of the recommendation and insight endpoints.
+
+Database reads use Django's async ORM, and scoring runs in the CPU executor.
+While a slow request waits, the event loop keeps serving other requests.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from zamanivault.async_api import async_api_view, json_response, run_cpu_bound
+from accounts.models import UserActivity
+from content.models import Content
+from .serializers import RecommendationSerializer, UserInsightSerializer
+from .ml_utils import get_content_recommendations, get_user_insights
+from .eligibility import get_content_bitsets, can_access_premium, excluded_content_ids
+from .cache import recommendation_cache, recommendation_version
+from .rollups import aread_window_counts
+
+User = get_user_model()
+
+@async_api_view()
+async def user_recommendations(request, user_id=None):
+    """
+    Async version of ``UserRecommendationsView.get``.
+    """
+    target_user_id = user_id if user_id and request.user.is_staff else request.user.id
+
+    version = await sync_to_async(recommendation_version)(target_user_id)
+    cached = recommendation_cache.get(target_user_id, version)
+    if cached is not None:
+        return json_response(cached)
+
+    if target_user_id == request.user.id:
+        target_user = request.user
+    else:
+        target_user = await User.objects.filter(pk=target_user_id).afirst()
+
+    contents = [row async for row in Content.objects.all().values()]
+    activities = [row async for row in UserActivity.objects.filter(user_id=target_user_id).values()]
+
+    bitsets = await sync_to_async(get_content_bitsets)()
+    eligibility = bitsets.eligibility(
+        allow_premium=await sync_to_async(can_access_premium)(target_user),
+        excluded_ids=await sync_to_async(excluded_content_ids)(target_user_id),
+    )
+
+    recommendations = await run_cpu_bound(
+        get_content_recommendations, target_user_id, contents, activities, eligibility=eligibility
+    )
+    data = RecommendationSerializer(recommendations, many=True).data
+    recommendation_cache.set(target_user_id, version, data)
+    return json_response(data)
+
+@async_api_view()
+async def user_insights(request, user_id=None):
+    """
+    Async version of ``UserInsightsView.get``.
+    """
+    target_user_id = user_id if user_id and request.user.is_staff else request.user.id
+
+    current_counts, previous_counts = await aread_window_counts(target_user_id)
+    insights = get_user_insights(
+        current_counts, previous_counts,
+        trend_threshold=getattr(settings, 'ML_INSIGHTS_TREND_THRESHOLD', 5)
+    )
+    return json_response(UserInsightSerializer(insights, many=True).data)
@@ -0,0 +1,170 @@
+
+"""
+Offline evaluation and latency benchmark for the recommenders.
+
+Synthetic activity is split by time; every recommender is asked for the
+top-k items of each evaluation user given only the training events, and the
+recommendations are scored against the items the user touched after the
+split. Results are plain dicts so they can be dumped as JSON and compared
+between runs.
+"""
+
+import math
+import platform
+import time
+import tracemalloc
+from collections import defaultdict
+import numpy as np
+from .ml_utils import get_content_recommendations
+from .synthetic import generate_catalogue, generate_activity, activity_rows, time_split
+
+def precision_at_k(recommended, relevant, k):
+    """Fraction of the top-k recommendations that are relevant."""
+    if not k:
+        return 0.0
+    return len(set(recommended[:k]) & relevant) / k
+
+def recall_at_k(recommended, relevant, k):
+    """Fraction of the relevant items found in the top-k recommendations."""
+    if not relevant:
+        return 0.0
+    return len(set(recommended[:k]) & relevant) / len(relevant)
+
+def ndcg_at_k(recommended, relevant, k):
+    """Normalised discounted cumulative gain with binary relevance."""
+    dcg = sum(1.0 / math.log2(rank + 2) for rank, item in enumerate(recommended[:k]) if item in relevant)
+    ideal = sum(1.0 / math.log2(rank + 2) for rank in range(min(len(relevant), k)))
+    return dcg / ideal if ideal else 0.0
+
+def popularity_recommender(user_id, catalogue, user_rows, top_n):
+    """Baseline: the most viewed items the user has not interacted with yet."""
+    seen = {row['content_id'] for row in user_rows}
+    ranked = sorted(catalogue, key=lambda row: row['view_count'], reverse=True)
+    return [
+        {'content_id': str(row['id']), 'score': 0.5, 'reason': 'Popular content you might enjoy'}
+        for row in ranked if row['id'] not in seen
+    ][:top_n]
+
+def content_based_recommender(user_id, catalogue, user_rows, top_n):
+    """The production content-based recommender from ``ml_utils``."""
+    return get_content_recommendations(user_id, catalogue, user_rows, top_n=top_n)
+
+RECOMMENDERS = {
+    'popularity': popularity_recommender,
+    'content_based': content_based_recommender,
+}
+
+def evaluate_recommender(recommend, catalogue, train_rows_by_user, test_items_by_user, users, k):
+    """
+    Replay ``users`` through ``recommend`` and collect quality and latency metrics.
+
+    Latency is timed in one pass and peak memory measured in a second one:
+    tracemalloc hooks every allocation, which would inflate the timings.
+    """
+    precisions, recalls, ndcgs, latencies = [], [], [], []
+    recommended_items = set()
+
+    for user_id in users:
+        relevant = test_items_by_user[user_id]
+        started = time.perf_counter()
+        recommendations = recommend(user_id, catalogue, train_rows_by_user.get(user_id, []), k)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        recommended = [int(rec['content_id']) for rec in recommendations]
+        recommended_items.update(recommended)
+        precisions.append(precision_at_k(recommended, relevant, k))
+        recalls.append(recall_at_k(recommended, relevant, k))
+        ndcgs.append(ndcg_at_k(recommended, relevant, k))
+
+    tracemalloc.start()
+    try:
+        for user_id in users:
+            recommend(user_id, catalogue, train_rows_by_user.get(user_id, []), k)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies = np.asarray(latencies) if latencies else np.zeros(1)
+    return {
+        f'precision@{k}': round(float(np.mean(precisions)) if precisions else 0.0, 4),
+        f'recall@{k}': round(float(np.mean(recalls)) if recalls else 0.0, 4),
+        f'ndcg@{k}': round(float(np.mean(ndcgs)) if ndcgs else 0.0, 4),
+        'coverage': round(len(recommended_items) / len(catalogue), 4) if catalogue else 0.0,
+        'latency_ms': {
+            'p50': round(float(np.percentile(latencies, 50)), 3),
+            'p95': round(float(np.percentile(latencies, 95)), 3),
+            'p99': round(float(np.percentile(latencies, 99)), 3),
+        },
+        'peak_memory_mb': round(peak / (1024 * 1024), 2),
+        'users_evaluated': len(users),
+    }
+
+def run_benchmark(n_items=10000, n_users=10000, events_per_user=20, k=10, eval_users=200,
+                  train_fraction=0.8, seed=0, recommenders=None):
+    """
+    Generate a synthetic dataset and evaluate each recommender on it.
+
+    Only users with activity on both sides of the split are evaluated; at most
+    ``eval_users`` of them are sampled (deterministically from ``seed``).
+    """
+    started = time.perf_counter()
+    catalogue = generate_catalogue(n_items, seed=seed)
+    activity = generate_activity(catalogue, n_users, events_per_user=events_per_user, seed=seed)
+    train, test, cutoff = time_split(activity, train_fraction)
+    generation_seconds = time.perf_counter() - started
+
+    test_items_by_user = defaultdict(set)
+    for user_id, content_id in zip(test['user_id'].tolist(), test['content_id'].tolist()):
+        test_items_by_user[user_id].add(content_id)
+
+    train_users = set(np.unique(train['user_id']).tolist())
+    candidates = sorted(user for user in test_items_by_user if user in train_users)
+    rng = np.random.default_rng(seed + 2)
+    if len(candidates) > eval_users:
+        candidates = sorted(rng.choice(candidates, size=eval_users, replace=False).tolist())
+
+    # Only the evaluated users' training history is materialised as rows
+    selected = np.flatnonzero(np.isin(train['user_id'], candidates))
+    train_rows_by_user = defaultdict(list)
+    for row in activity_rows(train, catalogue, selected):
+        train_rows_by_user[row['user_id']].append(row)
+
+    results = {}
+    for name in recommenders or RECOMMENDERS:
+        results[name] = evaluate_recommender(
+            RECOMMENDERS[name], catalogue, train_rows_by_user, test_items_by_user, candidates, k
+        )
+
+    return {
+        'config': {
+            'items': n_items,
+            'users': n_users,
+            'events_per_user': events_per_user,
+            'k': k,
+            'eval_users': eval_users,
+            'train_fraction': train_fraction,
+            'seed': seed,
+        },
+        'dataset': {
+            'events': int(len(activity['user_id'])),
+            'train_events': int(len(train['user_id'])),
+            'test_events': int(len(test['user_id'])),
+            'split_at': cutoff.isoformat(),
+            'generation_seconds': round(generation_seconds, 3),
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+
+def record_model_metrics(model, report, recommender='content_based'):
+    """Store one recommender's benchmark results in ``MLModel.metrics``."""
+    metrics = dict(model.metrics or {})
+    metrics.update(report['results'][recommender])
+    metrics['benchmark'] = report['config']
+    model.metrics = metrics
+    model.save(update_fields=['metrics', 'updated_at'])
+    return metrics
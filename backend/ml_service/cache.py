@@ -0,0 +1,144 @@
+
+"""
+In-process cache for per-user recommendation results.
+
+Entries are keyed by user id and tagged with the version they were computed
+for (``recommendation_version``). The version combines:
+- the active ``MLModel`` version;
+- the catalogue generation;
+- the user's own generation.
+All three live in the shared cache. Saving a model republishes its version
+and invalidating a user replaces their token, so every worker misses on its
+next lookup, not only the one that handled the write. A version mismatch, an expired TTL or an explicit
+invalidation all count as misses. The cache is bounded and evicts the
+least recently used user first.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+
+CACHE_ALIAS = getattr(settings, 'ML_GENERATION_CACHE_ALIAS', 'default')
+
+def _user_generation_key(user_id):
+    return f"ml:user-generation:{user_id}"
+
+def get_user_generation(user_id):
+    """Return the shared token that changes whenever the user's recommendations are invalidated."""
+    cache = caches[CACHE_ALIAS]
+    key = _user_generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+def bump_user_generations(user_ids):
+    caches[CACHE_ALIAS].set_many({_user_generation_key(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
+
+class RecommendationCache:
+    """Thread-safe, size-bounded LRU cache with per-entry TTL."""
+
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id, version):
+        """Return the cached value for ``user_id`` at ``version`` or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version or entry[1] < now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, user_id, version, value):
+        """Store ``value`` for ``user_id`` computed at ``version``."""
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[user_id] = (version, expires, value)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        """Drop the user's entry here and, through their shared generation, in every worker."""
+        self.invalidate_users([user_id])
+
+    def invalidate_users(self, user_ids):
+        user_ids = list(user_ids)
+        bump_user_generations(user_ids)
+        with self._lock:
+            for user_id in user_ids:
+                if self._entries.pop(user_id, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry, e.g. when the active model changes."""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the current hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'miss_rate': round(self.misses / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+recommendation_cache = RecommendationCache(
+    max_size=getattr(settings, 'ML_RECOMMENDATION_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'ML_RECOMMENDATION_CACHE_TTL', 300),
+)
+
+MODEL_VERSION_KEY = 'ml:active-model-version'
+
+def _load_active_model_version():
+    from .models import MLModel
+
+    active = MLModel.objects.filter(is_active=True).values_list('name', 'version').first()
+    return f"{active[0]}@{active[1]}" if active else 'none'
+
+def get_active_model_version():
+    """Return the version string of the active ``MLModel``, as published in the shared cache."""
+    cache = caches[CACHE_ALIAS]
+    version = cache.get(MODEL_VERSION_KEY)
+    if version is None:
+        cache.add(MODEL_VERSION_KEY, _load_active_model_version(), None)
+        version = cache.get(MODEL_VERSION_KEY)
+    return version
+
+def recommendation_version(user_id):
+    """Return the version ``user_id``'s recommendations are cached under."""
+    from .eligibility import get_catalogue_generation
+
+    return f"{get_active_model_version()}:{get_catalogue_generation()}:{get_user_generation(user_id)}"
+
+def invalidate_active_model_version():
+    """Publish the current active model version to every worker and drop local recommendations."""
+    caches[CACHE_ALIAS].set(MODEL_VERSION_KEY, _load_active_model_version(), None)
+    recommendation_cache.clear()
@@ -0,0 +1,143 @@
+"""
+Eligibility masks used to filter recommendation candidates.
+
+The catalogue is indexed once into sorted content ids plus a boolean mask
+per content flag, such as ``is_premium``. Per-request eligibility is then a
+couple of vectorised operations over those masks. Premium gating and
+history exclusions therefore happen inside candidate retrieval instead of
+as a post-filter over the recommended items.
+
+Each worker keeps its own index, tied to a catalogue generation token in
+the shared cache. Content changes replace the token, and every worker
+rebuilds its index on the next request after that. The index is also
+rebuilt once it is ``ML_ELIGIBILITY_MAX_AGE`` seconds old, as a backstop
+if the token is evicted from the cache.
+"""
+
+import threading
+import time
+import uuid
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+CACHE_ALIAS = getattr(settings, 'ML_GENERATION_CACHE_ALIAS', 'default')
+MAX_AGE = getattr(settings, 'ML_ELIGIBILITY_MAX_AGE', 300)
+GENERATION_KEY = 'ml:catalogue-generation'
+
+class ContentBitsets:
+    """Sorted content ids with boolean masks for per-content flags."""
+
+    def __init__(self, ids, premium, generation=None):
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        self.ids = ids[order]
+        self.size = len(self.ids)
+        self.premium = np.asarray(premium, dtype=bool)[order]
+        self.generation = generation
+        self.built_at = time.monotonic()
+
+    def positions(self, content_ids):
+        """Map content ids to positions; unknown ids map to -1."""
+        content_ids = np.asarray(content_ids, dtype=np.int64)
+        if not self.size:
+            return np.full(len(content_ids), -1, dtype=np.int64)
+        pos = np.searchsorted(self.ids, content_ids)
+        pos = np.minimum(pos, self.size - 1)
+        return np.where(self.ids[pos] == content_ids, pos, -1)
+
+    def eligibility(self, allow_premium=True, excluded_ids=()):
+        """Combine the catalogue masks into a per-user eligibility filter."""
+        mask = np.ones(self.size, dtype=bool) if allow_premium else ~self.premium
+        if len(excluded_ids):
+            pos = self.positions(list(excluded_ids))
+            mask[pos[pos >= 0]] = False
+        return Eligibility(self, mask)
+
+class Eligibility:
+    """Per-request eligibility mask over a ``ContentBitsets`` catalogue."""
+
+    def __init__(self, bitsets, mask):
+        self.bitsets = bitsets
+        self.mask = mask
+
+    def mask_for(self, content_ids):
+        """
+        Return a boolean array aligned with ``content_ids``.
+
+        Ids missing from the index (content created after it was built)
+        are treated as ineligible so premium items can never leak through.
+        """
+        pos = self.bitsets.positions(content_ids)
+        eligible = np.zeros(len(pos), dtype=bool)
+        known = pos >= 0
+        eligible[known] = self.mask[pos[known]]
+        return eligible
+
+_bitsets = None
+_bitsets_lock = threading.Lock()
+
+def get_catalogue_generation():
+    """Return the shared token that changes whenever the catalogue changes."""
+    cache = caches[CACHE_ALIAS]
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Missing (first use or evicted): a fresh token forces every worker to rebuild
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+def _is_current(bitsets, generation):
+    return (
+        bitsets is not None and bitsets.generation == generation
+        and time.monotonic() - bitsets.built_at < MAX_AGE
+    )
+
+def get_content_bitsets():
+    """Return this worker's catalogue index, rebuilding it when the catalogue has changed."""
+    global _bitsets
+    generation = get_catalogue_generation()
+    bitsets = _bitsets
+    if not _is_current(bitsets, generation):
+        from content.models import Content
+        with _bitsets_lock:
+            if not _is_current(_bitsets, generation):
+                rows = list(Content.objects.order_by().values_list('id', 'is_premium'))
+                ids = [row[0] for row in rows]
+                premium = [bool(row[1]) for row in rows]
+                _bitsets = ContentBitsets(ids, premium, generation)
+            bitsets = _bitsets
+    return bitsets
+
+def invalidate_content_bitsets():
+    """Make every worker rebuild its index on its next request."""
+    global _bitsets
+    caches[CACHE_ALIAS].set(GENERATION_KEY, uuid.uuid4().hex, None)
+    with _bitsets_lock:
+        _bitsets = None
+
+def can_access_premium(user):
+    """Return True if ``user`` is entitled to premium content."""
+    from subscriptions.entitlements import get_entitlement
+
+    if user is None:
+        return False
+    return get_entitlement(user).has_premium
+
+def excluded_content_ids(user_id):
+    """Return ids of content the user has already viewed or favorited."""
+    from accounts.models import UserActivity
+    from content.models import UserFavorite
+    from zamanivault.mongo import NATIVE_QUERIES
+
+    if NATIVE_QUERIES:
+        from accounts.repository import activity_content_ids
+        from content.repository import favorite_content_ids
+
+        return activity_content_ids(user_id) | favorite_content_ids(user_id)
+
+    excluded = set(
+        UserActivity.objects.filter(user_id=user_id, content__isnull=False).values_list('content_id', flat=True)
+    )
+    excluded.update(UserFavorite.objects.filter(user_id=user_id).values_list('content_id', flat=True))
+    return excluded
@@ -0,0 +1,62 @@
+
+import json
+from django.core.management.base import BaseCommand, CommandError
+from ml_service.benchmark import RECOMMENDERS, run_benchmark, record_model_metrics
+from ml_service.models import MLModel
+
+class Command(BaseCommand):
+    help = 'Evaluate the recommenders offline on synthetic data and report quality and latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=10000, help='Number of catalogue items.')
+        parser.add_argument('--users', type=int, default=10000, help='Number of users.')
+        parser.add_argument('--events-per-user', type=int, default=20, help='Mean events per user.')
+        parser.add_argument('--k', type=int, default=10, help='Cut-off for precision/recall/NDCG.')
+        parser.add_argument('--eval-users', type=int, default=200, help='Maximum users replayed per recommender.')
+        parser.add_argument('--train-fraction', type=float, default=0.8, help='Share of events (by time) used for training.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--recommender', action='append', choices=sorted(RECOMMENDERS), dest='recommenders',
+            help='Recommender to evaluate (repeatable, defaults to all).'
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument(
+            '--record-model', metavar='MODEL_ID',
+            help="Store the content_based results in this MLModel's metrics ('active' for the active model)."
+        )
+
+    def handle(self, *args, **options):
+        model = None
+        if options['record_model']:
+            models = MLModel.objects.all()
+            if options['record_model'] == 'active':
+                model = models.filter(is_active=True).first()
+            else:
+                model = models.filter(pk=options['record_model']).first()
+            if model is None:
+                raise CommandError(f"MLModel {options['record_model']!r} not found.")
+
+        report = run_benchmark(
+            n_items=options['items'],
+            n_users=options['users'],
+            events_per_user=options['events_per_user'],
+            k=options['k'],
+            eval_users=options['eval_users'],
+            train_fraction=options['train_fraction'],
+            seed=options['seed'],
+            recommenders=options['recommenders'],
+        )
+
+        if model is not None:
+            if 'content_based' not in report['results']:
+                raise CommandError('--record-model requires the content_based recommender to be evaluated.')
+            record_model_metrics(model, report)
+            self.stderr.write(f"Recorded metrics on {model}")
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Wrote benchmark report to {options['output']}")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,20 @@
+
+from django.core.management.base import BaseCommand
+from ml_service.snapshots import SNAPSHOT_DIR, ActivitySnapshot, export_activity
+
+class Command(BaseCommand):
+    help = 'Append new UserActivity rows to the columnar activity snapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=SNAPSHOT_DIR, help='Snapshot directory.')
+        parser.add_argument('--chunk-size', type=int, default=100000, help='Rows read per query.')
+        parser.add_argument('--rebuild', action='store_true', help='Discard the snapshot and export everything again.')
+
+    def handle(self, *args, **options):
+        exported = export_activity(
+            path=options['path'], chunk_size=options['chunk_size'], rebuild=options['rebuild'], stdout=self.stdout
+        )
+        snapshot = ActivitySnapshot(options['path'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {exported} new activities; snapshot holds {len(snapshot)} over {len(snapshot.days)} days"
+        ))
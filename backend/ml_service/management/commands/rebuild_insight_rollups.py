@@ -0,0 +1,82 @@
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts.models import UserActivity
+from accounts.retention import day_bounds, hot_cutoff
+from content.models import ContentCategory
+from ml_service.models import UserInterestRollup
+from ml_service.rollups import WINDOW_DAYS, increment_rollup
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the per-user interest rollups used by insights from UserActivity. Counters are '
+        'corrected in place by the difference to the recount, so increments logged while the '
+        'command runs are kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=WINDOW_DAYS * 2,
+            help='Number of most recent days to rebuild (0 rebuilds the whole hot window).'
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        days = options['days']
+        chunk_size = options['chunk_size']
+
+        activities = UserActivity.objects.order_by('pk')
+        rollups = UserInterestRollup.objects.all()
+        # Raw rows only exist for the hot window; rollups of compacted days are kept
+        since = hot_cutoff()
+        if days:
+            since = max(since, timezone.localdate() - timedelta(days=days - 1))
+        activities = activities.filter(created_at__gte=day_bounds(since)[0])
+        rollups = rollups.filter(day__gte=since)
+
+        # Snapshot the counters first, then recount activity up to the last row
+        # as it stands after the snapshot. Every row counted in the snapshot was
+        # inserted before its increment, so it is also recounted; later activity
+        # is already counted by the live path
+        stored = Counter({
+            (user_id, category, day): count
+            for user_id, category, day, count in rollups.values_list('user_id', 'category', 'day', 'count')
+        })
+        last = activities.order_by('-pk').values_list('pk', flat=True).first() or 0
+        activities = activities.filter(pk__lte=last)
+
+        categories = defaultdict(list)
+        for content_id, name in ContentCategory.objects.values_list('content_id', 'category__name'):
+            categories[content_id].append(name)
+
+        counts = Counter()
+        last_pk = 0
+        while True:
+            chunk = list(
+                activities.filter(pk__gt=last_pk)
+                .values_list('pk', 'user_id', 'content_id', 'content_type', 'created_at')[:chunk_size]
+            )
+            if not chunk:
+                break
+            for pk, user_id, content_id, content_type, created_at in chunk:
+                names = categories.get(content_id) or ([content_type] if content_type else [])
+                day = timezone.localdate(created_at)
+                for name in names:
+                    counts[(user_id, name, day)] += 1
+            last_pk = chunk[-1][0]
+
+        # Apply the difference rather than replacing rows, so concurrent
+        # increments are neither overwritten nor lost to a delete
+        corrected = 0
+        for key in set(counts) | set(stored):
+            delta = counts[key] - stored[key]
+            if delta:
+                increment_rollup(*key, amount=delta)
+                corrected += 1
+        rollups.filter(count=0).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(counts)} interest rollups ({corrected} corrected)"
+        ))
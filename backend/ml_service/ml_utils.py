@@ -6,177 +6,205 @@ import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from django.conf import settings
+from .profiling import phase
 
 # Path to the ML model
 MODEL_PATH = getattr(settings, 'ML_MODEL_PATH', 'ml_service/models/recommendation_model.pkl')
 
-def load_model():
-    """Load the ML model from disk."""
+def load_model(path=None):
+    """Load the ML model from disk (``ML_MODEL_PATH`` unless ``path`` is given)."""
+    path = path or MODEL_PATH
     try:
-        if os.path.exists(MODEL_PATH):
-            with open(MODEL_PATH, 'rb') as f:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
                 model = pickle.load(f)
             return model
         else:
-            print(f"Model file not found at {MODEL_PATH}")
+            print(f"Model file not found at {path}")
             return None
     except Exception as e:
         print(f"Error loading model: {e}")
         return None
 
-def get_content_recommendations(user_id, content_data, user_activity_data, top_n=5):
+def get_content_recommendations(user_id, content_data, user_activity_data, top_n=5, eligibility=None):
     """
     Generate content recommendations for a user based on their viewing history.
     
     In a real implementation, this would use the trained model. For now,
     we'll use a simple content-based filtering approach.
+    
+    ``eligibility`` is an optional ``Eligibility`` filter (see ``eligibility.py``).
+    Ineligible items are removed from the candidate set before ranking, so the
+    result holds ``top_n`` items whenever that many eligible items exist.
     """
     # Convert to DataFrames for easier manipulation
-    content_df = pd.DataFrame(content_data)
-    user_activity_df = pd.DataFrame(user_activity_data)
+    with phase('dataframe'):
+        content_df = pd.DataFrame(content_data)
+        user_activity_df = pd.DataFrame(user_activity_data)
     
-    # Filter activities for this user
-    user_activities = user_activity_df[user_activity_df['user_id'] == user_id]
+    if content_df.empty:
+        return []
+    
+    with phase('dataframe'):
+        content_df = content_df.reset_index(drop=True)
+        content_ids = pd.to_numeric(content_df['id'], errors='coerce').fillna(-1).astype(np.int64).to_numpy()
+        if eligibility is not None:
+            eligible = eligibility.mask_for(content_ids)
+        else:
+            eligible = np.ones(len(content_df), dtype=bool)
+        
+        # Filter activities for this user
+        if user_activity_df.empty:
+            user_activities = user_activity_df
+        else:
+            user_activities = user_activity_df[user_activity_df['user_id'] == user_id]
     
     if user_activities.empty:
         # User has no activity, return popular content
-        popular_content = content_df.sort_values(by='view_count', ascending=False).head(top_n)
+        with phase('sort'):
+            popular_content = content_df[eligible].sort_values(by='view_count', ascending=False).head(top_n)
         recommendations = []
-        for _, content in popular_content.iterrows():
-            recommendations.append({
-                'content_id': str(content['id']),
-                'score': 0.5,  # Default score
-                'reason': 'Popular content you might enjoy'
-            })
+        with phase('build'):
+            for _, content in popular_content.iterrows():
+                recommendations.append({
+                    'content_id': str(content['id']),
+                    'score': 0.5,  # Default score
+                    'reason': 'Popular content you might enjoy'
+                })
         return recommendations
     
-    # Get user's viewed content
-    viewed_content_ids = user_activities['content_id'].unique()
-    
-    # Get user's content preferences
-    if 'content_type' in user_activities.columns:
-        type_counts = user_activities['content_type'].value_counts()
-        preferred_type = type_counts.index[0] if not type_counts.empty else None
-    else:
-        preferred_type = None
-    
-    # Combine title and description for content-based filtering
-    content_df['text_features'] = content_df['title'] + ' ' + content_df['description']
-    
-    # Convert tags from JSON string to list if needed
-    if 'tags' in content_df.columns and isinstance(content_df['tags'].iloc[0], str):
-        content_df['tags'] = content_df['tags'].apply(lambda x: ' '.join(eval(x)) if x else '')
-        content_df['text_features'] += ' ' + content_df['tags']
-    elif 'tags' in content_df.columns:
-        content_df['text_features'] += ' ' + content_df['tags'].apply(lambda x: ' '.join(x) if x else '')
+    with phase('dataframe'):
+        # Get user's viewed content (activities on deleted content have no id)
+        viewed_content_ids = user_activities['content_id'].dropna().astype(np.int64).unique()
+        
+        # Get user's content preferences
+        if 'content_type' in user_activities.columns:
+            type_counts = user_activities['content_type'].value_counts()
+            preferred_type = type_counts.index[0] if not type_counts.empty else None
+        else:
+            preferred_type = None
+        
+        # Combine title and description for content-based filtering
+        content_df['text_features'] = content_df['title'] + ' ' + content_df['description']
+        
+        # Convert tags from JSON string to list if needed
+        if 'tags' in content_df.columns and isinstance(content_df['tags'].iloc[0], str):
+            content_df['tags'] = content_df['tags'].apply(lambda x: ' '.join(eval(x)) if x else '')
+            content_df['text_features'] += ' ' + content_df['tags']
+        elif 'tags' in content_df.columns:
+            content_df['text_features'] += ' ' + content_df['tags'].apply(lambda x: ' '.join(x) if x else '')
     
     # Create TF-IDF vectors
-    tfidf = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = tfidf.fit_transform(content_df['text_features'].fillna(''))
-    
-    # Calculate cosine similarity
-    cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
-    
-    # Get indices of content viewed by user
-    viewed_indices = content_df[content_df['id'].isin(viewed_content_ids)].index.tolist()
-    
-    # Calculate average similarity score for each content
-    sim_scores = np.zeros(len(content_df))
-    for idx in viewed_indices:
-        sim_scores += cosine_sim[idx]
+    with phase('tfidf'):
+        tfidf = TfidfVectorizer(stop_words='english')
+        tfidf_matrix = tfidf.fit_transform(content_df['text_features'].fillna(''))
     
-    if viewed_indices:
-        sim_scores = sim_scores / len(viewed_indices)
-    
-    # Create a Series with content indices and similarity scores
-    sim_scores_series = pd.Series(sim_scores, index=content_df.index)
-    
-    # Filter out already viewed content
-    sim_scores_series = sim_scores_series.drop(viewed_indices, errors='ignore')
+    with phase('similarity'):
+        # Get indices of content viewed by user
+        viewed_indices = np.flatnonzero(np.isin(content_ids, viewed_content_ids))
+        
+        # Average similarity to the viewed items; only those rows of the
+        # similarity matrix are needed
+        if len(viewed_indices):
+            sim_scores = np.asarray(cosine_similarity(tfidf_matrix[viewed_indices], tfidf_matrix).mean(axis=0)).ravel()
+        else:
+            sim_scores = np.zeros(len(content_df))
     
-    # Get top N recommendations
-    top_indices = sim_scores_series.sort_values(ascending=False).head(top_n).index
+    with phase('sort'):
+        # Restrict candidates to eligible content the user has not viewed yet
+        eligible[viewed_indices] = False
+        candidates = np.flatnonzero(eligible)
+        
+        # Get top N recommendations
+        top_indices = candidates[np.argsort(-sim_scores[candidates], kind='stable')[:top_n]]
     
     # Build recommendation response
     recommendations = []
-    for idx in top_indices:
-        content = content_df.iloc[idx]
-        score = sim_scores_series[idx]
-        
-        # Determine reason for recommendation
-        if preferred_type and content['content_type'] == preferred_type:
-            reason = f"Based on your interest in {preferred_type}s"
-        else:
-            reason = "Similar to content you've viewed"
-        
-        recommendations.append({
-            'content_id': str(content['id']),
-            'score': min(max(score, 0.0), 1.0),  # Ensure score is between 0 and 1
-            'reason': reason
-        })
+    with phase('build'):
+        for idx in top_indices:
+            content = content_df.iloc[idx]
+            score = float(sim_scores[idx])
+            
+            # Determine reason for recommendation
+            if preferred_type and content['content_type'] == preferred_type:
+                reason = f"Based on your interest in {preferred_type}s"
+            else:
+                reason = "Similar to content you've viewed"
+            
+            recommendations.append({
+                'content_id': str(content['id']),
+                'score': min(max(score, 0.0), 1.0),  # Ensure score is between 0 and 1
+                'reason': reason
+            })
     
     return recommendations
 
-def get_user_insights(user_id, user_activity_data, content_data):
-    """
-    Generate insights about a user's interests based on their viewing history.
+def get_user_insights(current_counts, previous_counts, trend_threshold=5):
     """
-    # Convert to DataFrames
-    activity_df = pd.DataFrame(user_activity_data)
-    content_df = pd.DataFrame(content_data)
+    Generate insights about a user's interests from windowed activity counts.
     
-    # Filter for this user
-    user_activities = activity_df[activity_df['user_id'] == user_id]
+    ``current_counts`` and ``previous_counts`` map category names to activity
+    counts for the current and the preceding window. Interest is the share of
+    the current window; the trend compares it with the previous window's share,
+    treating changes within ``trend_threshold`` percentage points as stable.
+    """
+    current_total = sum(current_counts.values())
+    previous_total = sum(previous_counts.values())
     
-    if user_activities.empty:
+    if not current_total and not previous_total:
         return []
     
-    # Merge with content data
-    merged_df = user_activities.merge(content_df, left_on='content_id', right_on='id')
-    
-    # Calculate interest by category
-    if 'category' in merged_df.columns:
-        category_counts = merged_df['category'].value_counts().reset_index()
-        category_counts.columns = ['category', 'count']
-        total = category_counts['count'].sum()
-        category_counts['interest'] = (category_counts['count'] / total * 100).astype(int)
+    insights = []
+    for category in set(current_counts) | set(previous_counts):
+        current_share = current_counts.get(category, 0) / current_total * 100 if current_total else 0.0
+        previous_share = previous_counts.get(category, 0) / previous_total * 100 if previous_total else 0.0
         
-        # For trend, we'd need historical data. For now, generate random trends
-        import random
-        trends = ['increasing', 'decreasing', 'stable']
-        category_counts['trend'] = [random.choice(trends) for _ in range(len(category_counts))]
+        change = current_share - previous_share
+        if change > trend_threshold:
+            trend = 'increasing'
+        elif change < -trend_threshold:
+            trend = 'decreasing'
+        else:
+            trend = 'stable'
         
-        # Convert to insight format
-        insights = category_counts[['category', 'interest', 'trend']].to_dict('records')
-        return insights
+        insights.append({
+            'category': category,
+            'interest': int(current_share),
+            'trend': trend
+        })
     
-    # Alternative: use content_type if category is not available
-    else:
-        type_counts = merged_df['content_type'].value_counts().reset_index()
-        type_counts.columns = ['category', 'count']
-        total = type_counts['count'].sum()
-        type_counts['interest'] = (type_counts['count'] / total * 100).astype(int)
-        
-        import random
-        trends = ['increasing', 'decreasing', 'stable']
-        type_counts['trend'] = [random.choice(trends) for _ in range(len(type_counts))]
-        
-        insights = type_counts[['category', 'interest', 'trend']].to_dict('records')
-        return insights
+    insights.sort(key=lambda insight: (-insight['interest'], insight['category']))
+    return insights
 
-def get_content_trends(content_data, activity_data, period='month'):
+def get_content_trends(content_data, activity_data=None, period='month', view_counts=None):
     """
     Analyze content viewing trends.
+    
+    Views come from ``activity_data`` rows, or from ``view_counts``: either an
+    array of view counts indexed by content id (see
+    ``ActivitySnapshot.content_action_counts``) or a mapping of content id to
+    views.
     """
     # Convert to DataFrames
-    content_df = pd.DataFrame(content_data)
-    activity_df = pd.DataFrame(activity_data)
-    
-    # Calculate total views per content
-    content_views = activity_df[activity_df['action'] == 'view'].groupby('content_id').size().reset_index(name='views')
-    
-    # Merge with content data
-    merged_df = content_views.merge(content_df, left_on='content_id', right_on='id')
+    with phase('dataframe'):
+        content_df = pd.DataFrame(content_data)
+        activity_df = pd.DataFrame(activity_data) if view_counts is None else None
+    
+    with phase('aggregate'):
+        # Calculate total views per content
+        if isinstance(view_counts, dict):
+            content_views = pd.DataFrame(
+                {'content_id': list(view_counts.keys()), 'views': list(view_counts.values())},
+                columns=['content_id', 'views']
+            )
+        elif view_counts is not None:
+            viewed = np.flatnonzero(view_counts)
+            content_views = pd.DataFrame({'content_id': viewed, 'views': view_counts[viewed]})
+        else:
+            content_views = activity_df[activity_df['action'] == 'view'].groupby('content_id').size().reset_index(name='views')
+        
+        # Merge with content data
+        merged_df = content_views.merge(content_df, left_on='content_id', right_on='id')
     
     # Calculate views by category
     if 'category' in merged_df.columns:
@@ -206,39 +234,39 @@ def get_user_segments(user_data, activity_data, content_data):
     """
     Identify user segments based on viewing behavior.
     """
-    # In a real implementation, this would use clustering algorithms on user behavior
-    # For now, return mock segments
-    
-    segments = [
-        {
-            'id': 'segment-1',
-            'name': 'History Enthusiasts',
-            'size': 1240,
-            'top_interests': ['Ancient Kingdoms', 'Historical Figures'],
-            'avg_session_duration': 25.3
-        },
-        {
-            'id': 'segment-2',
-            'name': 'Academic Researchers',
-            'size': 850,
-            'top_interests': ['Primary Sources', 'Archaeological Findings'],
-            'avg_session_duration': 42.7
-        },
-        {
-            'id': 'segment-3',
-            'name': 'Casual Learners',
-            'size': 3200,
-            'top_interests': ['Video Content', 'Famous Stories'],
-            'avg_session_duration': 15.1
-        },
-        {
-            'id': 'segment-4',
-            'name': 'Educators',
-            'size': 780,
-            'top_interests': ['Educational Materials', 'Timelines'],
-            'avg_session_duration': 35.8
-        }
-    ]
+    with phase('segment'):
+        # In a real implementation, this would use clustering algorithms on user behavior
+        # For now, return mock segments
+        segments = [
+            {
+                'id': 'segment-1',
+                'name': 'History Enthusiasts',
+                'size': 1240,
+                'top_interests': ['Ancient Kingdoms', 'Historical Figures'],
+                'avg_session_duration': 25.3
+            },
+            {
+                'id': 'segment-2',
+                'name': 'Academic Researchers',
+                'size': 850,
+                'top_interests': ['Primary Sources', 'Archaeological Findings'],
+                'avg_session_duration': 42.7
+            },
+            {
+                'id': 'segment-3',
+                'name': 'Casual Learners',
+                'size': 3200,
+                'top_interests': ['Video Content', 'Famous Stories'],
+                'avg_session_duration': 15.1
+            },
+            {
+                'id': 'segment-4',
+                'name': 'Educators',
+                'size': 780,
+                'top_interests': ['Educational Materials', 'Timelines'],
+                'avg_session_duration': 35.8
+            }
+        ]
     
     return segments
 
@@ -250,11 +278,12 @@ def predict_content_performance(content_data):
     """
     import random
     
-    # Mock prediction
-    prediction = {
-        'estimated_views': random.randint(1000, 10000),
-        'target_audience': ['scholars', 'history enthusiasts', 'students'],
-        'engagement_score': random.randint(50, 100)
-    }
+    with phase('predict'):
+        # Mock prediction
+        prediction = {
+            'estimated_views': random.randint(1000, 10000),
+            'target_audience': ['scholars', 'history enthusiasts', 'students'],
+            'engagement_score': random.randint(50, 100)
+        }
     
     return prediction
@@ -1,5 +1,6 @@
 
 from django.db import models
+from django.conf import settings
 
 class MLModel(models.Model):
     """Model to keep track of trained ML models."""
@@ -18,3 +19,18 @@ class MLModel(models.Model):
     
     class Meta:
         unique_together = ['name', 'version']
+
+class UserInterestRollup(models.Model):
+    """Daily per-user activity counters by category, maintained incrementally."""
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='interest_rollups')
+    category = models.CharField(max_length=100)
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.category} ({self.day}: {self.count})"
+    
+    class Meta:
+        unique_together = ['user', 'category', 'day']
+        indexes = [models.Index(fields=['user', 'day'])]
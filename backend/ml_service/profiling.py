@@ -0,0 +1,155 @@
+
+"""
+Opt-in profiling for the ML pipeline.
+
+The pipeline functions mark their phases with ``phase('name')``. Outside of
+a profiling session this is a no-op costing one context-variable lookup. A
+session is started for one request, either for every request via the
+``ML_PROFILING`` setting or by a staff user sending the
+``X-ML-Profile`` header. It has three modes:
+
+- ``phases``: only times each phase.
+- ``cprofile``: also writes a cProfile ``.prof`` dump.
+- ``sample``: also samples the request thread's stack and writes the stacks
+  in collapsed (flamegraph) format.
+
+The phase breakdown is returned in the ``Server-Timing`` header as
+``ml-<phase>`` entries. The dump file name is returned in
+``X-ML-Profile-Dump``.
+"""
+
+import contextlib
+import contextvars
+import cProfile
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from django.conf import settings
+
+MODES = ('phases', 'cprofile', 'sample')
+HEADER = 'HTTP_X_ML_PROFILE'
+
+PROFILE_DIR = getattr(settings, 'ML_PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+SAMPLE_INTERVAL = getattr(settings, 'ML_PROFILE_SAMPLE_INTERVAL_MS', 5) / 1000
+
+_current_session = contextvars.ContextVar('ml_profile_session', default=None)
+
+class StackSampler(threading.Thread):
+    """Periodically record the stack of one thread as collapsed frame strings."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='ml-profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if frames:
+                self.stacks[';'.join(reversed(frames))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+class ProfileSession:
+    """Phase timings and optional profiler output for one request."""
+
+    def __init__(self, mode='phases'):
+        self.mode = mode
+        self.phases = {}
+        self.dump_path = None
+        self._profiler = None
+        self._sampler = None
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def start(self):
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.mode == 'sample':
+            self._sampler = StackSampler(threading.get_ident(), SAMPLE_INTERVAL)
+            self._sampler.start()
+
+    def stop(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.dump_path = self._dump_path('prof')
+            self._profiler.dump_stats(self.dump_path)
+        elif self._sampler is not None:
+            self._sampler.stop()
+            self.dump_path = self._dump_path('folded')
+            with open(self.dump_path, 'w') as f:
+                for stack, count in self._sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+    @staticmethod
+    def _dump_path(extension):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        return os.path.join(PROFILE_DIR, f"ml-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.{extension}")
+
+    def server_timing(self):
+        return ', '.join(f"ml-{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items())
+
+@contextlib.contextmanager
+def phase(name):
+    """Time the enclosed block as ``name`` if a profiling session is active."""
+    session = _current_session.get()
+    if session is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        session.add(name, time.perf_counter() - started)
+
+def requested_mode(request):
+    """Return the profiling mode for ``request``, or None when profiling is off."""
+    mode = request.META.get(HEADER, '').strip().lower()
+    if mode and request.user.is_staff:
+        return mode if mode in MODES else 'phases'
+    return getattr(settings, 'ML_PROFILING', '') or None
+
+@contextlib.contextmanager
+def profile_request(request):
+    """
+    Profile the enclosed block when ``request`` asks for it; yields the
+    ``ProfileSession`` or None.
+    """
+    mode = requested_mode(request)
+    if mode is None:
+        yield None
+        return
+    session = ProfileSession(mode)
+    token = _current_session.set(session)
+    session.start()
+    try:
+        yield session
+    finally:
+        session.stop()
+        _current_session.reset(token)
+
+def attach_profile(response, session):
+    """Add the phase breakdown and dump location of ``session`` to ``response``."""
+    if session is None:
+        return response
+    timing = session.server_timing()
+    if timing:
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = f"{existing}, {timing}" if existing else timing
+    if session.dump_path:
+        response['X-ML-Profile-Dump'] = os.path.basename(session.dump_path)
+    return response
@@ -0,0 +1,84 @@
+
+"""
+Per-user interest rollups backing ``get_user_insights``.
+
+Every logged ``UserActivity`` increments one daily counter per category of the
+content it refers to (falling back to the content type when the content has no
+categories). Insights then read at most two windows of counters instead of
+merging the user's whole history with the content table.
+"""
+
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import UserInterestRollup
+
+# Length of the insight window in days; trends compare it with the one before
+WINDOW_DAYS = getattr(settings, 'ML_INSIGHTS_WINDOW_DAYS', 7)
+
+def activity_categories(content_id, content_type=''):
+    """Return the category names an activity on ``content_id`` counts towards."""
+    from content.models import ContentCategory
+
+    if content_id is None:
+        return [content_type] if content_type else []
+    names = list(
+        ContentCategory.objects.filter(content_id=content_id).values_list('category__name', flat=True)
+    )
+    if not names and content_type:
+        names = [content_type]
+    return names
+
+def increment_rollup(user_id, category, day, amount=1):
+    """Atomically add ``amount`` to a single daily counter."""
+    lookup = {'user_id': user_id, 'category': category, 'day': day}
+    if UserInterestRollup.objects.filter(**lookup).update(count=F('count') + amount):
+        return
+    try:
+        with transaction.atomic():
+            UserInterestRollup.objects.create(count=amount, **lookup)
+    except IntegrityError:
+        # Another writer created the row first
+        UserInterestRollup.objects.filter(**lookup).update(count=F('count') + amount)
+
+def record_activity(activity):
+    """Fold a newly created ``UserActivity`` into the user's rollups."""
+    day = timezone.localdate(activity.created_at) if activity.created_at else timezone.localdate()
+    for category in activity_categories(activity.content_id, activity.content_type):
+        increment_rollup(activity.user_id, category, day)
+
+def window_bounds(today=None, window_days=WINDOW_DAYS):
+    """Return ``(previous_start, current_start, today)`` for the insight windows."""
+    today = today or timezone.localdate()
+    current_start = today - timedelta(days=window_days - 1)
+    previous_start = current_start - timedelta(days=window_days)
+    return previous_start, current_start, today
+
+def _window_rows(user_id, today, window_days):
+    previous_start, current_start, today = window_bounds(today, window_days)
+    rows = UserInterestRollup.objects.filter(
+        user_id=user_id, day__gte=previous_start, day__lte=today
+    ).values_list('category', 'day', 'count')
+    return rows, current_start
+
+def _split_windows(rows, current_start):
+    current, previous = Counter(), Counter()
+    for category, day, count in rows:
+        if day >= current_start:
+            current[category] += count
+        else:
+            previous[category] += count
+    return current, previous
+
+def read_window_counts(user_id, today=None, window_days=WINDOW_DAYS):
+    """Return per-category counts for the current and previous windows."""
+    rows, current_start = _window_rows(user_id, today, window_days)
+    return _split_windows(rows, current_start)
+
+async def aread_window_counts(user_id, today=None, window_days=WINDOW_DAYS):
+    """Async version of ``read_window_counts``."""
+    rows, current_start = _window_rows(user_id, today, window_days)
+    return _split_windows([row async for row in rows], current_start)
@@ -0,0 +1,61 @@
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import UserActivity
+from content.models import Content, UserFavorite
+from subscriptions.models import UserSubscription
+from subscriptions.signals import subscriptions_changed
+from .models import MLModel
+from .eligibility import invalidate_content_bitsets
+from .rollups import record_activity
+from .cache import recommendation_cache, invalidate_active_model_version
+
+# Activity actions that change what a user should be recommended
+SIGNIFICANT_ACTIONS = getattr(
+    settings, 'ML_RECOMMENDATION_INVALIDATING_ACTIONS', ('view', 'like', 'bookmark', 'complete')
+)
+
+@receiver(post_save, sender=Content)
+def content_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Rebuild the eligibility bitsets when an item is added or its premium flag
+    changes; other edits (view counts, descriptions) leave them valid.
+    """
+    if update_fields is not None and 'is_premium' not in update_fields and not created:
+        return
+    if created or instance.is_premium != getattr(instance, '_loaded_is_premium', None):
+        invalidate_content_bitsets()
+    instance._loaded_is_premium = instance.is_premium
+
+@receiver(post_delete, sender=Content)
+def content_deleted(sender, **kwargs):
+    """Rebuild the eligibility bitsets when an item leaves the catalogue."""
+    invalidate_content_bitsets()
+
+@receiver(post_save, sender=UserActivity)
+def activity_logged(sender, instance, created, **kwargs):
+    """Keep the user's interest rollups and cached recommendations in step with new activity."""
+    if created:
+        record_activity(instance)
+        if instance.action in SIGNIFICANT_ACTIONS:
+            recommendation_cache.invalidate_user(instance.user_id)
+
+@receiver(post_save, sender=UserFavorite)
+@receiver(post_delete, sender=UserFavorite)
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+def user_eligibility_changed(sender, instance, **kwargs):
+    """Favorites and subscriptions change which items a user may be recommended."""
+    recommendation_cache.invalidate_user(instance.user_id)
+
+@receiver(subscriptions_changed)
+def subscriptions_changed_in_bulk(sender, user_ids, **kwargs):
+    """Bulk renewals and expiries bypass post_save, so invalidate explicitly."""
+    recommendation_cache.invalidate_users(user_ids)
+
+@receiver(post_save, sender=MLModel)
+@receiver(post_delete, sender=MLModel)
+def model_changed(sender, **kwargs):
+    """A different active model invalidates every cached recommendation."""
+    invalidate_active_model_version()
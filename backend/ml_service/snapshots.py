@@ -0,0 +1,252 @@
+"""
+Columnar on-disk snapshots of ``UserActivity``.
+
+A snapshot directory holds one sub-directory per activity day, in local
+time like the retention archive's days. Each export run appends one part
+per day it touched, and a part is one ``.npy`` file per column:
+
+    ===========  =======  =====================================
+    column       dtype    value
+    ===========  =======  =====================================
+    user_id      int32    ``UserActivity.user_id``
+    content_id   int32    ``UserActivity.content_id`` (-1 if null)
+    action       int8     index into the manifest's ``actions``
+    progress     float32  ``UserActivity.progress``
+    timestamp    uint32   ``created_at`` in seconds since the epoch
+    ===========  =======  =====================================
+
+``manifest.json`` lists the committed parts and the last exported primary
+key, so exports are incremental. It also holds the ``actions`` the action
+codes index: the ``UserActivity.action`` choices, followed by any other
+value found in the table, stored verbatim. Parts are renamed into place
+before the manifest is replaced, so an interrupted export leaves only
+unreferenced files behind.
+
+Ids are reserved from a shared sequence before a row is inserted (see
+``zamanivault.mongo.reserve_ids``), so a row can become visible after rows
+with higher ids were exported. Each export therefore re-scans the last
+``ML_ACTIVITY_SNAPSHOT_PK_WINDOW`` ids below ``last_pk``. The manifest's
+``window_pks`` records the ids already exported in that range, and rows
+with those ids are skipped.
+
+``ActivitySnapshot`` memory-maps the parts. Scanning a column reads only
+that column's pages, and the arrays use the same layout as
+``synthetic.generate_activity``.
+"""
+
+import json
+import os
+import shutil
+from datetime import date
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from accounts.models import UserActivity
+
+COLUMNS = {
+    'user_id': np.int32,
+    'content_id': np.int32,
+    'action': np.int8,
+    'progress': np.float32,
+    'timestamp': np.uint32,
+}
+ACTIONS = [value for value, _ in UserActivity._meta.get_field('action').choices]
+MANIFEST = 'manifest.json'
+PK_WINDOW = getattr(settings, 'ML_ACTIVITY_SNAPSHOT_PK_WINDOW', 1000)
+
+SNAPSHOT_DIR = getattr(
+    settings, 'ML_ACTIVITY_SNAPSHOT_DIR', os.path.join(settings.BASE_DIR, 'snapshots', 'activity')
+)
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'last_pk': 0, 'days': {}, 'actions': list(ACTIONS), 'window_pks': []}
+
+def _write_manifest(path, manifest):
+    tmp = os.path.join(path, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+
+def encode_labels(values, labels):
+    """
+    Return ``values`` as indexes into ``labels``, appending the values
+    ``labels`` does not hold yet.
+    """
+    codes = {label: code for code, label in enumerate(labels)}
+    encoded = []
+    for value in values:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(labels)
+            labels.append(value)
+        encoded.append(code)
+    return encoded
+
+def _scan_from(manifest):
+    """Return the id after which rows may not be exported yet."""
+    if 'window_pks' not in manifest:
+        # Exported before the window was tracked; re-scanning it would duplicate rows
+        return manifest['last_pk']
+    return max(manifest['last_pk'] - PK_WINDOW, 0)
+
+def write_part(path, day, part, columns):
+    """Write one part of ``columns`` for ``day``; return its row count."""
+    day_dir = os.path.join(path, day)
+    os.makedirs(day_dir, exist_ok=True)
+    for name, dtype in COLUMNS.items():
+        final = os.path.join(day_dir, f"{part:05d}.{name}.npy")
+        tmp = final + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, np.asarray(columns[name], dtype=dtype))
+        os.replace(tmp, final)
+    return len(columns['user_id'])
+
+def export_activity(path=SNAPSHOT_DIR, chunk_size=100000, rebuild=False, stdout=None):
+    """
+    Append activity created since the last export to the snapshot at ``path``.
+
+    Rows are read in primary-key order, ``chunk_size`` at a time, as tuples,
+    starting ``PK_WINDOW`` ids below the last export. Rows exported before are
+    skipped, and each chunk is split by local day and written as new parts.
+    Returns the number of rows exported.
+    """
+    if rebuild and os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path, exist_ok=True)
+    manifest = _read_manifest(path)
+    # Snapshots exported before the vocabulary was recorded used the choices' order
+    actions_vocabulary = manifest.setdefault('actions', list(ACTIONS))
+    scanned_pk = _scan_from(manifest)
+    window_pks = set(manifest.setdefault('window_pks', []))
+    exported = 0
+
+    while True:
+        rows = list(
+            UserActivity.objects.order_by('pk').filter(pk__gt=scanned_pk)
+            .values_list('pk', 'user_id', 'content_id', 'action', 'progress', 'created_at')[:chunk_size]
+        )
+        if not rows:
+            break
+        scanned_pk = rows[-1][0]
+        rows = [row for row in rows if row[0] not in window_pks]
+        if not rows:
+            continue
+        pks, user_ids, content_ids, actions, progress, created = zip(*rows)
+        columns = {
+            'user_id': np.fromiter(user_ids, dtype=np.int32, count=len(rows)),
+            'content_id': np.fromiter((-1 if c is None else c for c in content_ids), dtype=np.int32, count=len(rows)),
+            'action': np.array(encode_labels(actions, actions_vocabulary), dtype=np.int8),
+            'progress': np.fromiter(progress, dtype=np.float32, count=len(rows)),
+            'timestamp': np.fromiter((int(c.timestamp()) for c in created), dtype=np.uint32, count=len(rows)),
+        }
+        days = np.array([timezone.localdate(c).isoformat() for c in created])
+        for day in np.unique(days).tolist():
+            selected = days == day
+            parts = manifest['days'].setdefault(day, [])
+            part = len(parts)
+            rows_written = write_part(path, day, part, {name: column[selected] for name, column in columns.items()})
+            parts.append(rows_written)
+
+        manifest['last_pk'] = max(manifest['last_pk'], pks[-1])
+        window_pks.update(pks)
+        window_pks = {pk for pk in window_pks if pk > manifest['last_pk'] - PK_WINDOW}
+        manifest['window_pks'] = sorted(window_pks)
+        _write_manifest(path, manifest)
+        exported += len(rows)
+        if stdout is not None:
+            stdout.write(f"Exported {exported} activities (last pk {manifest['last_pk']})")
+    return exported
+
+class ActivitySnapshot:
+    """Read-only, memory-mapped view of an activity snapshot directory."""
+
+    def __init__(self, path=SNAPSHOT_DIR):
+        self.path = path
+        self.manifest = _read_manifest(path)
+
+    @property
+    def days(self):
+        return sorted(self.manifest['days'])
+
+    @property
+    def action_codes(self):
+        return {action: code for code, action in enumerate(self.manifest.get('actions', ACTIONS))}
+
+    def __len__(self):
+        return sum(sum(parts) for parts in self.manifest['days'].values())
+
+    def iter_parts(self, start=None, end=None, columns=None):
+        """
+        Yield one dict of memory-mapped arrays per part, for days in
+        ``start``..``end`` (inclusive ``date`` objects or ISO strings).
+        """
+        columns = columns or list(COLUMNS)
+        start = str(start) if start else None
+        end = str(end) if end else None
+        for day in self.days:
+            if (start and day < start) or (end and day > end):
+                continue
+            for part, rows in enumerate(self.manifest['days'][day]):
+                if rows:
+                    yield {
+                        name: np.load(os.path.join(self.path, day, f"{part:05d}.{name}.npy"), mmap_mode='r')
+                        for name in columns
+                    }
+
+    def load(self, start=None, end=None, columns=None):
+        """Concatenate the selected days into arrays laid out like ``generate_activity``."""
+        columns = columns or list(COLUMNS)
+        parts = list(self.iter_parts(start, end, columns))
+        if not parts:
+            return {name: np.empty(0, dtype=COLUMNS[name]) for name in columns}
+        return {name: np.concatenate([part[name] for part in parts]) for name in columns}
+
+    def content_action_counts(self, action='view', start=None, end=None, minlength=0, include_unexported=False):
+        """
+        Count events with ``action`` per content id, as a ``bincount`` array indexed by id.
+
+        With ``include_unexported``, activity rows not exported yet (primary
+        key above the manifest's ``last_pk``, or late in the re-scanned
+        window) are counted from the database as well, so the counts do not
+        freeze between exports.
+        """
+        code = self.action_codes.get(action)
+        counts = np.zeros(minlength, dtype=np.int64)
+        # An action the snapshot has never seen has no exported events
+        parts = self.iter_parts(start, end, columns=['content_id', 'action']) if code is not None else ()
+        for part in parts:
+            ids = part['content_id'][(part['action'] == code) & (part['content_id'] >= 0)]
+            counts = _add_counts(counts, ids)
+        if include_unexported and end is None:
+            counts = _add_counts(counts, self._unexported_content_ids(action, start))
+        return counts
+
+    def _unexported_content_ids(self, action, start=None):
+        from accounts.retention import day_bounds
+
+        # Rows not exported yet: above ``last_pk``, or late arrivals in the re-scanned window
+        hot = UserActivity.objects.filter(
+            pk__gt=_scan_from(self.manifest), action=action, content__isnull=False
+        ).exclude(pk__in=self.manifest.get('window_pks', []))
+        if start:
+            start = date.fromisoformat(start) if isinstance(start, str) else start
+            hot = hot.filter(created_at__gte=day_bounds(start)[0])
+        return np.fromiter(hot.values_list('content_id', flat=True).iterator(), dtype=np.int64)
+
+def _add_counts(counts, ids):
+    """Add the ``bincount`` of ``ids`` to ``counts``, growing it when needed."""
+    part_counts = np.bincount(ids)
+    if len(part_counts) > len(counts):
+        part_counts[:len(counts)] += counts
+        return part_counts
+    counts[:len(part_counts)] += part_counts
+    return counts
+
+def get_activity_snapshot(path=SNAPSHOT_DIR):
+    """Return the snapshot at ``path``, or None when nothing has been exported yet."""
+    snapshot = ActivitySnapshot(path)
+    return snapshot if snapshot.manifest['days'] else None
@@ -0,0 +1,175 @@
+
+"""
+Synthetic catalogues and activity logs for offline evaluation.
+
+Everything is generated with NumPy from a single seed, so the same arguments
+always produce the same data. Item popularity and user activity follow
+power laws, and each user prefers a few topics, which gives recommenders
+a signal to learn from.
+"""
+
+import numpy as np
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+TOPICS = {
+    'kingdoms': ['empire', 'kingdom', 'dynasty', 'ruler', 'trade', 'gold', 'mali', 'songhai', 'kush', 'axum'],
+    'figures': ['biography', 'leader', 'queen', 'king', 'scholar', 'warrior', 'mansa', 'nzinga', 'shaka', 'menelik'],
+    'architecture': ['stone', 'temple', 'pyramid', 'mosque', 'city', 'walls', 'zimbabwe', 'lalibela', 'timbuktu', 'meroe'],
+    'artifacts': ['bronze', 'mask', 'sculpture', 'textile', 'pottery', 'ivory', 'benin', 'ife', 'nok', 'ashanti'],
+    'culture': ['music', 'language', 'ritual', 'festival', 'oral', 'griot', 'dance', 'cuisine', 'proverb', 'kente'],
+}
+CONTENT_TYPES = ['video', 'book', 'article', 'artifact']
+ACTIONS = ['view', 'like', 'bookmark', 'share', 'complete']
+ACTION_WEIGHTS = [0.7, 0.12, 0.08, 0.03, 0.07]
+REGIONS = ['West Africa', 'East Africa', 'Southern Africa', 'North Africa', 'Central Africa']
+
+def zipf_weights(n, exponent=1.1):
+    """Return normalised power-law weights for ``n`` ranked items."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def generate_catalogue(n_items, seed=0, premium_ratio=0.3):
+    """
+    Generate ``n_items`` content rows shaped like ``Content.objects.values()``.
+
+    Rows are ordered by id; the popularity rank of each item is random so
+    that ids carry no signal.
+    """
+    rng = np.random.default_rng(seed)
+    topic_names = list(TOPICS)
+    topics = rng.integers(0, len(topic_names), n_items)
+    types = rng.integers(0, len(CONTENT_TYPES), n_items)
+    premium = rng.random(n_items) < premium_ratio
+    words = rng.integers(0, 10, (n_items, 6))
+    view_counts = (rng.pareto(1.5, n_items) * 50).astype(np.int64)
+    years = rng.integers(1950, 2025, n_items)
+    regions = rng.integers(0, len(REGIONS), n_items)
+
+    rows = []
+    for i in range(n_items):
+        vocab = TOPICS[topic_names[topics[i]]]
+        tokens = [vocab[w] for w in words[i]]
+        rows.append({
+            'id': i + 1,
+            'title': ' '.join(tokens[:3]).title(),
+            'description': ' '.join(tokens),
+            'content_type': CONTENT_TYPES[types[i]],
+            'is_premium': bool(premium[i]),
+            'tags': tokens[3:],
+            'creator': f"Creator {i % 97}",
+            'year': int(years[i]),
+            'region': REGIONS[regions[i]],
+            'view_count': int(view_counts[i]),
+            'topic': topic_names[topics[i]],
+        })
+    return rows
+
+def topic_samplers(item_topics, popularity):
+    """
+    Per topic, the member item indices and their cumulative popularity, for
+    ``sample_items``.
+    """
+    by_topic = []
+    for topic in range(len(TOPICS)):
+        members = np.flatnonzero(item_topics == topic)
+        weights = popularity[members]
+        by_topic.append((members, np.cumsum(weights / weights.sum()) if len(members) else weights))
+    return by_topic
+
+def sample_items(by_topic, rng, topics, n_items):
+    """Sample one item index per entry of ``topics``, by popularity within the topic."""
+    items = np.empty(len(topics), dtype=np.int64)
+    for topic, (members, cdf) in enumerate(by_topic):
+        selected = np.flatnonzero(topics == topic)
+        if not len(selected):
+            continue
+        if len(members):
+            picks = np.minimum(np.searchsorted(cdf, rng.random(len(selected))), len(members) - 1)
+            items[selected] = members[picks]
+        else:
+            items[selected] = rng.integers(0, n_items, len(selected))
+    return items
+
+def sample_events(rng, n_users, events_per_user, by_topic, n_items):
+    """
+    Draw the events of ``n_users`` users, without timestamps.
+
+    Users draw their activity counts from a power law around
+    ``events_per_user`` and pick items mostly from two preferred topics,
+    weighted by item popularity. Returns ``(user_index, item_index, action,
+    progress)`` arrays, with 0-based user and item indices.
+    """
+    counts = np.maximum(1, (rng.pareto(2.0, n_users) + 0.5) * events_per_user / 1.5).astype(np.int64)
+    total = int(counts.sum())
+    user_index = np.repeat(np.arange(n_users), counts)
+
+    # 80% of events come from one of the user's two preferred topics
+    preferred = rng.integers(0, len(TOPICS), (n_users, 2))
+    event_topics = np.where(
+        rng.random(total) < 0.8,
+        preferred[user_index, rng.integers(0, 2, total)],
+        rng.integers(0, len(TOPICS), total)
+    )
+    items = sample_items(by_topic, rng, event_topics, n_items)
+    actions = rng.choice(len(ACTIONS), size=total, p=ACTION_WEIGHTS)
+    progress = np.where(actions == 0, rng.random(total), 0.0)
+    return user_index, items, actions, progress
+
+def generate_activity(catalogue, n_users, events_per_user=20, seed=0, days=180, start=None):
+    """
+    Generate an activity log as a dict of NumPy columns.
+
+    Columns are ``user_id``, ``content_id``, ``action`` (index into
+    ``ACTIONS``), ``progress`` and ``timestamp`` (seconds since epoch), sorted
+    by timestamp. Events are drawn by ``sample_events``.
+    """
+    rng = np.random.default_rng(seed + 1)
+    topic_names = list(TOPICS)
+    item_topics = np.array([topic_names.index(row['topic']) for row in catalogue])
+    n_items = len(catalogue)
+
+    # Popularity ranks are shuffled so popular items are spread over all topics
+    popularity = zipf_weights(n_items)[rng.permutation(n_items)]
+    by_topic = topic_samplers(item_topics, popularity)
+    user_index, content_idx, actions, progress = sample_events(rng, n_users, events_per_user, by_topic, n_items)
+
+    start = start or datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    start_ts = int(start.timestamp())
+    timestamps = start_ts + rng.integers(0, days * 86400, len(user_index))
+    order = np.argsort(timestamps, kind='stable')
+
+    return {
+        'user_id': (user_index + 1)[order],
+        'content_id': (content_idx + 1)[order],
+        'action': actions[order].astype(np.int8),
+        'progress': progress[order].astype(np.float32),
+        'timestamp': timestamps[order],
+    }
+
+def activity_rows(activity, catalogue, indices=None):
+    """Convert activity columns into rows shaped like ``UserActivity.objects.values()``."""
+    content_types = [row['content_type'] for row in catalogue]
+    if indices is None:
+        indices = range(len(activity['user_id']))
+    rows = []
+    for i in indices:
+        content_id = int(activity['content_id'][i])
+        rows.append({
+            'user_id': int(activity['user_id'][i]),
+            'content_id': content_id,
+            'content_type': content_types[content_id - 1],
+            'action': ACTIONS[activity['action'][i]],
+            'progress': float(activity['progress'][i]),
+            'created_at': datetime.fromtimestamp(int(activity['timestamp'][i]), dt_timezone.utc),
+        })
+    return rows
+
+def time_split(activity, train_fraction=0.8):
+    """Split activity columns at the timestamp quantile ``train_fraction``."""
+    cutoff = int(np.quantile(activity['timestamp'], train_fraction))
+    train = activity['timestamp'] <= cutoff
+    return (
+        {name: column[train] for name, column in activity.items()},
+        {name: column[~train] for name, column in activity.items()},
+        datetime.fromtimestamp(cutoff, dt_timezone.utc) + timedelta(seconds=1),
+    )
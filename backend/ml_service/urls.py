@@ -2,7 +2,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    MLModelViewSet, UserRecommendationsView, UserInsightsView,
+    MLModelViewSet, UserRecommendationsView, RecommendationCacheStatsView, UserInsightsView,
     ContentTrendsView, UserSegmentsView, ContentPerformancePredictionView
 )
 
@@ -11,6 +11,7 @@ router.register(r'models', MLModelViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('recommendations/cache/', RecommendationCacheStatsView.as_view(), name='recommendation-cache-stats'),
     path('recommendations/<int:user_id>/', UserRecommendationsView.as_view(), name='user-recommendations'),
     path('recommendations/', UserRecommendationsView.as_view(), name='self-recommendations'),
     path('insights/<int:user_id>/', UserInsightsView.as_view(), name='user-insights'),
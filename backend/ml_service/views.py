@@ -3,6 +3,9 @@ from rest_framework import status, permissions, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from .serializers import (
     MLModelSerializer, RecommendationSerializer, UserInsightSerializer,
@@ -13,11 +16,24 @@ from .ml_utils import (
     get_content_recommendations, get_user_insights, get_content_trends,
     get_user_segments, predict_content_performance, load_model
 )
+from .rollups import read_window_counts
+from .eligibility import (
+    get_content_bitsets, can_access_premium, excluded_content_ids
+)
+from .cache import recommendation_cache, recommendation_version
+from .profiling import phase, profile_request, attach_profile
+from .snapshots import get_activity_snapshot
 from accounts.models import UserActivity
+from accounts.retention import content_action_counts
+from accounts import repository as activity_repository
 from content.models import Content
+from content import repository as content_repository
+from zamanivault.mongo import NATIVE_QUERIES
 
 User = get_user_model()
 
+TREND_PERIOD_DAYS = {'week': 7, 'month': 30, 'year': 365}
+
 class MLModelViewSet(viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing ML models.
@@ -60,14 +76,57 @@ class UserRecommendationsView(APIView):
         """
         target_user_id = user_id if user_id and request.user.is_staff else request.user.id
         
-        # Get content and activity data
-        contents = Content.objects.all().values()
-        activities = UserActivity.objects.all().values()
-        
-        recommendations = get_content_recommendations(target_user_id, contents, activities)
-        serializer = RecommendationSerializer(recommendations, many=True)
-        
-        return Response(serializer.data)
+        with profile_request(request) as profile:
+            # Page refreshes and retries are served from the cache until the user
+            # logs significant activity or the model/catalogue changes; profiled
+            # requests always recompute
+            version = recommendation_version(target_user_id)
+            cached = recommendation_cache.get(target_user_id, version) if profile is None else None
+            if cached is not None:
+                return Response(cached)
+            
+            if target_user_id == request.user.id:
+                target_user = request.user
+            else:
+                target_user = User.objects.filter(pk=target_user_id).first()
+            
+            # Get content and activity data
+            with phase('db_read'):
+                if NATIVE_QUERIES:
+                    contents = content_repository.all_content_values()
+                    activities = activity_repository.user_activity_values(target_user_id)
+                else:
+                    contents = list(Content.objects.all().values())
+                    activities = list(UserActivity.objects.filter(user_id=target_user_id).values())
+            
+            # Premium gating and history exclusions are applied during candidate
+            # retrieval so the page is always filled with eligible items
+            with phase('eligibility'):
+                eligibility = get_content_bitsets().eligibility(
+                    allow_premium=can_access_premium(target_user),
+                    excluded_ids=excluded_content_ids(target_user_id),
+                )
+            
+            recommendations = get_content_recommendations(
+                target_user_id, contents, activities, eligibility=eligibility
+            )
+            with phase('serialization'):
+                data = RecommendationSerializer(recommendations, many=True).data
+            recommendation_cache.set(target_user_id, version, data)
+        
+        return attach_profile(Response(data), profile)
+
+class RecommendationCacheStatsView(APIView):
+    """
+    API View exposing recommendation cache hit and miss rates.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        """
+        Get recommendation cache statistics for this worker.
+        """
+        return Response(recommendation_cache.stats())
 
 class UserInsightsView(APIView):
     """
@@ -83,14 +142,20 @@ class UserInsightsView(APIView):
         """
         target_user_id = user_id if user_id and request.user.is_staff else request.user.id
         
-        # Get content and activity data
-        contents = Content.objects.all().values()
-        activities = UserActivity.objects.all().values()
-        
-        insights = get_user_insights(target_user_id, activities, contents)
-        serializer = UserInsightSerializer(insights, many=True)
-        
-        return Response(serializer.data)
+        with profile_request(request) as profile:
+            # Read the precomputed counters for the current and previous windows
+            with phase('db_read'):
+                current_counts, previous_counts = read_window_counts(target_user_id)
+            
+            with phase('insights'):
+                insights = get_user_insights(
+                    current_counts, previous_counts,
+                    trend_threshold=getattr(settings, 'ML_INSIGHTS_TREND_THRESHOLD', 5)
+                )
+            with phase('serialization'):
+                data = UserInsightSerializer(insights, many=True).data
+        
+        return attach_profile(Response(data), profile)
 
 class ContentTrendsView(APIView):
     """
@@ -104,14 +169,26 @@ class ContentTrendsView(APIView):
         """
         period = request.query_params.get('period', 'month')
         
-        # Get content and activity data
-        contents = Content.objects.all().values()
-        activities = UserActivity.objects.all().values()
-        
-        trends = get_content_trends(contents, activities, period)
-        serializer = ContentTrendSerializer(trends, many=True)
-        
-        return Response(serializer.data)
+        with profile_request(request) as profile:
+            # Get content and activity data; views are counted from the
+            # columnar snapshot plus the rows created since its last export
+            # when one has been exported, otherwise from the compacted daily
+            # aggregates plus the hot rows
+            snapshot = get_activity_snapshot()
+            since = timezone.localdate() - timedelta(days=TREND_PERIOD_DAYS.get(period, 30))
+            with phase('db_read'):
+                contents = list(Content.objects.all().values())
+                if snapshot is None:
+                    view_counts = content_action_counts('view', since=since)
+            
+            if snapshot is not None:
+                with phase('snapshot_scan'):
+                    view_counts = snapshot.content_action_counts('view', start=since, include_unexported=True)
+            trends = get_content_trends(contents, period=period, view_counts=view_counts)
+            with phase('serialization'):
+                data = ContentTrendSerializer(trends, many=True).data
+        
+        return attach_profile(Response(data), profile)
 
 class UserSegmentsView(APIView):
     """
@@ -123,15 +200,18 @@ class UserSegmentsView(APIView):
         """
         Get user segments.
         """
-        # Get user, content, and activity data
-        users = User.objects.all().values()
-        contents = Content.objects.all().values()
-        activities = UserActivity.objects.all().values()
-        
-        segments = get_user_segments(users, activities, contents)
-        serializer = UserSegmentSerializer(segments, many=True)
-        
-        return Response(serializer.data)
+        with profile_request(request) as profile:
+            # Get user, content, and activity data; the querysets are lazy, so
+            # any reads they make are timed in the segmentation phase
+            users = User.objects.all().values()
+            contents = Content.objects.all().values()
+            activities = UserActivity.objects.all().values()
+            
+            segments = get_user_segments(users, activities, contents)
+            with phase('serialization'):
+                data = UserSegmentSerializer(segments, many=True).data
+        
+        return attach_profile(Response(data), profile)
 
 class ContentPerformancePredictionView(APIView):
     """
@@ -145,7 +225,9 @@ class ContentPerformancePredictionView(APIView):
         """
         content_data = request.data
         
-        prediction = predict_content_performance(content_data)
-        serializer = ContentPerformancePredictionSerializer(prediction)
+        with profile_request(request) as profile:
+            prediction = predict_content_performance(content_data)
+            with phase('serialization'):
+                data = ContentPerformancePredictionSerializer(prediction).data
         
-        return Response(serializer.data)
+        return attach_profile(Response(data), profile)
@@ -0,0 +1,97 @@
+
+"""
+Per-worker warm-up of the recommendation pipeline.
+
+Warm-up does the following:
+- loads the active ``MLModel`` from disk;
+- builds the catalogue bitsets;
+- runs one small recommendation, so the first real request does not pay for
+  imports and lazy initialisation.
+
+It runs in a background thread started from ``MlServiceConfig.ready()``
+when the worker boots (``ML_WARMUP_ON_STARTUP``; management commands other
+than ``runserver`` skip it). The worker reports not-ready until warm-up has
+finished. The readiness probe also starts it if it has not run. When the
+active model changes, the worker re-warms in the background and stays
+ready on the model it already has.
+"""
+
+import os
+import sys
+import threading
+import time
+from django.conf import settings
+from .cache import get_active_model_version
+from .eligibility import get_content_bitsets
+from .ml_utils import load_model, get_content_recommendations
+
+_WARMUP_CONTENT = [{
+    'id': 1, 'title': 'warm up', 'description': 'warm up', 'tags': [],
+    'content_type': 'article', 'view_count': 0,
+}]
+_WARMUP_ACTIVITY = [{'user_id': 0, 'content_id': 1, 'content_type': 'article'}]
+
+class ModelWarmup:
+    """Tracks warm-up of the active model in this worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.ready = False
+        self.model = None
+        self.version = None
+        self.error = None
+        self.duration = None
+
+    def ensure_started(self):
+        """Start warm-up unless it is running or already done for the active model."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self.ready and self.version == get_active_model_version():
+                return
+            self._thread = threading.Thread(target=self._run, name='ml-warmup', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        from django.db import close_old_connections
+        from .models import MLModel
+
+        started = time.monotonic()
+        try:
+            version = get_active_model_version()
+            active = MLModel.objects.filter(is_active=True).first()
+            model = None
+            if active is not None:
+                model = load_model(active.file_path)
+                if model is None:
+                    raise RuntimeError(f"Could not load model {active} from {active.file_path}")
+            get_content_bitsets()
+            get_content_recommendations(0, _WARMUP_CONTENT, _WARMUP_ACTIVITY, top_n=1)
+        except Exception as e:
+            self.error = str(e)
+        else:
+            self.model, self.version, self.error = model, version, None
+            self.ready = True
+        finally:
+            self.duration = time.monotonic() - started
+            close_old_connections()
+
+    def status(self):
+        """Return the warm-up state; ``ok`` is False until the first warm-up succeeds."""
+        return {
+            'ok': self.ready,
+            'model_version': self.version,
+            'stale': self.ready and self.version != get_active_model_version(),
+            'warmup_seconds': round(self.duration, 3) if self.duration is not None else None,
+            'error': self.error,
+        }
+
+model_warmup = ModelWarmup()
+
+def warm_on_startup(argv=None):
+    """Start warm-up when this process is going to serve requests."""
+    argv = sys.argv if argv is None else argv
+    command = argv[1] if len(argv) > 1 and os.path.basename(argv[0]) in ('manage.py', 'django-admin') else None
+    if getattr(settings, 'ML_WARMUP_ON_STARTUP', True) and command in (None, 'runserver'):
+        model_warmup.ensure_started()
@@ -1,6 +1,20 @@
 
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+def create_indexes(sender, **kwargs):
+    # subscribe() writes natively and relies on these (see services.py)
+    from zamanivault.mongo import ensure_ttl_index, ensure_unique_indexes
+    from .models import IdempotencyKey, UserSubscription
+    from .services import IDEMPOTENCY_KEY_TTL
+    ensure_unique_indexes(IdempotencyKey, UserSubscription)
+    ensure_ttl_index(IdempotencyKey, 'created_at', IDEMPOTENCY_KEY_TTL)
 
 class SubscriptionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'subscriptions'
+
+    def ready(self):
+        from . import entitlements, reporting
+        entitlements.check_shared_cache()
+        post_migrate.connect(create_indexes, sender=self)
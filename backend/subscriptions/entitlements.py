@@ -0,0 +1,208 @@
+
+"""
+Cached premium entitlement checks.
+
+An ``Entitlement`` is a compact record of what a user may access, derived
+from ``User.subscription_type`` and the ``UserSubscription`` status and end
+date. Records are cached in-process for a few seconds and in the shared
+Django cache for longer, so the content hot path normally resolves them
+without touching the database. Subscription changes invalidate both levels.
+
+Invalidations and entitlement versions only reach the other workers through
+that shared cache. ``check_shared_cache`` therefore refuses to start with a
+per-process backend (locmem, dummy) unless ``ENTITLEMENT_REQUIRE_SHARED_CACHE``
+is off, as it is by default in DEBUG.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import UserSubscription
+from .signals import subscriptions_changed
+
+User = get_user_model()
+
+# Subscription tiers that unlock premium content
+PREMIUM_TIERS = ('premium', 'scholar')
+
+# Subscription statuses that still grant access until ``end_date``
+ENTITLED_STATUSES = ('active', 'trial', 'canceled')
+
+LOCAL_TTL = getattr(settings, 'ENTITLEMENT_LOCAL_TTL', 10)
+SHARED_TTL = getattr(settings, 'ENTITLEMENT_SHARED_TTL', 300)
+CACHE_ALIAS = getattr(settings, 'ENTITLEMENT_CACHE_ALIAS', 'default')
+LOCAL_MAX_SIZE = getattr(settings, 'ENTITLEMENT_LOCAL_MAX_SIZE', 50000)
+REQUIRE_SHARED_CACHE = getattr(settings, 'ENTITLEMENT_REQUIRE_SHARED_CACHE', not settings.DEBUG)
+
+# Cache backends whose contents are private to one process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+logger = logging.getLogger(__name__)
+
+class Entitlement(namedtuple('Entitlement', ['user_id', 'tier', 'staff', 'premium', 'expires'])):
+    """What a user may access; ``expires`` is the subscription end date (or None)."""
+
+    __slots__ = ()
+
+    @property
+    def has_premium(self):
+        """True while the premium entitlement is in effect today."""
+        if self.staff:
+            return True
+        if not self.premium:
+            return False
+        return self.expires is None or self.expires >= timezone.now().date()
+
+ANONYMOUS = Entitlement(None, 'free', False, False, None)
+
+_local = {}
+_local_lock = threading.Lock()
+
+def is_shared_cache(alias):
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+def check_shared_cache(alias=CACHE_ALIAS):
+    """
+    Fail at startup when ``alias`` is not shared between processes: other
+    workers would never see invalidations and would keep stale entitlements.
+    """
+    if is_shared_cache(alias):
+        return
+    message = (
+        f"The '{alias}' cache ({settings.CACHES[alias]['BACKEND']}) is private to each process, so "
+        "entitlement and recommendation invalidations do not reach other workers. Set CACHE_URL "
+        "to a shared cache such as redis://."
+    )
+    if REQUIRE_SHARED_CACHE:
+        raise ImproperlyConfigured(message)
+    logger.warning(message)
+
+def _cache_key(user_id):
+    return f"entitlement:{user_id}"
+
+def _version_key(user_id):
+    return f"entitlement-version:{user_id}"
+
+def compute_entitlement(user):
+    """Build the entitlement record for ``user`` from the database."""
+    subscription = UserSubscription.objects.filter(user_id=user.pk).values('status', 'end_date').first()
+    premium = (
+        user.subscription_type in PREMIUM_TIERS
+        and subscription is not None
+        and subscription['status'] in ENTITLED_STATUSES
+    )
+    return Entitlement(
+        user.pk,
+        user.subscription_type,
+        bool(user.is_staff),
+        premium,
+        subscription['end_date'] if premium else None,
+    )
+
+def get_entitlement(user):
+    """Return the (cached) entitlement record for ``user``."""
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS
+
+    now = time.monotonic()
+    entry = _local.get(user.pk)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    shared = caches[CACHE_ALIAS]
+    cached = shared.get(_cache_key(user.pk))
+    if cached is not None:
+        entitlement = Entitlement(*cached)
+    else:
+        entitlement = compute_entitlement(user)
+        shared.set(_cache_key(user.pk), tuple(entitlement), SHARED_TTL)
+
+    with _local_lock:
+        if len(_local) >= LOCAL_MAX_SIZE:
+            _local.clear()
+        _local[user.pk] = (now + LOCAL_TTL, entitlement)
+    return entitlement
+
+def invalidate_entitlements(user_ids):
+    """Drop cached entitlements for ``user_ids`` from both cache levels."""
+    user_ids = list(user_ids)
+    with _local_lock:
+        for user_id in user_ids:
+            _local.pop(user_id, None)
+    caches[CACHE_ALIAS].delete_many([_cache_key(user_id) for user_id in user_ids])
+
+def invalidate_entitlement(user_id):
+    """Drop the cached entitlement for a single user."""
+    invalidate_entitlements([user_id])
+
+# Version published for deleted users; higher than any real version, so every token is rejected
+REVOKED_VERSION = 2 ** 31
+
+def get_cached_entitlement_version(user_id):
+    """Return the latest entitlement version recorded in the shared cache, if any."""
+    return caches[CACHE_ALIAS].get(_version_key(user_id))
+
+def bump_entitlement_versions(user_ids):
+    """
+    Increment the users' entitlement versions and publish them to the shared
+    cache, so access tokens with older claims are rejected until refreshed.
+    Returns the new versions by user id.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    User.objects.filter(pk__in=user_ids).update(entitlement_version=F('entitlement_version') + 1)
+    versions = dict(User.objects.filter(pk__in=user_ids).values_list('pk', 'entitlement_version'))
+    _publish_versions(versions)
+    invalidate_entitlements(user_ids)
+    return versions
+
+def revoke_entitlement_versions(user_ids):
+    """Reject every token of ``user_ids``, which no longer exist."""
+    user_ids = list(user_ids)
+    _publish_versions({user_id: REVOKED_VERSION for user_id in user_ids})
+    invalidate_entitlements(user_ids)
+
+def _publish_versions(versions):
+    # Older tokens cannot outlive the access token lifetime
+    timeout = int(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds())
+    caches[CACHE_ALIAS].set_many({_version_key(pk): version for pk, version in versions.items()}, timeout)
+
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+def subscription_saved(sender, instance, **kwargs):
+    invalidate_entitlement(instance.user_id)
+
+@receiver(subscriptions_changed)
+def subscriptions_changed_in_bulk(sender, user_ids, **kwargs):
+    bump_entitlement_versions(user_ids)
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    """Deactivating a user or changing their staff flag revokes tokens carrying the old claims."""
+    if created or raw:
+        return
+    access = tuple(instance.__dict__.get(field) for field in User.ACCESS_FIELDS)
+    if access == getattr(instance, '_loaded_access', access):
+        return
+    versions = bump_entitlement_versions([instance.pk])
+    # Keep the in-memory row current so a later save() does not write the old version back
+    if instance.pk in versions:
+        instance.entitlement_version = versions[instance.pk]
+    instance._loaded_access = access
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    revoke_entitlement_versions([instance.pk])
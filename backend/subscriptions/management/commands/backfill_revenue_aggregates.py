@@ -0,0 +1,72 @@
+
+from collections import defaultdict
+from datetime import date, datetime, time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+from subscriptions.models import DailyRevenue, Transaction, UserSubscription
+from subscriptions.reporting import STATUS_COLUMNS, apply_deltas, booking_day, snapshot_active_subscribers
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily revenue aggregates from Transaction rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days on or after this date (YYYY-MM-DD).')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be in YYYY-MM-DD format.')
+
+        transactions = Transaction.objects.order_by('pk')
+        aggregates = DailyRevenue.objects.all()
+        if since:
+            # Refunds are booked on their refund day, which may follow an older charge
+            start = timezone.make_aware(datetime.combine(since, time.min))
+            transactions = transactions.filter(Q(created_at__gte=start) | Q(status='refunded', updated_at__gte=start))
+            aggregates = aggregates.filter(day__gte=since)
+
+        deltas = defaultdict(lambda: defaultdict(Decimal))
+        scanned = 0
+        last_pk = 0
+        while True:
+            chunk = list(
+                transactions.filter(pk__gt=last_pk).values(
+                    'pk', 'plan_id', 'subscription_id', 'currency', 'amount', 'status', 'created_at', 'updated_at'
+                )[:options['chunk_size']]
+            )
+            if not chunk:
+                break
+            missing = {row['subscription_id'] for row in chunk if row['plan_id'] is None and row['subscription_id']}
+            subscription_plans = dict(
+                UserSubscription.objects.filter(pk__in=missing).values_list('pk', 'plan_id')
+            ) if missing else {}
+            for row in chunk:
+                if row['status'] not in STATUS_COLUMNS:
+                    continue
+                plan_id = row['plan_id'] or subscription_plans.get(row['subscription_id'])
+                key = (booking_day(row['status'], row['created_at'], row['updated_at']), plan_id, row['currency'])
+                amount_column, count_column = STATUS_COLUMNS[row['status']]
+                deltas[key][amount_column] += row['amount']
+                deltas[key][count_column] += 1
+            scanned += len(chunk)
+            last_pk = chunk[-1]['pk']
+
+        with db_transaction.atomic():
+            # Snapshots of active subscribers are kept; only transaction totals are rebuilt
+            aggregates.update(
+                revenue=0, refunds=0, failed_amount=0,
+                completed_count=0, refunded_count=0, failed_count=0
+            )
+            apply_deltas(deltas)
+        snapshot_active_subscribers()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Aggregated {scanned} transactions into {len(deltas)} daily rows"
+        ))
@@ -0,0 +1,42 @@
+
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+from subscriptions.renewals import RenewalEngine
+from subscriptions.reporting import snapshot_active_subscribers
+
+class Command(BaseCommand):
+    help = (
+        'Renew auto-renewing subscriptions and expire lapsed ones. '
+        'Safe to run repeatedly (e.g. hourly from cron); interrupted runs resume where they stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Subscriptions processed per batch.')
+        parser.add_argument('--date', help='Process as of this date (YYYY-MM-DD), defaults to today.')
+        parser.add_argument('--provider', help='Dotted path of the payment provider class to use.')
+        parser.add_argument(
+            '--sync-tiers', action='store_true',
+            help='Also correct User.subscription_type drift across all subscriptions.'
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format.')
+        provider = import_string(options['provider'])() if options['provider'] else None
+
+        engine = RenewalEngine(provider=provider, chunk_size=options['chunk_size'], today=today)
+        started = time.monotonic()
+        stats = engine.run()
+        if options['sync_tiers']:
+            engine.sync_tiers()
+        snapshot_active_subscribers(engine.today)
+        elapsed = time.monotonic() - started
+
+        summary = ', '.join(f"{key}={value}" for key, value in stats.items())
+        self.stdout.write(self.style.SUCCESS(f"Processed renewals in {elapsed:.1f}s: {summary}"))
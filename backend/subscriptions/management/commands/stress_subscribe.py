@@ -0,0 +1,58 @@
+
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from subscriptions import services
+from subscriptions.models import SubscriptionPlan, Transaction
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent subscribe requests that share one idempotency key and '
+        'verify that exactly one transaction is written.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='User to subscribe.')
+        parser.add_argument('plan_id', type=int)
+        parser.add_argument('--concurrency', type=int, default=16, help='Parallel submits per round.')
+        parser.add_argument('--rounds', type=int, default=10, help='Number of distinct idempotency keys.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+            plan = SubscriptionPlan.objects.get(pk=options['plan_id'], is_active=True)
+        except (User.DoesNotExist, SubscriptionPlan.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        def submit(key):
+            try:
+                return services.subscribe(user, plan, payment_method='stress-test', idempotency_key=key)[1]
+            except services.IdempotencyError as e:
+                return e.status_code
+            finally:
+                connection.close()
+
+        duplicates = 0
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for _ in range(options['rounds']):
+                key = f"stress-{uuid.uuid4()}"
+                codes = list(pool.map(submit, [key] * options['concurrency']))
+                written = Transaction.objects.filter(transaction_id=f"subscribe-{user.pk}-{key}"[:100]).count()
+                summary = ', '.join(f"{code}x{codes.count(code)}" for code in sorted(set(codes)))
+                self.stdout.write(f"{key}: responses {summary}, transactions written: {written}")
+                if written != 1:
+                    duplicates += 1
+        elapsed = time.monotonic() - started
+
+        submits = options['rounds'] * options['concurrency']
+        if duplicates:
+            raise CommandError(f"{duplicates} of {options['rounds']} keys did not write exactly one transaction")
+        self.stdout.write(self.style.SUCCESS(
+            f"{submits} concurrent submits in {elapsed:.1f}s, no duplicate transactions"
+        ))
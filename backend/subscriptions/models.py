@@ -51,12 +51,19 @@ class UserSubscription(models.Model):
     
     def __str__(self):
         return f"{self.user.email} - {self.plan.name} ({self.status})"
+    
+    class Meta:
+        indexes = [
+            # Renewal engine scans due subscriptions by status and end date
+            models.Index(fields=['status', 'end_date']),
+        ]
 
 class Transaction(models.Model):
     """Model for subscription transactions."""
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
     subscription = models.ForeignKey(UserSubscription, on_delete=models.SET_NULL, null=True, related_name='transactions')
+    plan = models.ForeignKey(SubscriptionPlan, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
     amount = models.DecimalField(max_digits=6, decimal_places=2)
     currency = models.CharField(max_length=3, default='USD')
     status = models.CharField(
@@ -70,10 +77,57 @@ class Transaction(models.Model):
         default='pending'
     )
     payment_method = models.CharField(max_length=100)
-    transaction_id = models.CharField(max_length=100, blank=True)
+    transaction_id = models.CharField(max_length=100, blank=True, db_index=True)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.user.email} - ${self.amount} ({self.status})"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status (and, for refunds, the day it was booked
+        # on) so revenue aggregates can apply deltas
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_updated_at = instance.__dict__.get('updated_at')
+        return instance
+
+class IdempotencyKey(models.Model):
+    """Stored outcome of a client request made with an Idempotency-Key header."""
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response = models.JSONField(null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
+    
+    class Meta:
+        unique_together = ['user', 'key']
+
+class DailyRevenue(models.Model):
+    """Per-day, per-plan transaction aggregates, maintained as transactions are written."""
+    
+    day = models.DateField()
+    plan = models.ForeignKey(SubscriptionPlan, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_revenue')
+    currency = models.CharField(max_length=3, default='USD')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunds = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    failed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    refunded_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    active_subscribers = models.PositiveIntegerField(null=True, blank=True)  # Snapshot, if taken that day
+    
+    def __str__(self):
+        return f"{self.day} - {self.plan_id} ({self.currency} {self.revenue})"
+    
+    class Meta:
+        verbose_name_plural = 'Daily revenue'
+        unique_together = ['day', 'plan', 'currency']
+        ordering = ['day']
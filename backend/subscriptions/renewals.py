@@ -0,0 +1,267 @@
+
+"""
+Batch renewal and expiry of user subscriptions.
+
+Due subscriptions are read in primary-key chunks through the
+``(status, end_date)`` index. For each chunk the renewal transactions are
+first written as ``pending`` with one ``bulk_create``, then charged through
+the payment provider in one call, then moved to ``completed`` or ``failed``
+with one ``update`` per outcome. Subscriptions are written back with one
+``update`` per new (status, end date) pair, and users with one ``update``
+per tier.
+
+djongo has no transactions, so the order of writes is what makes runs
+idempotent and resumable. Processed subscriptions leave the due set: their
+``end_date`` moves forward or they become ``expired``. Every renewal charge
+carries a deterministic reference, recorded as a pending transaction before
+the provider is called. A chunk interrupted after charging is picked up
+again on the next run. Its pending references are charged again, and the
+provider must treat the reference as an idempotency key, so the customer is
+never charged twice.
+"""
+
+import random
+import uuid
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import SubscriptionPlan, UserSubscription, Transaction
+from .signals import subscriptions_changed
+
+User = get_user_model()
+
+# Statuses that renew automatically when ``auto_renew`` is set
+RENEWABLE_STATUSES = ('active', 'trial')
+
+# Statuses that are still scanned when ``end_date`` passes
+DUE_STATUSES = ('active', 'trial', 'canceled')
+
+def period_end(plan, start_date):
+    """Return the end date of a billing period starting on ``start_date``."""
+    if plan.billing_cycle == 'monthly':
+        return start_date + timedelta(days=30)
+    elif plan.billing_cycle == 'yearly':
+        try:
+            return date(start_date.year + 1, start_date.month, start_date.day)
+        except ValueError:  # 29 February
+            return date(start_date.year + 1, start_date.month, start_date.day - 1)
+    return None  # lifetime
+
+def renewal_reference(subscription_id, end_date):
+    """Deterministic transaction id for renewing a subscription at ``end_date``."""
+    return f"renewal-{subscription_id}-{end_date:%Y%m%d}"
+
+class FakePaymentProvider:
+    """
+    Local stand-in for a payment gateway, used in development and tests.
+
+    Charges succeed unless the user id is in ``fail_user_ids`` or a seeded
+    random draw falls under ``failure_rate``. Like a real gateway's
+    idempotency keys, a reference that was already charged returns its first
+    result without a new charge.
+    """
+
+    def __init__(self, fail_user_ids=(), failure_rate=0.0, seed=0):
+        self.fail_user_ids = set(fail_user_ids)
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.charged = []
+        self.results = {}
+
+    def charge_many(self, charges):
+        """
+        Charge a batch of ``{'reference', 'user_id', 'amount', 'currency',
+        'payment_method'}`` dicts and return ``{reference: (succeeded, provider_id)}``.
+
+        ``reference`` is an idempotency key: providers must not charge the
+        same reference twice.
+        """
+        results = {}
+        for charge in charges:
+            reference = charge['reference']
+            if reference not in self.results:
+                failed = charge['user_id'] in self.fail_user_ids or self.random.random() < self.failure_rate
+                self.charged.append(charge)
+                self.results[reference] = (not failed, f"fake-{reference}")
+            results[reference] = self.results[reference]
+        return results
+
+def get_payment_provider():
+    """Instantiate the payment provider configured in settings."""
+    path = getattr(settings, 'SUBSCRIPTION_PAYMENT_PROVIDER', 'subscriptions.renewals.FakePaymentProvider')
+    return import_string(path)()
+
+class RenewalEngine:
+    """Renew or expire every subscription whose ``end_date`` has passed."""
+
+    def __init__(self, provider=None, chunk_size=2000, today=None):
+        self.provider = provider or get_payment_provider()
+        self.chunk_size = chunk_size
+        self.today = today or timezone.now().date()
+        self.plans = {plan.id: plan for plan in SubscriptionPlan.objects.all()}
+        self.stats = {'scanned': 0, 'renewed': 0, 'failed': 0, 'expired': 0, 'chunks': 0}
+
+    def due_subscriptions(self):
+        return UserSubscription.objects.filter(
+            status__in=DUE_STATUSES, end_date__lt=self.today
+        ).order_by('pk')
+
+    def run(self):
+        """Process all due subscriptions chunk by chunk and return run statistics."""
+        last_pk = 0
+        while True:
+            chunk = list(
+                self.due_subscriptions().filter(pk__gt=last_pk).values(
+                    'id', 'user_id', 'plan_id', 'status', 'end_date', 'auto_renew', 'payment_method'
+                )[:self.chunk_size]
+            )
+            if not chunk:
+                break
+            self.process_chunk(chunk)
+            last_pk = chunk[-1]['id']
+        return self.stats
+
+    def process_chunk(self, chunk):
+        now = timezone.now()
+        renewals, expiries = [], []
+        for row in chunk:
+            plan = self.plans.get(row['plan_id'])
+            renewable = (
+                row['auto_renew'] and row['status'] in RENEWABLE_STATUSES
+                and plan is not None and plan.is_active and plan.billing_cycle != 'lifetime'
+            )
+            (renewals if renewable else expiries).append(row)
+
+        # Settled charges of an interrupted run are not repeated
+        references = {renewal_reference(row['id'], row['end_date']): row for row in renewals}
+        recorded = dict(
+            Transaction.objects.filter(transaction_id__in=list(references))
+            .values_list('transaction_id', 'status')
+        )
+        # Record every new charge as pending before the provider is called
+        Transaction.objects.bulk_create([
+            Transaction(
+                user_id=row['user_id'],
+                subscription_id=row['id'],
+                plan_id=row['plan_id'],
+                amount=self.plans[row['plan_id']].price,
+                status='pending',
+                payment_method=row['payment_method'],
+                transaction_id=reference,
+                notes='Automatic renewal',
+            )
+            for reference, row in references.items() if reference not in recorded
+        ], batch_size=self.chunk_size)
+        pending = {
+            txn.transaction_id: txn
+            for txn in Transaction.objects.filter(transaction_id__in=list(references), status='pending')
+        }
+        charges = [
+            {
+                'reference': reference,
+                'user_id': references[reference]['user_id'],
+                'amount': txn.amount,
+                'currency': txn.currency,
+                'payment_method': txn.payment_method,
+            }
+            for reference, txn in pending.items()
+        ]
+        results = self.provider.charge_many(charges) if charges else {}
+
+        outcomes = {}
+        for reference, txn in pending.items():
+            succeeded, _ = results[reference]
+            txn.status = 'completed' if succeeded else 'failed'
+            outcomes.setdefault(txn.status, []).append(reference)
+            recorded[reference] = txn.status
+
+        # One conditional update per outcome. The marker identifies the rows
+        # this run settled, so a concurrent run cannot settle (and aggregate)
+        # them twice.
+        marker = f"Automatic renewal (run {uuid.uuid4().hex[:12]})"
+        transactions = []
+        for outcome, outcome_references in outcomes.items():
+            Transaction.objects.filter(transaction_id__in=outcome_references, status='pending').update(
+                status=outcome, notes=marker, updated_at=now
+            )
+            settled = set(
+                Transaction.objects.filter(transaction_id__in=outcome_references, notes=marker)
+                .values_list('transaction_id', flat=True)
+            )
+            for reference in settled:
+                txn = pending[reference]
+                txn.notes, txn.updated_at = marker, now
+                transactions.append(txn)
+
+        updates = {}
+        tiers = {}
+        for reference, row in references.items():
+            plan = self.plans[row['plan_id']]
+            if recorded.get(reference) == 'completed':
+                updates.setdefault(('active', period_end(plan, row['end_date'])), []).append(row['id'])
+                tiers.setdefault(plan.name.lower(), []).append(row['user_id'])
+                self.stats['renewed'] += 1
+            else:
+                expiries.append(row)
+                self.stats['failed'] += 1
+
+        for row in expiries:
+            updates.setdefault(('expired', row['end_date']), []).append(row['id'])
+        self.stats['expired'] += len(expiries)
+        free_user_ids = [row['user_id'] for row in expiries]
+
+        # One update per distinct new value; djongo cannot translate bulk_update's CASE WHEN
+        for (status, end_date), subscription_ids in updates.items():
+            UserSubscription.objects.filter(pk__in=subscription_ids).update(
+                status=status, end_date=end_date, updated_at=now
+            )
+        for tier, user_ids in tiers.items():
+            User.objects.filter(pk__in=user_ids).exclude(subscription_type=tier).update(subscription_type=tier)
+        if free_user_ids:
+            User.objects.filter(pk__in=free_user_ids).exclude(subscription_type='free').update(subscription_type='free')
+
+        self.stats['scanned'] += len(chunk)
+        self.stats['chunks'] += 1
+        subscriptions_changed.send(
+            sender=self.__class__,
+            user_ids=[row['user_id'] for row in chunk],
+            transactions=transactions,
+        )
+
+    def sync_tiers(self):
+        """
+        Correct ``User.subscription_type`` drift for every subscription.
+
+        Users are grouped by the tier their subscription entitles them to and
+        updated with one query per tier and chunk; rows already in sync are
+        excluded so they are not rewritten.
+        """
+        corrected = 0
+        last_pk = 0
+        while True:
+            chunk = list(
+                UserSubscription.objects.filter(pk__gt=last_pk).order_by('pk').values(
+                    'id', 'user_id', 'plan_id', 'status', 'end_date'
+                )[:self.chunk_size]
+            )
+            if not chunk:
+                break
+            tiers = {}
+            for row in chunk:
+                plan = self.plans.get(row['plan_id'])
+                entitled = row['status'] in DUE_STATUSES and (row['end_date'] is None or row['end_date'] >= self.today)
+                tier = plan.name.lower() if entitled and plan is not None else 'free'
+                tiers.setdefault(tier, []).append(row['user_id'])
+            changed = []
+            for tier, user_ids in tiers.items():
+                drifted = list(User.objects.filter(pk__in=user_ids).exclude(subscription_type=tier).values_list('pk', flat=True))
+                if drifted:
+                    corrected += User.objects.filter(pk__in=drifted).update(subscription_type=tier)
+                    changed.extend(drifted)
+            if changed:
+                subscriptions_changed.send(sender=self.__class__, user_ids=changed, transactions=[])
+            last_pk = chunk[-1]['id']
+        self.stats['tiers_corrected'] = corrected
+        return corrected
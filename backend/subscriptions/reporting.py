@@ -0,0 +1,199 @@
+
+"""
+Revenue aggregates and reports.
+
+``DailyRevenue`` holds one row per day, plan and currency. Transactions
+contribute to it by their current status: completed amounts count as
+revenue, refunded amounts as refunds and failed charges as failed payments.
+Refunds are booked on the day of the refund (the transaction's
+``updated_at``), everything else on the day the transaction was created.
+Creating a transaction adds its contribution, and a status change moves it.
+Reports only read aggregate rows, so they cost the same however many
+transactions exist.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import DailyRevenue, Transaction, UserSubscription
+from .signals import subscriptions_changed
+
+# Status -> (amount column, count column) a transaction contributes to
+STATUS_COLUMNS = {
+    'completed': ('revenue', 'completed_count'),
+    'refunded': ('refunds', 'refunded_count'),
+    'failed': ('failed_amount', 'failed_count'),
+}
+
+PERIODS = ('day', 'week', 'month')
+
+logger = logging.getLogger(__name__)
+
+def _empty_delta():
+    return {column: 0 for columns in STATUS_COLUMNS.values() for column in columns}
+
+def transaction_plan_id(txn):
+    """Return the plan a transaction is reported under."""
+    if txn.plan_id is not None or txn.subscription_id is None:
+        return txn.plan_id
+    return UserSubscription.objects.filter(pk=txn.subscription_id).values_list('plan_id', flat=True).first()
+
+def booking_day(status, created_at, updated_at):
+    """Return the day a transaction in ``status`` contributes to."""
+    if status == 'refunded':
+        return timezone.localdate(updated_at or timezone.now())
+    return timezone.localdate(created_at or timezone.now())
+
+def _clamp_negative(lookup, changes):
+    # The database does not enforce the unsigned columns, so a removal that
+    # was never added (aggregates out of sync with transactions) is undone here
+    negative = [column for column, value in changes.items() if value < 0]
+    for column in negative:
+        if DailyRevenue.objects.filter(**lookup, **{f'{column}__lt': 0}).update(**{column: 0}):
+            logger.warning(
+                'Revenue aggregate %s for %s went negative and was reset to 0; '
+                'run backfill_revenue_aggregates to rebuild it.', column, lookup
+            )
+
+def apply_deltas(deltas):
+    """
+    Add ``{(day, plan_id, currency): {column: delta}}`` to the aggregate rows.
+
+    No column is left below zero; a negative result is reset to 0 and logged.
+    """
+    for (day, plan_id, currency), delta in deltas.items():
+        changes = {column: value for column, value in delta.items() if value}
+        if not changes:
+            continue
+        lookup = {'day': day, 'plan_id': plan_id, 'currency': currency}
+        updates = {column: F(column) + value for column, value in changes.items()}
+        if DailyRevenue.objects.filter(**lookup).update(**updates):
+            _clamp_negative(lookup, changes)
+            continue
+        initial = {column: max(value, 0) for column, value in changes.items()}
+        if initial != changes:
+            logger.warning(
+                'Negative revenue delta for missing aggregate %s was dropped; '
+                'run backfill_revenue_aggregates to rebuild it.', lookup
+            )
+        try:
+            with db_transaction.atomic():
+                DailyRevenue.objects.create(**lookup, **initial)
+        except IntegrityError:
+            # Another writer created the row first
+            DailyRevenue.objects.filter(**lookup).update(**updates)
+            _clamp_negative(lookup, changes)
+
+def record_transactions(transactions, previous_statuses=None, previous_updated_at=None):
+    """
+    Fold transactions into the daily aggregates.
+
+    ``previous_statuses`` maps transaction ids to the status they were
+    aggregated under before; their old contribution is removed from the day
+    it was booked on (a refund's day from ``previous_updated_at``).
+    """
+    previous_statuses = previous_statuses or {}
+    previous_updated_at = previous_updated_at or {}
+    deltas = defaultdict(_empty_delta)
+    for txn in transactions:
+        old_status = previous_statuses.get(txn.pk)
+        if old_status == txn.status:
+            continue
+        plan_id = transaction_plan_id(txn)
+        amount = Decimal(txn.amount)
+        if old_status in STATUS_COLUMNS:
+            day = booking_day(old_status, txn.created_at, previous_updated_at.get(txn.pk))
+            amount_column, count_column = STATUS_COLUMNS[old_status]
+            deltas[(day, plan_id, txn.currency)][amount_column] -= amount
+            deltas[(day, plan_id, txn.currency)][count_column] -= 1
+        if txn.status in STATUS_COLUMNS:
+            day = booking_day(txn.status, txn.created_at, txn.updated_at)
+            amount_column, count_column = STATUS_COLUMNS[txn.status]
+            deltas[(day, plan_id, txn.currency)][amount_column] += amount
+            deltas[(day, plan_id, txn.currency)][count_column] += 1
+    apply_deltas(deltas)
+
+def snapshot_active_subscribers(day=None):
+    """Record the number of entitled subscribers per plan on ``day``."""
+    from .entitlements import ENTITLED_STATUSES
+
+    day = day or timezone.localdate()
+    counts = UserSubscription.objects.filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=day), status__in=ENTITLED_STATUSES
+    ).values('plan_id').annotate(subscribers=Count('id'))
+    for row in counts:
+        DailyRevenue.objects.update_or_create(
+            day=day, plan_id=row['plan_id'], currency='USD',
+            defaults={'active_subscribers': row['subscribers']}
+        )
+
+def period_start(day, period):
+    """Return the first day of the ``period`` containing ``day``."""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    elif period == 'month':
+        return day.replace(day=1)
+    return day
+
+def revenue_report(start, end, period='day', plan_id=None):
+    """
+    Roll daily aggregates between ``start`` and ``end`` (inclusive) up into
+    ``period`` buckets per plan and currency.
+
+    ``active_subscribers`` is the latest snapshot taken within each bucket.
+    """
+    rows = DailyRevenue.objects.filter(day__gte=start, day__lte=end).select_related('plan')
+    if plan_id is not None:
+        rows = rows.filter(plan_id=plan_id)
+
+    buckets = {}
+    snapshot_days = {}
+    for row in rows.order_by('day'):
+        key = (period_start(row.day, period), row.plan_id, row.currency)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {
+                'period_start': key[0],
+                'plan_id': row.plan_id,
+                'plan': row.plan.name if row.plan else None,
+                'currency': row.currency,
+                'revenue': Decimal('0'),
+                'refunds': Decimal('0'),
+                'failed_amount': Decimal('0'),
+                'completed_count': 0,
+                'refunded_count': 0,
+                'failed_count': 0,
+                'active_subscribers': None,
+            }
+        for column in ('revenue', 'refunds', 'failed_amount', 'completed_count', 'refunded_count', 'failed_count'):
+            bucket[column] += getattr(row, column)
+        if row.active_subscribers is not None and row.day >= snapshot_days.get(key, row.day):
+            bucket['active_subscribers'] = row.active_subscribers
+            snapshot_days[key] = row.day
+
+    return sorted(buckets.values(), key=lambda b: (b['period_start'], b['plan'] or '', b['currency']))
+
+@receiver(post_save, sender=Transaction)
+def transaction_saved(sender, instance, created, **kwargs):
+    if created:
+        record_transactions([instance])
+    else:
+        record_transactions(
+            [instance],
+            {instance.pk: getattr(instance, '_loaded_status', None)},
+            {instance.pk: getattr(instance, '_loaded_updated_at', None)},
+        )
+    instance._loaded_status = instance.status
+    instance._loaded_updated_at = instance.updated_at
+
+@receiver(subscriptions_changed)
+def transactions_created_in_bulk(sender, transactions=(), **kwargs):
+    """Bulk-created renewal transactions bypass post_save."""
+    if transactions:
+        record_transactions(transactions)
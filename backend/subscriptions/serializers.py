@@ -27,7 +27,7 @@ class TransactionSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Transaction
-        fields = ['id', 'user', 'subscription', 'amount', 'currency', 'status', 'payment_method', 'transaction_id', 'created_at']
+        fields = ['id', 'user', 'subscription', 'plan', 'amount', 'currency', 'status', 'payment_method', 'transaction_id', 'created_at']
         read_only_fields = ['id', 'user', 'created_at']
 
 class SubscriptionUpdateSerializer(serializers.Serializer):
@@ -41,3 +41,18 @@ class SubscriptionCancelSerializer(serializers.Serializer):
     """Serializer for canceling a subscription."""
     
     reason = serializers.CharField(required=False)
+
+class RevenueReportSerializer(serializers.Serializer):
+    """Serializer for one bucket of the revenue report."""
+    
+    period_start = serializers.DateField()
+    plan_id = serializers.IntegerField(allow_null=True)
+    plan = serializers.CharField(allow_null=True)
+    currency = serializers.CharField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    refunds = serializers.DecimalField(max_digits=14, decimal_places=2)
+    failed_amount = serializers.DecimalField(max_digits=14, decimal_places=2)
+    completed_count = serializers.IntegerField()
+    refunded_count = serializers.IntegerField()
+    failed_count = serializers.IntegerField()
+    active_subscribers = serializers.IntegerField(allow_null=True)
@@ -0,0 +1,172 @@
+"""
+Idempotent, atomic subscribe operation.
+
+All of a subscribe's writes are made in one MongoDB transaction through the
+native layer (``zamanivault.mongo.run_in_transaction``):
+- the subscription is upserted;
+- the completed transaction is inserted;
+- the user's ``subscription_type`` is updated;
+- with an ``Idempotency-Key``, the key is stored with the response.
+Either all of them are committed or none is, so a failed request leaves
+nothing behind and can simply be retried.
+
+A repeated key returns the stored response. Concurrent requests with the
+same key conflict inside the database, and the transaction that loses is
+retried and then finds the stored response. Keys expire after
+``SUBSCRIBE_IDEMPOTENCY_KEY_TTL`` seconds (a TTL index, see ``apps.py``).
+
+Requests without a key are not deduplicated by a key. A subscribe that would
+change nothing (the subscription is already active on the same plan and
+terms) returns the current subscription without charging again. Double
+submits are therefore collapsed. A re-subscribe after a cancellation goes
+through.
+
+Primary keys come from djongo's ``__schema__`` sequence. They are reserved
+before the transaction, because every writer shares that sequence document.
+Model signals are sent after the commit.
+"""
+
+import hashlib
+import json
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save
+from django.utils import timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from rest_framework import status
+from zamanivault.mongo import (
+    ALIAS, collection, from_document, reserve_ids, run_in_transaction, to_document, to_fields, values
+)
+from .models import UserSubscription, Transaction, IdempotencyKey
+from .renewals import period_end
+from .serializers import UserSubscriptionSerializer
+from .entitlements import ENTITLED_STATUSES, bump_entitlement_versions
+
+User = get_user_model()
+
+IDEMPOTENCY_KEY_TTL = getattr(settings, 'SUBSCRIBE_IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+
+class IdempotencyError(Exception):
+    """Raised when an idempotency key cannot be honoured."""
+
+    def __init__(self, detail, status_code):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+def request_fingerprint(payload):
+    """Hash the request payload so a reused key with different data is detected."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def _stored_response(document, fingerprint):
+    record = values(IdempotencyKey, document, ['request_hash', 'response', 'status_code'])
+    if record['request_hash'] != fingerprint:
+        raise IdempotencyError(
+            'Idempotency key was already used with a different request.',
+            status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return record['response'], record['status_code']
+
+def _find_key(user, key, session=None):
+    return collection(IdempotencyKey).find_one(to_fields(IdempotencyKey, user=user.pk, key=key), session=session)
+
+def _unchanged(document, plan, payment_method, auto_renew):
+    current = values(UserSubscription, document, ['plan', 'status', 'payment_method', 'auto_renew'])
+    return (
+        current['plan_id'] == plan.pk and current['status'] in ENTITLED_STATUSES
+        and current['payment_method'] == payment_method and current['auto_renew'] == auto_renew
+    )
+
+def subscribe(user, plan, payment_method='', auto_renew=True, idempotency_key=None):
+    """
+    Subscribe ``user`` to ``plan`` and return ``(response_data, status_code)``.
+
+    Raises ``IdempotencyError`` when the key was reused for a different
+    request.
+    """
+    fingerprint = request_fingerprint({
+        'plan_id': plan.pk, 'payment_method': payment_method, 'auto_renew': auto_renew,
+    })
+    if idempotency_key:
+        document = _find_key(user, idempotency_key)
+        if document is not None:
+            return _stored_response(document, fingerprint)
+
+    now = timezone.now()
+    start_date = now.date()
+    subscription_pk = reserve_ids(UserSubscription)
+    transaction_pk = reserve_ids(Transaction)
+    key_pk = reserve_ids(IdempotencyKey) if idempotency_key else None
+    transaction_id = f"subscribe-{user.pk}-{idempotency_key or transaction_pk}"[:100]
+
+    def write(session):
+        """Return ``(response, subscription, created, transaction)``; runs once per attempt."""
+        if idempotency_key:
+            document = _find_key(user, idempotency_key, session)
+            if document is not None:
+                return _stored_response(document, fingerprint), None, False, None
+
+        subscriptions = collection(UserSubscription)
+        owner = to_fields(UserSubscription, user=user.pk)
+        current = subscriptions.find_one(owner, {'_id': 0}, session=session)
+        if not idempotency_key and current is not None and _unchanged(current, plan, payment_method, auto_renew):
+            subscription = from_document(UserSubscription, current)
+            subscription.plan = plan
+            return (UserSubscriptionSerializer(subscription).data, status.HTTP_200_OK), None, False, None
+
+        document = subscriptions.find_one_and_update(
+            owner,
+            {
+                '$set': to_fields(
+                    UserSubscription, plan=plan.pk, status='active', start_date=start_date,
+                    end_date=period_end(plan, start_date), auto_renew=auto_renew,
+                    payment_method=payment_method, updated_at=now,
+                ),
+                '$setOnInsert': to_fields(UserSubscription, id=subscription_pk, created_at=now),
+            },
+            projection={'_id': 0}, upsert=True, return_document=ReturnDocument.AFTER, session=session
+        )
+        subscription = from_document(UserSubscription, document)
+        subscription.plan = plan
+
+        # In a real app, this would happen after payment processing
+        transaction = Transaction(
+            id=transaction_pk, user_id=user.pk, subscription_id=subscription.pk, plan=plan,
+            amount=plan.price, status='completed', payment_method=payment_method,
+            transaction_id=transaction_id, created_at=now, updated_at=now,
+        )
+        collection(Transaction).insert_one(to_document(transaction), session=session)
+        collection(User).update_one(
+            to_fields(User, id=user.pk), {'$set': to_fields(User, subscription_type=plan.name.lower())},
+            session=session
+        )
+
+        response = json.loads(json.dumps(UserSubscriptionSerializer(subscription).data, default=str))
+        if idempotency_key:
+            collection(IdempotencyKey).insert_one(to_document(IdempotencyKey(
+                id=key_pk, user_id=user.pk, key=idempotency_key, request_hash=fingerprint,
+                response=response, status_code=status.HTTP_200_OK, created_at=now,
+            )), session=session)
+        return (response, status.HTTP_200_OK), subscription, subscription.pk == subscription_pk, transaction
+
+    try:
+        result, subscription, created, transaction = run_in_transaction(write)
+    except DuplicateKeyError:
+        # Another request stored the same key between our lookup and our commit
+        document = _find_key(user, idempotency_key) if idempotency_key else None
+        if document is None:
+            raise
+        return _stored_response(document, fingerprint)
+
+    if subscription is not None:
+        for instance, was_created in ((subscription, created), (transaction, True)):
+            instance._state.adding = False
+            instance._state.db = ALIAS
+            post_save.send(
+                sender=type(instance), instance=instance, created=was_created,
+                update_fields=None, raw=False, using=ALIAS
+            )
+        user.subscription_type = plan.name.lower()
+        bump_entitlement_versions([user.pk])
+    return result
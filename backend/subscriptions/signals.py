@@ -0,0 +1,6 @@
+
+from django.dispatch import Signal
+
+# Sent after subscription state changed in bulk (bypassing post_save), with
+# ``user_ids`` listing every affected user
+subscriptions_changed = Signal()
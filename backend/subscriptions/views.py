@@ -1,13 +1,16 @@
 
+from datetime import date, timedelta
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.utils import timezone
-from datetime import timedelta, date
 from .models import SubscriptionPlan, UserSubscription, Transaction
+from . import services
+from .entitlements import bump_entitlement_versions
+from .reporting import PERIODS, revenue_report
 from .serializers import (
     SubscriptionPlanSerializer, UserSubscriptionSerializer, TransactionSerializer,
-    SubscriptionUpdateSerializer, SubscriptionCancelSerializer
+    SubscriptionUpdateSerializer, SubscriptionCancelSerializer, RevenueReportSerializer
 )
 from django.contrib.auth import get_user_model
 
@@ -52,6 +55,10 @@ class UserSubscriptionViewSet(viewsets.ModelViewSet):
     def subscribe(self, request):
         """
         Subscribe to a plan.
+        Send an Idempotency-Key header to make retries safe: a repeated key
+        returns the stored response instead of subscribing again. Without
+        one, a request that would change nothing is answered with the current
+        subscription and not charged again.
         """
         serializer = SubscriptionUpdateSerializer(data=request.data)
         if serializer.is_valid():
@@ -64,44 +71,16 @@ class UserSubscriptionViewSet(viewsets.ModelViewSet):
             except SubscriptionPlan.DoesNotExist:
                 return Response({"detail": "Plan not found."}, status=status.HTTP_404_NOT_FOUND)
             
-            # Calculate end date based on billing cycle
-            start_date = timezone.now().date()
-            if plan.billing_cycle == 'monthly':
-                end_date = start_date + timedelta(days=30)
-            elif plan.billing_cycle == 'yearly':
-                end_date = date(start_date.year + 1, start_date.month, start_date.day)
-            else:  # lifetime
-                end_date = None
-            
-            # Create or update subscription
-            subscription, created = UserSubscription.objects.update_or_create(
-                user=request.user,
-                defaults={
-                    'plan': plan,
-                    'status': 'active',
-                    'start_date': start_date,
-                    'end_date': end_date,
-                    'auto_renew': auto_renew,
-                    'payment_method': payment_method
-                }
-            )
-            
-            # Update user's subscription type
-            request.user.subscription_type = plan.name.lower()
-            request.user.save()
-            
-            # Create transaction record (in a real app, this would happen after payment processing)
-            Transaction.objects.create(
-                user=request.user,
-                subscription=subscription,
-                amount=plan.price,
-                status='completed',
-                payment_method=payment_method,
-                transaction_id=f"mock-{timezone.now().timestamp()}"
-            )
-            
-            serializer = UserSubscriptionSerializer(subscription)
-            return Response(serializer.data)
+            try:
+                data, status_code = services.subscribe(
+                    request.user, plan,
+                    payment_method=payment_method,
+                    auto_renew=auto_renew,
+                    idempotency_key=request.headers.get('Idempotency-Key')
+                )
+            except services.IdempotencyError as e:
+                return Response({"detail": e.detail}, status=e.status_code)
+            return Response(data, status=status_code)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -120,6 +99,7 @@ class UserSubscriptionViewSet(viewsets.ModelViewSet):
             subscription.status = 'canceled'
             subscription.auto_renew = False
             subscription.save()
+            bump_entitlement_versions([request.user.id])
             
             # In a real app, you would have a reason field and store the cancellation reason
             
@@ -138,3 +118,24 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
         if self.request.user.is_staff:
             return Transaction.objects.all()
         return Transaction.objects.filter(user=self.request.user)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def report(self, request):
+        """
+        Revenue, refunds, failed payments and active subscribers per plan,
+        bucketed by day, week or month.
+        """
+        period = request.query_params.get('period', 'day')
+        if period not in PERIODS:
+            return Response({"error": f"Period must be one of: {', '.join(PERIODS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            end = date.fromisoformat(request.query_params['end']) if 'end' in request.query_params else timezone.localdate()
+            start = date.fromisoformat(request.query_params['start']) if 'start' in request.query_params else end - timedelta(days=29)
+            plan_id = int(request.query_params['plan_id']) if 'plan_id' in request.query_params else None
+        except ValueError:
+            return Response({"error": "Invalid start, end or plan_id parameter."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        buckets = revenue_report(start, end, period=period, plan_id=plan_id)
+        serializer = RevenueReportSerializer(buckets, many=True)
+        return Response(serializer.data)
@@ -0,0 +1,66 @@
+
+"""
+Helpers for the async (ASGI) read endpoints.
+
+DRF views are synchronous, so the async endpoints are plain Django async
+views. ``async_api_view`` gives them the same JWT authentication, the same
+permission rules and the same error payloads as the DRF API. CPU-bound work
+goes to ``run_cpu_bound``, which keeps it off the event loop.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_CPU_WORKERS', 4),
+    thread_name_prefix='async-cpu'
+)
+
+async def run_cpu_bound(fn, *args, **kwargs):
+    """Run ``fn`` in the CPU executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+def json_response(data, status=200, safe=False):
+    return JsonResponse(data, status=status, safe=safe, encoder=DjangoJSONEncoder)
+
+def _authenticate(request):
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+def async_api_view(permission='authenticated', methods=('GET',)):
+    """
+    Decorate an async view with JWT authentication and a permission check.
+
+    ``permission`` is ``'any'``, ``'authenticated'`` or ``'admin'``; the
+    authenticated user is available as ``request.user``.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            try:
+                user = await sync_to_async(_authenticate)(request)
+            except exceptions.APIException as e:
+                return json_response({'detail': str(e.detail)}, status=e.status_code)
+            if permission != 'any':
+                if user is None:
+                    return json_response({'detail': 'Authentication credentials were not provided.'}, status=401)
+                if permission == 'admin' and not user.is_staff:
+                    return json_response({'detail': 'You do not have permission to perform this action.'}, status=403)
+            request.user = user or AnonymousUser()
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
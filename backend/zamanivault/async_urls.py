@@ -0,0 +1,22 @@
+
+"""
+Async (ASGI) read endpoints, mounted under /api/async/.
+
+Route this prefix to the ASGI application (zamanivault.asgi) to serve many
+concurrent slow requests from one process.
+"""
+
+from django.urls import path
+from content.async_views import content_list, content_detail
+from ml_service.async_views import user_recommendations, user_insights
+from .health_check import health_check_async
+
+urlpatterns = [
+    path('content/content/', content_list, name='async-content-list'),
+    path('content/content/<int:pk>/', content_detail, name='async-content-detail'),
+    path('ml/recommendations/<int:user_id>/', user_recommendations, name='async-user-recommendations'),
+    path('ml/recommendations/', user_recommendations, name='async-self-recommendations'),
+    path('ml/insights/<int:user_id>/', user_insights, name='async-user-insights'),
+    path('ml/insights/', user_insights, name='async-self-insights'),
+    path('health/', health_check_async, name='async-health-check'),
+]
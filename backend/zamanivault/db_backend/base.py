@@ -0,0 +1,31 @@
+
+"""
+djongo backend that runs on the process-wide pooled client.
+
+Stock djongo keeps one ``MongoClient`` per database name, shared by every
+thread, but closes it whenever any thread's connection is closed. With
+the default ``CONN_MAX_AGE`` that happens at the end of every request, so
+each request drops the pooled sockets of all threads and the next queries
+reconnect. This wrapper uses ``zamanivault.mongo.get_client()`` instead and
+leaves the pool open when a connection is closed. Sockets are then reused
+across requests, threads and the native repositories, up to the configured
+pool size and idle timeout.
+"""
+
+from djongo.base import DatabaseWrapper as DjongoDatabaseWrapper, DjongoClient
+from zamanivault.mongo import get_client
+
+class DatabaseWrapper(DjongoDatabaseWrapper):
+
+    def get_new_connection(self, connection_params):
+        name = connection_params.pop('name')
+        enforce_schema = connection_params.pop('enforce_schema')
+        # Client options come from the same settings through get_client()
+        self.client_connection = get_client()
+        database = self.client_connection[name]
+        self.djongo_connection = DjongoClient(database, enforce_schema)
+        return database
+
+    def _close(self):
+        # The pool is shared; closing it here would disconnect every other thread
+        pass
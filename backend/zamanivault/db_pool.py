@@ -0,0 +1,186 @@
+
+"""
+MongoDB connection pool metrics.
+
+``pool_metrics`` is registered as a pymongo pool event listener on the
+shared client (``zamanivault.mongo.get_client``), which serves both djongo
+and the native repositories. For each server address it tracks:
+- connections open and checked out, with the checked-out high-water mark;
+- checkout wait time, from the start of a checkout to the moment a
+  connection is handed over or the checkout fails;
+- checkout failures and connection closes, by reason;
+- pool clears, which follow network errors.
+
+Compare the high-water mark and the wait histogram with
+``MONGODB_MAX_POOL_SIZE`` and the number of threads each worker runs. The
+metrics are per worker process.
+"""
+
+import threading
+import time
+from pymongo import monitoring
+from .performance import Histogram, _escape
+
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)  # seconds
+
+class AddressPoolMetrics:
+    __slots__ = (
+        'open', 'checked_out', 'max_checked_out', 'created', 'checkouts', 'clears',
+        'wait', 'checkout_failures', 'closed'
+    )
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.created = 0
+        self.checkouts = 0
+        self.clears = 0
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.checkout_failures = {}
+        self.closed = {}
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool listener aggregating pool state per server address."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}
+        # Checkouts block the calling thread, so the start time is per thread
+        self._local = threading.local()
+        self.max_pool_size = None
+
+    def _pool(self, address):
+        key = '%s:%s' % address
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = AddressPoolMetrics()
+        return pool
+
+    def _waited(self, address):
+        started = getattr(self._local, 'started', {}).pop(address, None)
+        return None if started is None else time.perf_counter() - started
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address).clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.created += 1
+            pool.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.open -= 1
+            pool.closed[event.reason] = pool.closed.get(event.reason, 0) + 1
+
+    def connection_check_out_started(self, event):
+        if not hasattr(self._local, 'started'):
+            self._local.started = {}
+        self._local.started[event.address] = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited(event.address)
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.checkout_failures[event.reason] = pool.checkout_failures.get(event.reason, 0) + 1
+            if waited is not None:
+                pool.wait.observe(waited)
+
+    def connection_checked_out(self, event):
+        waited = self._waited(event.address)
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.checkouts += 1
+            pool.checked_out += 1
+            pool.max_checked_out = max(pool.max_checked_out, pool.checked_out)
+            if waited is not None:
+                pool.wait.observe(waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._pool(event.address).checked_out -= 1
+
+    def snapshot(self):
+        """Return the pool state per address as plain data."""
+        with self._lock:
+            return {
+                'max_pool_size': self.max_pool_size,
+                'pools': {
+                    address: {
+                        'open': pool.open,
+                        'checked_out': pool.checked_out,
+                        'max_checked_out': pool.max_checked_out,
+                        'connections_created': pool.created,
+                        'checkouts': pool.checkouts,
+                        'clears': pool.clears,
+                        'wait_seconds': {
+                            'count': pool.wait.count,
+                            'sum': round(pool.wait.sum, 6),
+                            'buckets': {str(bound): total for bound, total in pool.wait.cumulative()},
+                        },
+                        'checkout_failures': dict(pool.checkout_failures),
+                        'closed': dict(pool.closed),
+                    }
+                    for address, pool in sorted(self._pools.items())
+                },
+            }
+
+    def render_prometheus(self):
+        """Return the pool metrics in the Prometheus text exposition format."""
+        gauges = (
+            ('open', 'zamanivault_mongo_pool_connections', 'Open pooled connections.'),
+            ('checked_out', 'zamanivault_mongo_pool_checked_out', 'Connections currently checked out.'),
+            ('max_checked_out', 'zamanivault_mongo_pool_checked_out_max', 'Most connections checked out at once.'),
+        )
+        counters = (
+            ('created', 'zamanivault_mongo_pool_connections_created_total', 'Connections opened.'),
+            ('checkouts', 'zamanivault_mongo_pool_checkouts_total', 'Successful connection checkouts.'),
+            ('clears', 'zamanivault_mongo_pool_clears_total', 'Pool clears after network errors.'),
+        )
+        labelled = (
+            ('checkout_failures', 'zamanivault_mongo_pool_checkout_failures_total', 'Failed checkouts, by reason.'),
+            ('closed', 'zamanivault_mongo_pool_connections_closed_total', 'Closed connections, by reason.'),
+        )
+        wait_name = 'zamanivault_mongo_pool_wait_seconds'
+        with self._lock:
+            pools = sorted(self._pools.items())
+            lines = []
+            for kinds, metric_type in ((gauges, 'gauge'), (counters, 'counter')):
+                for attribute, name, help_text in kinds:
+                    lines.append(f'# HELP {name} {help_text}')
+                    lines.append(f'# TYPE {name} {metric_type}')
+                    for address, pool in pools:
+                        lines.append(f'{name}{{address="{_escape(address)}"}} {getattr(pool, attribute)}')
+            for attribute, name, help_text in labelled:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for address, pool in pools:
+                    for reason, count in sorted(getattr(pool, attribute).items()):
+                        lines.append(
+                            f'{name}{{address="{_escape(address)}",reason="{_escape(reason)}"}} {count}'
+                        )
+            lines.append(f'# HELP {wait_name} Time spent waiting to check out a connection.')
+            lines.append(f'# TYPE {wait_name} histogram')
+            for address, pool in pools:
+                labels = f'address="{_escape(address)}"'
+                for bound, total in pool.wait.cumulative():
+                    lines.append(f'{wait_name}_bucket{{{labels},le="{bound}"}} {total}')
+                lines.append(f'{wait_name}_sum{{{labels}}} {pool.wait.sum}')
+                lines.append(f'{wait_name}_count{{{labels}}} {pool.wait.count}')
+        return '\n'.join(lines) + '\n'
+
+pool_metrics = PoolMetrics()
@@ -1,7 +1,10 @@
 
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework import status
+from django.http import JsonResponse
+from .readiness import get_readiness
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -11,3 +14,33 @@ def health_check(request):
     This endpoint is used by the frontend to detect if the backend is available.
     """
     return Response({"status": "ok"})
+
+async def health_check_async(request):
+    """
+    Async version of the health check, served without a worker thread.
+    """
+    return JsonResponse({"status": "ok"})
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def liveness(request):
+    """
+    Liveness probe: the process is up and serving requests. Touches no
+    dependencies, so a failing database never gets healthy workers restarted.
+    """
+    return Response({"status": "ok"})
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def readiness(request):
+    """
+    Readiness probe: checks MongoDB, the cache backend, model warm-up and
+    queue depths. Returns 503 until every check passes.
+    """
+    ready, checks = get_readiness()
+    return Response(
+        {"status": "ready" if ready else "not_ready", "checks": checks},
+        status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
@@ -0,0 +1,225 @@
+
+"""
+Resized, recompressed derivatives of uploaded images.
+
+Every source image gets one variant per entry of ``IMAGE_VARIANT_WIDTHS``
+(thumbnail, card and full by default). Each variant is written twice, as
+WebP and as a JPEG fallback, and images are never upscaled. Variants are
+stored under ``derivatives/`` in the default storage, keyed by the source
+file name. Rows that share a source image therefore share its variants.
+
+The model's variants field records what was generated::
+
+    {
+        'source': 'content_images/mask.jpg',
+        'variants': {
+            'thumbnail': {'width': 160, 'height': 120,
+                          'webp': 'derivatives/content_images/mask/thumbnail.webp',
+                          'jpeg': 'derivatives/content_images/mask/thumbnail.jpg'},
+            ...
+        },
+    }
+
+Saving a row whose image differs from the recorded ``source`` queues a
+job on ``derivative_pool``, a bounded background thread pool. The job
+writes the field with a queryset ``update()``, so no further signals fire,
+and only if the row still points at the same image. Uploads that skip
+signals (``bulk_create``, imports) and jobs dropped while the queue was
+full are picked up by ``manage.py generate_image_variants``. The pool's
+backlog is registered with the readiness probe's queue registry.
+"""
+
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps
+from .queues import register_queue
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = getattr(settings, 'IMAGE_VARIANT_WIDTHS', {'thumbnail': 160, 'card': 480, 'full': 1600})
+WEBP_QUALITY = getattr(settings, 'IMAGE_WEBP_QUALITY', 80)
+JPEG_QUALITY = getattr(settings, 'IMAGE_JPEG_QUALITY', 82)
+DERIVATIVES_DIR = 'derivatives'
+FORMATS = (('webp', 'WEBP', 'webp'), ('jpeg', 'JPEG', 'jpg'))
+
+# (model label, image field, variants field) of every image that gets derivatives
+IMAGE_FIELDS = (
+    ('content.Content', 'image', 'image_variants'),
+    ('content.Category', 'image', 'image_variants'),
+    ('accounts.User', 'avatar', 'avatar_variants'),
+)
+
+def derivative_path(source, variant, extension):
+    root, _ = os.path.splitext(source)
+    return f"{DERIVATIVES_DIR}/{root}/{variant}.{extension}"
+
+def is_current(source, variants):
+    """True if ``variants`` (a variants field value) was generated from ``source``."""
+    return bool(source) and bool(variants) and variants.get('source') == source
+
+def _encode(image, pil_format, quality):
+    buffer = io.BytesIO()
+    if pil_format == 'JPEG':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            rgba = image.convert('RGBA')
+            image = Image.new('RGB', rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.split()[-1])
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+def _write(path, data):
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    default_storage.save(path, ContentFile(data))
+
+def existing_variants(source):
+    """Return the variants already stored for ``source``, or None if any file is missing."""
+    variants = {}
+    for variant in VARIANT_WIDTHS:
+        paths = {key: derivative_path(source, variant, extension) for key, _, extension in FORMATS}
+        if not all(default_storage.exists(path) for path in paths.values()):
+            return None
+        # Opening an image reads only its header
+        with default_storage.open(paths['jpeg']) as f, Image.open(f) as image:
+            width, height = image.size
+        variants[variant] = dict(paths, width=width, height=height)
+    return {'source': source, 'variants': variants}
+
+def render_variants(source):
+    """Generate and store every variant of the image at ``source``; return the variants value."""
+    with default_storage.open(source) as f, Image.open(f) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    variants = {}
+    for variant, width in sorted(VARIANT_WIDTHS.items(), key=lambda item: item[1]):
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        else:
+            resized = image
+        entry = {'width': resized.width, 'height': resized.height}
+        for key, pil_format, extension in FORMATS:
+            path = derivative_path(source, variant, extension)
+            _write(path, _encode(resized, pil_format, WEBP_QUALITY if key == 'webp' else JPEG_QUALITY))
+            entry[key] = path
+        variants[variant] = entry
+    return {'source': source, 'variants': variants}
+
+def generate(model, pk, image_field, variants_field, force=False):
+    """
+    Bring the variants of one row up to date with its image. Returns the new
+    variants value, or None if there was nothing to do.
+    """
+    row = model._default_manager.filter(pk=pk).values(image_field, variants_field).first()
+    if row is None:
+        return None
+    source = row[image_field]
+    if not source:
+        if row[variants_field]:
+            model._default_manager.filter(pk=pk, **{image_field: source}).update(**{variants_field: {}})
+        return None
+    if not force and is_current(source, row[variants_field]):
+        return None
+    variants = (None if force else existing_variants(source)) or render_variants(source)
+    # The image may have been replaced while the variants were rendered
+    model._default_manager.filter(pk=pk, **{image_field: source}).update(**{variants_field: variants})
+    return variants
+
+def srcset(variants, request=None, image_format='webp'):
+    """Return a ``srcset`` string for a variants value, or None if there are no variants."""
+    if not variants or not variants.get('variants'):
+        return None
+    candidates = []
+    for entry in sorted(variants['variants'].values(), key=lambda entry: entry['width']):
+        url = default_storage.url(entry[image_format])
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        candidates.append(f"{url} {entry['width']}w")
+    return ', '.join(candidates)
+
+def srcsets(variants, request=None):
+    """Return ``{'webp': srcset, 'jpeg': srcset}`` for a variants value, or None."""
+    if not variants or not variants.get('variants'):
+        return None
+    return {key: srcset(variants, request, key) for key, _, _ in FORMATS}
+
+class DerivativePool:
+    """Bounded thread pool for derivative jobs; ``workers=0`` generates inline."""
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max(max_pending, 1))
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.dropped = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image-derivatives')
+        return self._executor
+
+    def _run(self, model, pk, image_field, variants_field):
+        try:
+            generate(model, pk, image_field, variants_field)
+        except Exception:
+            logger.exception('Generating %s variants for %s %s failed', image_field, model.__name__, pk)
+        finally:
+            if self.workers:
+                close_old_connections()
+                with self._lock:
+                    self.pending -= 1
+                self._slots.release()
+
+    def submit(self, model, pk, image_field, variants_field):
+        """Queue a job; when the queue is full it is dropped and left to the backfill command."""
+        if not self.workers:
+            self._run(model, pk, image_field, variants_field)
+            return True
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.pending += 1
+        self._get_executor().submit(self._run, model, pk, image_field, variants_field)
+        return True
+
+derivative_pool = DerivativePool(
+    workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2),
+    max_pending=getattr(settings, 'IMAGE_DERIVATIVE_MAX_PENDING', 256),
+)
+if derivative_pool.workers:
+    register_queue('image_derivatives', lambda: (derivative_pool.pending, derivative_pool.max_pending))
+
+def _image_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    for label, image_field, variants_field in IMAGE_FIELDS:
+        if sender is apps.get_model(label):
+            source = getattr(instance, image_field).name
+            variants = getattr(instance, variants_field)
+            if (source and not is_current(source, variants)) or (not source and variants):
+                derivative_pool.submit(sender, instance.pk, image_field, variants_field)
+
+def connect_signals():
+    for label, _, _ in IMAGE_FIELDS:
+        post_save.connect(_image_saved, sender=label, dispatch_uid=f'image-derivatives-{label}')
@@ -0,0 +1,45 @@
+
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from .db_pool import pool_metrics
+from .mongo import client_options
+from .performance import metrics_registry
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def prometheus_metrics(request):
+    """
+    Per-route request and database pool metrics for this worker in Prometheus text format.
+    """
+    return HttpResponse(
+        metrics_registry.render_prometheus() + pool_metrics.render_prometheus(),
+        content_type=PROMETHEUS_CONTENT_TYPE
+    )
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def slow_requests(request):
+    """
+    Most recent slow requests sampled by this worker, with their query logs.
+    """
+    return Response(metrics_registry.get_slow_samples())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def connection_pool(request):
+    """
+    MongoDB connection pool state for this worker, with the configured limits.
+    """
+    options = client_options()
+    data = pool_metrics.snapshot()
+    data['options'] = {
+        name: options.get(name) for name in (
+            'maxPoolSize', 'minPoolSize', 'maxIdleTimeMS', 'waitQueueTimeoutMS',
+            'serverSelectionTimeoutMS', 'connectTimeoutMS', 'socketTimeoutMS',
+        )
+    }
+    return Response(data)
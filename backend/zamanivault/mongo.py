@@ -0,0 +1,285 @@
+
+"""
+Direct pymongo access for the hottest queries.
+
+djongo turns every ORM query into SQL and then parses that SQL back into a
+MongoDB query. On small, frequent reads and writes the translation costs
+more than the query itself, and ``icontains``, joins and ``count()`` come out
+as poor query shapes. The repositories (``content.repository`` and
+``accounts.repository``) run those queries here instead.
+
+They read and write the documents djongo itself writes, so both paths see
+the same data:
+
+- the collection is the model's ``db_table``;
+- each field is stored under its column name;
+- values are prepared with the field's ``get_db_prep_save``;
+- integer primary keys come from djongo's ``__schema__`` sequence.
+
+Writes send the same model signals as ``save()`` and ``delete()``, so caches
+and rollups stay in step. ``unique_together`` constraints the native writes
+rely on are created as unique indexes by ``ensure_unique_indexes`` after
+``migrate``. The repositories are checked against their ORM queries by the
+``tests.py`` of ``content`` and ``accounts``; they are off unless
+``MONGO_NATIVE_QUERIES`` is set.
+
+One ``MongoClient`` per process, configured from
+``DATABASES['default']['CLIENT']``, serves the repositories and djongo
+itself (``zamanivault.db_backend``). Its pool reports to
+``zamanivault.db_pool.pool_metrics``, and its commands to
+``zamanivault.performance.command_metrics`` so native queries count towards
+each request's query count and database time.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+from bson.decimal128 import Decimal128
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.utils import timezone
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReturnDocument
+from pymongo.errors import OperationFailure
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+from .db_pool import pool_metrics
+from .performance import ENABLED as PERFORMANCE_METRICS_ENABLED, command_metrics
+
+NATIVE_QUERIES = getattr(settings, 'MONGO_NATIVE_QUERIES', False)
+ALIAS = 'default'
+
+_client = None
+_client_lock = threading.Lock()
+
+def client_options(alias=ALIAS):
+    """Return the ``MongoClient`` keyword arguments configured for ``alias``."""
+    options = dict(settings.DATABASES[alias].get('CLIENT', {}))
+    # djongo's SQL translation expects ordered documents
+    options['document_class'] = OrderedDict
+    listeners = [pool_metrics] + ([command_metrics] if PERFORMANCE_METRICS_ENABLED else [])
+    options['event_listeners'] = list(options.get('event_listeners', ())) + listeners
+    return options
+
+def get_client():
+    """Return the process-wide ``MongoClient``, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                options = client_options()
+                pool_metrics.max_pool_size = options.get('maxPoolSize', 100)
+                _client = MongoClient(connect=False, **options)
+    return _client
+
+def _forget_client():
+    # pymongo clients are not fork-safe; a child process builds its own
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_forget_client)
+
+def get_database():
+    return get_client()[settings.DATABASES[ALIAS]['NAME']]
+
+def collection(model):
+    """Return the collection djongo uses for ``model``."""
+    return get_database()[model._meta.db_table]
+
+def reserve_ids(model, count=1):
+    """Reserve ``count`` consecutive primary keys for ``model``; return the first."""
+    schema = get_database()['__schema__'].find_one_and_update(
+        {'name': model._meta.db_table},
+        {'$inc': {'auto.seq': count}},
+        return_document=ReturnDocument.AFTER
+    )
+    if schema is None:
+        raise RuntimeError(f"No id sequence for {model._meta.db_table}; run migrate first.")
+    return schema['auto']['seq'] - count + 1
+
+def ensure_unique_indexes(*models):
+    """
+    Create a unique index for each unique field and ``unique_together`` of ``models``.
+
+    Native inserts rely on the index to reject duplicates (``DuplicateKeyError``)
+    rather than on djongo's migrations. Creating an index that already exists
+    is a no-op; existing duplicate rows make it fail with ``OperationFailure``.
+    """
+    for model in models:
+        unique = [(field.name,) for field in model._meta.concrete_fields if field.unique and not field.primary_key]
+        for fields in unique + [tuple(fields) for fields in model._meta.unique_together]:
+            collection(model).create_index(
+                [(column(model, name), ASCENDING) for name in fields],
+                unique=True, name=f"{model._meta.db_table}_{'_'.join(fields)}_uniq"
+            )
+
+def ensure_ttl_index(model, field, seconds):
+    """Have MongoDB delete documents of ``model`` ``seconds`` after their ``field`` date."""
+    name = f"{model._meta.db_table}_{field}_ttl"
+    documents = collection(model)
+    existing = documents.index_information().get(name)
+    if existing is not None and existing.get('expireAfterSeconds') != seconds:
+        documents.drop_index(name)
+    documents.create_index([(column(model, field), ASCENDING)], expireAfterSeconds=seconds, name=name)
+
+def run_in_transaction(callback):
+    """
+    Run ``callback(session)`` in a multi-document transaction and return its
+    result. The transaction is retried on transient errors, such as a write
+    conflict with a concurrent transaction, so ``callback`` may run more than
+    once and must have no side effects outside the database.
+
+    Transactions need a replica set (a single-node one will do) or mongos.
+    """
+    with get_client().start_session() as session:
+        try:
+            return session.with_transaction(
+                callback, read_concern=ReadConcern('snapshot'), write_concern=WriteConcern('majority')
+            )
+        except OperationFailure as e:
+            if e.code == 20:  # IllegalOperation: a standalone server
+                raise ImproperlyConfigured(
+                    'MongoDB transactions need a replica set; start mongod with --replSet '
+                    '(and rs.initiate()) and add replicaSet=... to MONGODB_URI.'
+                ) from e
+            raise
+
+def column(model, name):
+    """Return the stored name of field ``name`` of ``model``."""
+    return model._meta.get_field(name).column
+
+def projection(model, fields=None):
+    fields = fields or [field.name for field in model._meta.concrete_fields]
+    return dict({column(model, name): 1 for name in fields}, _id=0)
+
+def sort_spec(model, ordering):
+    """Translate ORM ordering (``['-created_at', 'title']``) into a pymongo sort."""
+    return [
+        (column(model, name.lstrip('-')), DESCENDING if name.startswith('-') else ASCENDING)
+        for name in ordering
+    ]
+
+def to_python(field, value):
+    """Convert a stored value the way the ORM's result converters would."""
+    if value is None:
+        return None
+    internal_type = field.get_internal_type()
+    if internal_type == 'JSONField':
+        # Django serialises JSON to a string; documents written natively may hold the value itself
+        return field.from_db_value(value, None, connections[ALIAS]) if isinstance(value, str) else value
+    if internal_type == 'DateTimeField' and settings.USE_TZ and timezone.is_naive(value):
+        return timezone.make_aware(value, dt_timezone.utc)
+    if internal_type == 'DateField' and isinstance(value, datetime):
+        # BSON has no date type; djongo stores dates as midnight datetimes
+        return value.date()
+    if internal_type == 'DecimalField' and isinstance(value, Decimal128):
+        return value.to_decimal()
+    return value
+
+def from_document(model, document, fields=None):
+    """Build a model instance from a stored document, as a queryset would."""
+    fields = [model._meta.get_field(name) for name in fields] if fields else model._meta.concrete_fields
+    return model.from_db(
+        ALIAS,
+        [field.attname for field in fields],
+        [to_python(field, document.get(field.column)) for field in fields]
+    )
+
+def values(model, document, fields=None):
+    """Return a stored document as ``QuerySet.values()`` would, keyed by attribute name."""
+    fields = [model._meta.get_field(name) for name in fields] if fields else model._meta.concrete_fields
+    return {field.attname: to_python(field, document.get(field.column)) for field in fields}
+
+def to_document(instance):
+    connection = connections[ALIAS]
+    return {
+        field.column: field.get_db_prep_save(getattr(instance, field.attname), connection)
+        for field in instance._meta.concrete_fields
+    }
+
+def to_fields(model, **values):
+    """Return ``values`` (by field name) as stored columns, for ``$set`` and filters."""
+    connection = connections[ALIAS]
+    fields = {name: model._meta.get_field(name) for name in values}
+    return {field.column: field.get_db_prep_save(values[name], connection) for name, field in fields.items()}
+
+def insert(instance):
+    """Insert a new ``instance`` as ``save()`` would, sending the same signals."""
+    model = type(instance)
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            field.pre_save(instance, True)
+    pre_save.send(sender=model, instance=instance, raw=False, using=ALIAS, update_fields=None)
+    instance.pk = reserve_ids(model)
+    collection(model).insert_one(to_document(instance))
+    instance._state.adding = False
+    instance._state.db = ALIAS
+    post_save.send(sender=model, instance=instance, created=True, update_fields=None, raw=False, using=ALIAS)
+    return instance
+
+def delete_one(model, query):
+    """
+    Delete the first document matching ``query`` and send the delete signals.
+    Returns the deleted instance, or None. Only for models without dependent rows.
+    """
+    document = collection(model).find_one_and_delete(query)
+    if document is None:
+        return None
+    instance = from_document(model, document)
+    pre_delete.send(sender=model, instance=instance, using=ALIAS, origin=instance)
+    post_delete.send(sender=model, instance=instance, using=ALIAS, origin=instance)
+    return instance
+
+class NativeQuery:
+    """
+    Lazy result of a native ``find``, usable wherever DRF paginates a queryset.
+
+    Slicing runs one ``find`` with ``skip`` and ``limit``, reading only the
+    selected fields, and returns model instances, or ``values()`` rows when
+    ``as_values`` is set. ``count()`` runs a ``count_documents`` with the
+    same filter.
+    """
+
+    ordered = True
+
+    def __init__(self, model, query=None, ordering=None, fields=None, as_values=False):
+        self.model = model
+        self.query = query or {}
+        self.ordering = list(ordering if ordering is not None else model._meta.ordering)
+        self.fields = fields
+        self.as_values = as_values
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            documents = collection(self.model)
+            # An unfiltered count is answered from collection metadata
+            self._count = (
+                documents.count_documents(self.query) if self.query else documents.estimated_document_count()
+            )
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        cursor = collection(self.model).find(self.query, projection(self.model, self.fields))
+        if self.ordering:
+            cursor = cursor.sort(sort_spec(self.model, self.ordering))
+        if start:
+            cursor = cursor.skip(start)
+        if key.stop is not None:
+            if key.stop <= start:
+                return []
+            cursor = cursor.limit(key.stop - start)
+        convert = values if self.as_values else from_document
+        return [convert(self.model, document, self.fields) for document in cursor]
+
+    def __iter__(self):
+        return iter(self[0:None])
@@ -0,0 +1,345 @@
+"""
+Request-level performance instrumentation.
+
+``PerformanceMiddleware`` records, for each request:
+- wall time;
+- database query count and time;
+- render time;
+- response size.
+
+Render time covers only the renderer turning the response data into bytes.
+Building ``serializer.data`` happens inside the view, so it is part of the
+wall time but not of the render time; the ML views report it separately as
+their ``ml-serialization`` phase.
+
+It reports them in a ``Server-Timing`` header and adds them to in-memory
+per-route histograms, which ``metrics_registry`` exposes in Prometheus
+text format. A query log is kept for each request, up to a limit, but it
+is only reported when the request is slower than
+``PERFORMANCE_SLOW_REQUEST_MS``.
+
+Queries are counted and timed by ``command_metrics``, a pymongo command
+listener on the shared client (``zamanivault.mongo.get_client``). It sees
+every command sent to MongoDB, whether by djongo or by the native
+repositories, which skip Django's cursor altogether. djongo also sends its
+``find`` lazily, while rows are fetched, rather than inside
+``cursor.execute``. The listener reads the current request's stats from a
+context variable, so it also counts queries that async views run through
+``sync_to_async``. A database execute wrapper adds the SQL of each ORM query
+to the query log. The histograms are per worker process.
+"""
+
+import bisect
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import deque
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'PERFORMANCE_METRICS_ENABLED', True)
+SLOW_REQUEST_MS = getattr(settings, 'PERFORMANCE_SLOW_REQUEST_MS', 1000)
+SLOW_SAMPLE_RATE = getattr(settings, 'PERFORMANCE_SLOW_SAMPLE_RATE', 1.0)
+QUERY_LOG_LIMIT = getattr(settings, 'PERFORMANCE_QUERY_LOG_LIMIT', 50)
+SLOW_SAMPLES_KEPT = getattr(settings, 'PERFORMANCE_SLOW_SAMPLES_KEPT', 100)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)  # bytes
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+class RequestStats:
+    """Mutable per-request counters shared with the query wrapper."""
+
+    __slots__ = ('query_count', 'db_seconds', 'render_seconds', 'render_started', 'queries')
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.render_started = None
+        self.queries = []
+
+_current_stats = contextvars.ContextVar('request_performance_stats', default=None)
+
+def _log_query(stats, description, elapsed):
+    if len(stats.queries) < QUERY_LOG_LIMIT:
+        stats.queries.append((description, elapsed))
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        # Counted by command_metrics; this logs the SQL djongo translated
+        _log_query(stats, sql, time.perf_counter() - started)
+
+class CommandMetrics(monitoring.CommandListener):
+    """Counts and times MongoDB commands against the current request's stats."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def started(self, event):
+        if _current_stats.get() is None:
+            return
+        target = event.command.get(event.command_name)
+        description = f'{event.command_name} {event.database_name}'
+        if isinstance(target, str):
+            description += f'.{target}'
+        # Listeners run on the thread that sends the command
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            pending = self._local.pending = {}
+        pending[event.request_id] = description
+
+    def _finished(self, event):
+        pending = getattr(self._local, 'pending', None)
+        description = pending.pop(event.request_id, None) if pending else None
+        stats = _current_stats.get()
+        if description is not None and stats is not None:
+            elapsed = event.duration_micros / 1e6
+            stats.query_count += 1
+            stats.db_seconds += elapsed
+            _log_query(stats, description, elapsed)
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+command_metrics = CommandMetrics()
+
+def _install_query_wrapper(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+if ENABLED:
+    connection_created.connect(_install_query_wrapper, dispatch_uid='performance_query_wrapper')
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus model."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            yield bound, total
+
+class RouteMetrics:
+    __slots__ = ('duration', 'db_duration', 'render_duration', 'queries', 'response_size', 'statuses')
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.db_duration = Histogram(DURATION_BUCKETS)
+        self.render_duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.statuses = {}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class MetricsRegistry:
+    """Per-route request metrics and a ring buffer of slow request samples."""
+
+    HISTOGRAMS = (
+        ('duration', 'zamanivault_request_duration_seconds', 'Request wall time.'),
+        ('db_duration', 'zamanivault_request_db_duration_seconds', 'Time spent in database queries per request.'),
+        ('render_duration', 'zamanivault_request_render_duration_seconds', 'Time spent rendering the response body.'),
+        ('queries', 'zamanivault_request_db_queries', 'Database queries per request.'),
+        ('response_size', 'zamanivault_response_size_bytes', 'Response body size.'),
+    )
+
+    def __init__(self, slow_samples_kept=SLOW_SAMPLES_KEPT):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self.slow_samples = deque(maxlen=slow_samples_kept)
+
+    def observe(self, method, route, status, wall, stats, size):
+        with self._lock:
+            metrics = self._routes.get((method, route))
+            if metrics is None:
+                metrics = self._routes[(method, route)] = RouteMetrics()
+            metrics.duration.observe(wall)
+            metrics.db_duration.observe(stats.db_seconds)
+            metrics.render_duration.observe(stats.render_seconds)
+            metrics.queries.observe(stats.query_count)
+            if size is not None:
+                metrics.response_size.observe(size)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def add_slow_sample(self, sample):
+        with self._lock:
+            self.slow_samples.append(sample)
+
+    def get_slow_samples(self):
+        with self._lock:
+            return list(self.slow_samples)
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self.slow_samples.clear()
+
+    def render_prometheus(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = [
+                '# HELP zamanivault_requests_total Requests handled, by route and status code.',
+                '# TYPE zamanivault_requests_total counter',
+            ]
+            for (method, route), metrics in routes:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(
+                        f'zamanivault_requests_total{{method="{method}",route="{_escape(route)}",'
+                        f'status="{status}"}} {count}'
+                    )
+            for attribute, name, help_text in self.HISTOGRAMS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (method, route), metrics in routes:
+                    histogram = getattr(metrics, attribute)
+                    labels = f'method="{method}",route="{_escape(route)}"'
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+metrics_registry = MetricsRegistry()
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNMATCHED_ROUTE
+    return '/' + match.route if match.route else match.view_name or UNMATCHED_ROUTE
+
+def _response_size(response):
+    if getattr(response, 'streaming', False):
+        length = response.get('Content-Length')
+        return int(length) if length and length.isdigit() else None
+    return len(response.content)
+
+def _server_timing(wall, stats):
+    return (
+        f'app;dur={wall * 1000:.1f}, '
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.query_count} queries", '
+        f'render;dur={stats.render_seconds * 1000:.1f};desc="renderer only"'
+    )
+
+class PerformanceMiddleware:
+    """
+    Time each request and publish the measurements; see the module docstring.
+
+    Place it first in ``MIDDLEWARE`` so the wall time covers the full stack.
+    It supports both sync and async stacks, so async views are not moved to
+    a thread because of it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not ENABLED:
+            return self.get_response(request)
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self._finish(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        if not ENABLED:
+            return await self.get_response(request)
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self._finish(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that step
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self._render_finished(stats))
+        return response
+
+    @staticmethod
+    def _render_finished(stats):
+        if stats.render_started is not None:
+            stats.render_seconds += time.perf_counter() - stats.render_started
+            stats.render_started = None
+
+    def _finish(self, request, response, wall, stats):
+        timing = _server_timing(wall, stats)
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = f'{timing}, {existing}' if existing else timing
+        route = _route(request)
+        metrics_registry.observe(
+            request.method, route, response.status_code, wall, stats, _response_size(response)
+        )
+        if wall * 1000 >= SLOW_REQUEST_MS and random.random() < SLOW_SAMPLE_RATE:
+            sample = {
+                'timestamp': timezone.now().isoformat(),
+                'method': request.method,
+                'path': request.path,
+                'route': route,
+                'status': response.status_code,
+                'duration_ms': round(wall * 1000, 1),
+                'db_ms': round(stats.db_seconds * 1000, 1),
+                'render_ms': round(stats.render_seconds * 1000, 1),
+                'query_count': stats.query_count,
+                'queries': [
+                    {'sql': str(sql), 'duration_ms': round(elapsed * 1000, 2)}
+                    for sql, elapsed in stats.queries
+                ],
+            }
+            metrics_registry.add_slow_sample(sample)
+            logger.warning(
+                'Slow request %s %s: %.0f ms, %d queries (%.0f ms)',
+                request.method, request.path, sample['duration_ms'], stats.query_count, sample['db_ms']
+            )
@@ -0,0 +1,28 @@
+
+"""
+Registry of in-process work queues, reported by the readiness probe.
+
+Components with a bounded backlog register a callable that returns
+``(depth, capacity)``. A queue at capacity marks the worker as not ready so
+the load balancer stops routing new work to it.
+"""
+
+import threading
+
+_queues = {}
+_lock = threading.Lock()
+
+def register_queue(name, probe):
+    """Register ``probe``, a callable returning ``(depth, capacity)``, under ``name``."""
+    with _lock:
+        _queues[name] = probe
+
+def queue_depths():
+    """Return ``{name: {'depth': int, 'capacity': int}}`` for every registered queue."""
+    with _lock:
+        queues = list(_queues.items())
+    depths = {}
+    for name, probe in queues:
+        depth, capacity = probe()
+        depths[name] = {'depth': depth, 'capacity': capacity}
+    return depths
@@ -0,0 +1,95 @@
+
+"""
+Dependency probes for the readiness endpoint.
+
+Each probe runs in a small thread pool and must finish within
+``HEALTH_PROBE_TIMEOUT_MS``. A probe that hangs is reported as failed, and
+the request is not held up by it. The combined result is cached for
+``HEALTH_READINESS_CACHE_SECONDS``, so frequent load-balancer polling costs
+one round of probes per interval per worker.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from .queues import queue_depths
+
+PROBE_TIMEOUT = getattr(settings, 'HEALTH_PROBE_TIMEOUT_MS', 500) / 1000
+CACHE_SECONDS = getattr(settings, 'HEALTH_READINESS_CACHE_SECONDS', 2)
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='readiness-probe')
+_cached = None
+_cached_at = 0.0
+_lock = threading.Lock()
+
+def probe_database():
+    connection = connections['default']
+    connection.ensure_connection()
+    # djongo exposes the pymongo database as the raw connection
+    connection.connection.command('ping')
+    return {}
+
+def probe_cache():
+    cache = caches[getattr(settings, 'ENTITLEMENT_CACHE_ALIAS', 'default')]
+    key = f"readiness:{uuid.uuid4().hex}"
+    cache.set(key, 1, 5)
+    if cache.get(key) != 1:
+        raise RuntimeError('Cache did not return the value just written.')
+    cache.delete(key)
+    return {}
+
+def probe_model():
+    from ml_service.warmup import model_warmup
+
+    model_warmup.ensure_started()
+    status = model_warmup.status()
+    if not status.pop('ok'):
+        raise RuntimeError(status['error'] or 'Model warm-up in progress.')
+    return status
+
+def probe_queues():
+    depths = queue_depths()
+    full = [name for name, queue in depths.items() if queue['depth'] >= queue['capacity']]
+    if full:
+        raise RuntimeError(f"Queue at capacity: {', '.join(full)}")
+    return {'queues': depths}
+
+PROBES = (
+    ('database', probe_database),
+    ('cache', probe_cache),
+    ('model', probe_model),
+    ('queues', probe_queues),
+)
+
+def _timed(probe):
+    started = time.perf_counter()
+    details = probe()
+    return details, (time.perf_counter() - started) * 1000
+
+def run_probes():
+    """Run all probes concurrently; return ``(ready, {name: result})``."""
+    futures = [(name, _executor.submit(_timed, probe)) for name, probe in PROBES]
+    deadline = time.monotonic() + PROBE_TIMEOUT
+    results = {}
+    for name, future in futures:
+        try:
+            details, latency = future.result(timeout=max(deadline - time.monotonic(), 0))
+            results[name] = {'ok': True, 'latency_ms': round(latency, 2), **details}
+        except FutureTimeout:
+            results[name] = {'ok': False, 'error': f'Timed out after {PROBE_TIMEOUT * 1000:.0f} ms.'}
+        except Exception as e:
+            results[name] = {'ok': False, 'error': str(e)}
+    return all(result['ok'] for result in results.values()), results
+
+def get_readiness():
+    """Return the cached ``(ready, results)``, re-probing when the cache is stale."""
+    global _cached, _cached_at
+    with _lock:
+        if _cached is None or time.monotonic() - _cached_at >= CACHE_SECONDS:
+            _cached = run_probes()
+            _cached_at = time.monotonic()
+        return _cached
@@ -0,0 +1,41 @@
+
+"""
+A faster JSON renderer for the API.
+
+``FastJSONRenderer`` renders with orjson, which encodes in C and is several
+times faster than the standard library on large list payloads. The bytes
+are the same as DRF's ``JSONRenderer`` output: compact separators, UTF-8
+rather than ``\\u`` escapes, U+2028/U+2029 escaped for JavaScript, and
+datetimes, decimals, lazy strings and other non-JSON types converted by
+DRF's own ``JSONEncoder``. Responses that request indentation, settings
+other than the default ``COMPACT_JSON``/``UNICODE_JSON``, values orjson
+cannot encode (integers over 64 bits, for example) and installations
+without orjson all fall back to the stock renderer.
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional; the stock renderer is used without it
+    orjson = None
+
+if orjson is not None:
+    # Leave datetimes and dataclasses to DRF's encoder, which formats them its own way
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that encodes with orjson when it is installed."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # orjson only writes compact UTF-8, the stock renderer's default (COMPACT_JSON, UNICODE_JSON)
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Valid JSON but not valid JavaScript, which the stock renderer escapes as well
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -1,6 +1,7 @@
 
 import os
 import environ
+from corsheaders.defaults import default_headers
 from pathlib import Path
 
 # Initialize environment variables
@@ -40,12 +41,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'zamanivault.performance.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.HashingBusyMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -73,16 +76,52 @@ WSGI_APPLICATION = 'zamanivault.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# djongo on one pooled MongoClient per process, shared by every thread and by the
+# native queries (zamanivault/db_backend). Size the pool to at least the threads per
+# worker and check /api/metrics/pool/ under load; timeouts are in milliseconds
 DATABASES = {
     'default': {
-        'ENGINE': 'djongo',
+        'ENGINE': 'zamanivault.db_backend',
         'NAME': env('MONGODB_NAME', default='zamanivault'),
+        # Keep the per-thread connection wrapper between requests
+        'CONN_MAX_AGE': env.int('DATABASE_CONN_MAX_AGE', default=600),  # seconds
         'CLIENT': {
             'host': env('MONGODB_URI', default='mongodb://localhost:27017/zamanivault'),
+            'maxPoolSize': env.int('MONGODB_MAX_POOL_SIZE', default=100),
+            'minPoolSize': env.int('MONGODB_MIN_POOL_SIZE', default=0),
+            'maxIdleTimeMS': env.int('MONGODB_MAX_IDLE_TIME_MS', default=300000),
+            'waitQueueTimeoutMS': env.int('MONGODB_WAIT_QUEUE_TIMEOUT_MS', default=5000),
+            'serverSelectionTimeoutMS': env.int('MONGODB_SERVER_SELECTION_TIMEOUT_MS', default=5000),
+            'connectTimeoutMS': env.int('MONGODB_CONNECT_TIMEOUT_MS', default=5000),
+            'socketTimeoutMS': env.int('MONGODB_SOCKET_TIMEOUT_MS', default=60000),
+            'retryWrites': True,
         }
     }
 }
 
+# Hot content, activity and favorite queries use pymongo directly (zamanivault/mongo.py)
+# instead of djongo's SQL translation; both paths return the same results (checked by the
+# repository tests against a local mongod)
+MONGO_NATIVE_QUERIES = env.bool('MONGO_NATIVE_QUERIES', default=False)
+
+# Native content list/detail responses are serialized from values() rows by the
+# compiled serializers in content/fast_serializers.py; the JSON is unchanged
+CONTENT_FAST_SERIALIZERS = env.bool('CONTENT_FAST_SERIALIZERS', default=True)
+
+# Cache
+# Set CACHE_URL (e.g. redis://localhost:6379/1) to share cached entitlements, token versions and
+# recommendation generations between workers. Startup fails without a shared cache unless
+# ENTITLEMENT_REQUIRE_SHARED_CACHE is off (the default only when DEBUG is on)
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+ENTITLEMENT_CACHE_ALIAS = 'default'
+ENTITLEMENT_REQUIRE_SHARED_CACHE = env.bool('ENTITLEMENT_REQUIRE_SHARED_CACHE', default=not DEBUG)
+ENTITLEMENT_LOCAL_TTL = env.int('ENTITLEMENT_LOCAL_TTL', default=10)  # seconds
+ENTITLEMENT_SHARED_TTL = env.int('ENTITLEMENT_SHARED_TTL', default=300)  # seconds
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -101,6 +140,32 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# The preferred hasher is used for new passwords; existing hashes made with
+# any of the others are upgraded on the next successful login.
+
+PASSWORD_HASHER_CHOICES = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+}
+PASSWORD_HASHER = env('PASSWORD_HASHER', default='pbkdf2')
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CHOICES.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+# Hashing runs in a process pool per web worker; 0 workers hashes on the request thread. The
+# default shares the cores between the WEB_CONCURRENCY web workers (gunicorn's worker count)
+PASSWORD_HASHING_WORKERS = env.int(
+    'PASSWORD_HASHING_WORKERS', default=max((os.cpu_count() or 1) // env.int('WEB_CONCURRENCY', default=1), 1)
+)
+PASSWORD_HASHING_MAX_PENDING = env.int('PASSWORD_HASHING_MAX_PENDING', default=64)
+PASSWORD_HASHING_TIMEOUT = env.int('PASSWORD_HASHING_TIMEOUT', default=10)  # seconds
+
+# Logins (API and admin) check passwords in the hashing pool
+AUTHENTICATION_BACKENDS = ['accounts.hashing.OffloadedModelBackend']
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -126,11 +191,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'zamanivault.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
@@ -150,6 +219,86 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+# Request headers the API reads besides the defaults: subscribe retries, ML profiling
+# and chunked upload checksums
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'x-ml-profile', 'x-chunk-sha256')
 
 # ML Model Settings
 ML_MODEL_PATH = env('ML_MODEL_PATH', default='ml_service/models/recommendation_model.pkl')
+
+# ML insight settings
+ML_INSIGHTS_WINDOW_DAYS = env.int('ML_INSIGHTS_WINDOW_DAYS', default=7)
+ML_INSIGHTS_TREND_THRESHOLD = env.int('ML_INSIGHTS_TREND_THRESHOLD', default=5)  # percentage points
+
+# ML profiling: '', 'phases', 'cprofile' or 'sample' for every request;
+# staff can profile a single request with the X-ML-Profile header instead
+ML_PROFILING = env('ML_PROFILING', default='')
+ML_PROFILE_DIR = env('ML_PROFILE_DIR', default=os.path.join(BASE_DIR, 'profiles'))
+ML_PROFILE_SAMPLE_INTERVAL_MS = env.int('ML_PROFILE_SAMPLE_INTERVAL_MS', default=5)
+
+# Columnar activity snapshots (manage.py export_activity_snapshots)
+ML_ACTIVITY_SNAPSHOT_DIR = env('ML_ACTIVITY_SNAPSHOT_DIR', default=os.path.join(BASE_DIR, 'snapshots', 'activity'))
+# Exports re-scan this many ids below the last exported one, since ids are reserved before insert
+ML_ACTIVITY_SNAPSHOT_PK_WINDOW = env.int('ML_ACTIVITY_SNAPSHOT_PK_WINDOW', default=1000)
+
+# Eligibility index: rebuilt when the shared catalogue generation changes, and at the latest
+# after this many seconds
+ML_ELIGIBILITY_MAX_AGE = env.int('ML_ELIGIBILITY_MAX_AGE', default=300)  # seconds
+
+# Warm the recommendation pipeline in a background thread when a worker starts; the worker
+# reports not-ready until it has finished
+ML_WARMUP_ON_STARTUP = env.bool('ML_WARMUP_ON_STARTUP', default=True)
+
+# Recommendation cache settings (per worker process; entries are invalidated across workers
+# through per-user generation tokens in the shared cache)
+ML_RECOMMENDATION_CACHE_SIZE = env.int('ML_RECOMMENDATION_CACHE_SIZE', default=10000)
+ML_RECOMMENDATION_CACHE_TTL = env.int('ML_RECOMMENDATION_CACHE_TTL', default=300)  # seconds
+
+# Subscription billing settings
+SUBSCRIPTION_PAYMENT_PROVIDER = env(
+    'SUBSCRIPTION_PAYMENT_PROVIDER', default='subscriptions.renewals.FakePaymentProvider'
+)
+
+# Subscribe idempotency: seconds a stored Idempotency-Key response is kept (a TTL index expires it).
+# Subscribing writes in a MongoDB transaction, which needs a replica set (see MONGODB_URI)
+SUBSCRIBE_IDEMPOTENCY_KEY_TTL = env.int('SUBSCRIBE_IDEMPOTENCY_KEY_TTL', default=24 * 60 * 60)
+
+# Async (ASGI) endpoints: threads used for CPU-bound scoring
+ASYNC_CPU_WORKERS = env.int('ASYNC_CPU_WORKERS', default=4)
+
+# Request performance instrumentation (Server-Timing header, /api/metrics/)
+PERFORMANCE_METRICS_ENABLED = env.bool('PERFORMANCE_METRICS_ENABLED', default=True)
+PERFORMANCE_SLOW_REQUEST_MS = env.int('PERFORMANCE_SLOW_REQUEST_MS', default=1000)
+PERFORMANCE_SLOW_SAMPLE_RATE = env.float('PERFORMANCE_SLOW_SAMPLE_RATE', default=1.0)
+PERFORMANCE_QUERY_LOG_LIMIT = env.int('PERFORMANCE_QUERY_LOG_LIMIT', default=50)
+PERFORMANCE_SLOW_SAMPLES_KEPT = env.int('PERFORMANCE_SLOW_SAMPLES_KEPT', default=100)
+
+# Readiness probe (/api/health/ready/)
+HEALTH_PROBE_TIMEOUT_MS = env.int('HEALTH_PROBE_TIMEOUT_MS', default=500)
+HEALTH_READINESS_CACHE_SECONDS = env.int('HEALTH_READINESS_CACHE_SECONDS', default=2)
+
+# Image derivatives: resized WebP/JPEG variants generated in the background on upload
+# (zamanivault/images.py); manage.py generate_image_variants backfills existing media
+IMAGE_VARIANT_WIDTHS = {'thumbnail': 160, 'card': 480, 'full': 1600}  # pixels
+IMAGE_WEBP_QUALITY = env.int('IMAGE_WEBP_QUALITY', default=80)
+IMAGE_JPEG_QUALITY = env.int('IMAGE_JPEG_QUALITY', default=82)
+IMAGE_DERIVATIVE_WORKERS = env.int('IMAGE_DERIVATIVE_WORKERS', default=2)
+IMAGE_DERIVATIVE_MAX_PENDING = env.int('IMAGE_DERIVATIVE_MAX_PENDING', default=256)
+
+# Content media streaming (/api/content/<id>/stream/). Set MEDIA_ACCEL_REDIRECT_PREFIX to an
+# internal proxy location mapped to MEDIA_ROOT to let the proxy send the bytes (X-Accel-Redirect).
+# The proxy must keep MEDIA_URL/content_files/ (including chunked uploads in content_files/cas/)
+# internal so premium files are only served through the stream
+MEDIA_ACCEL_REDIRECT_PREFIX = env('MEDIA_ACCEL_REDIRECT_PREFIX', default='')
+MEDIA_STREAM_CHUNK_SIZE = env.int('MEDIA_STREAM_CHUNK_SIZE', default=512 * 1024)  # bytes
+MEDIA_SIGNED_URL_TTL = env.int('MEDIA_SIGNED_URL_TTL', default=6 * 3600)  # seconds
+
+# Resumable chunked uploads (/api/content/uploads/). UPLOAD_TEMP_DIR must be on the same
+# filesystem as MEDIA_ROOT so finished files are moved into place without a copy
+UPLOAD_CHUNK_SIZE = env.int('UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024)  # bytes
+UPLOAD_MAX_SIZE = env.int('UPLOAD_MAX_SIZE', default=20 * 1024 ** 3)  # bytes
+UPLOAD_TEMP_DIR = env('UPLOAD_TEMP_DIR', default=os.path.join(MEDIA_ROOT, '.uploads'))
+
+# Activity retention (manage.py compact_activity)
+ACTIVITY_HOT_DAYS = env.int('ACTIVITY_HOT_DAYS', default=90)
+ACTIVITY_ARCHIVE_DIR = env('ACTIVITY_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive', 'activity'))
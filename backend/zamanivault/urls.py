@@ -5,7 +5,9 @@ from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework import permissions
 from rest_framework.documentation import include_docs_urls
-from .health_check import health_check
+from content.media import serve_public_media
+from .health_check import health_check, liveness, readiness
+from .metrics import prometheus_metrics, slow_requests, connection_pool
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -15,9 +17,15 @@ urlpatterns = [
     path('api/subscriptions/', include('subscriptions.urls')),
     path('api/docs/', include_docs_urls(title='ZamaniVault API', permission_classes=[permissions.IsAuthenticated])),
     path('api/health/', health_check, name='health_check'),
+    path('api/health/live/', liveness, name='liveness'),
+    path('api/health/ready/', readiness, name='readiness'),
+    path('api/async/', include('zamanivault.async_urls')),
+    path('api/metrics/', prometheus_metrics, name='prometheus_metrics'),
+    path('api/metrics/slow/', slow_requests, name='slow_requests'),
+    path('api/metrics/pool/', connection_pool, name='connection_pool'),
 ]
 
-# Serve static and media files in development
+# Serve static and public media files in development; content files go through the stream view
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=serve_public_media, document_root=settings.MEDIA_ROOT)
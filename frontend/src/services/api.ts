@@ -15,12 +15,13 @@ const API_BASE_URL = 'http://localhost:8000/api';
 async function apiRequest<T>(
   endpoint: string, 
   method: 'GET' | 'POST' | 'PUT' | 'DELETE' = 'GET',
-  data?: any
+  data?: any,
+  headers: Record<string, string> = {}
 ): Promise<ApiResponse<T>> {
   try {
     // This is where we would make the actual fetch request
     // For now, we'll just console log the request details
-    console.log(`Making ${method} request to ${API_BASE_URL}${endpoint}`, data);
+    console.log(`Making ${method} request to ${API_BASE_URL}${endpoint}`, data, headers);
     
     // Mock a successful response for now
     // In the future, this would be replaced with actual fetch calls
@@ -72,6 +73,14 @@ export const userApi = {
   getWatchHistory: () => apiRequest<{ contentId: string; progress: number; lastWatched: string }[]>('/user/history')
 };
 
+export const subscriptionApi = {
+  // Reuse the same key when retrying one subscribe attempt so the backend charges only once
+  subscribe: (
+    data: { plan_id: number; payment_method?: string; auto_renew?: boolean },
+    idempotencyKey: string = crypto.randomUUID()
+  ) => apiRequest('/subscriptions/subscriptions/subscribe/', 'POST', data, { 'Idempotency-Key': idempotencyKey })
+};
+
 export const adminApi = {
   getUsers: () => apiRequest<any[]>('/admin/users'),
   getAnalytics: () => apiRequest<any>('/admin/analytics'),
@@ -84,5 +93,6 @@ export const adminApi = {
 export default {
   content: contentApi,
   user: userApi,
+  subscription: subscriptionApi,
   admin: adminApi
 };